@@ -4,16 +4,26 @@
 
 import sys
 from codegen.load_json import load_json
+from utils.ir_binary import read_binary, is_binary
 from codegen.load_graphml import load_graphml
 from codegen.parse_ir import parse_ir
-from utils.system import get_piped_input
 
 
-def compile_ir(ir, module_name):
+def compile_ir(ir, module_name, context=None):
+    """Generates C++ code out of an IR: JSON text, or a binary IR (bytes,
+    see utils/ir_binary.py)"""
+    if isinstance(ir, bytes):
+        return compile_ir_data(read_binary(ir), module_name, context)
+    return compile_ir_data(load_json(ir), module_name, context)
+
+
+def compile_ir_data(ir_data, module_name, context=None):
+    """Generates C++ code out of an IR, that is already in memory
+    (a dict with Python names, like the parser's output)"""
     from codegen.cpp.ir_to_cpp import ir_to_cpp
 
-    functions, definitions = parse_ir(load_json(ir))
-    return str(ir_to_cpp(module_name, functions, definitions))
+    functions, definitions = parse_ir(ir_data, context)
+    return str(ir_to_cpp(module_name, functions, definitions, context))
 
 
 def main(args):
@@ -23,22 +33,24 @@ def main(args):
     if "-i" in args:
         file_name = args[args.index("-i") + 1]
         module_name = file_name.split(".")[:-1]
-        with open(file_name, "r", encoding="UTF-8") as src_file:
-            input_text = src_file.read()
-            if file_name.lower().endswith(".json"):
-                ir_ = load_json(input_text)
-            elif file_name.lower().endswith(".gml"):
-                ir_ = load_graphml(input_text)
+        with open(file_name, "rb") as src_file:
+            input_data = src_file.read()
+        if is_binary(input_data):
+            ir_ = read_binary(input_data)
+        elif file_name.lower().endswith(".gml"):
+            ir_ = load_graphml(input_data.decode("UTF-8"))
+        else:
+            ir_ = load_json(input_data.decode("UTF-8"))
     else:
-        input_text = get_piped_input()
-        ir_ = load_json(input_text)
+        # (a binary IR, or JSON text)
+        input_data = sys.stdin.buffer.read()
+        if is_binary(input_data):
+            ir_ = read_binary(input_data)
+        else:
+            ir_ = load_json(input_data.decode("UTF-8"))
         module_name = "piped_input"
 
-    functions = parse_ir(ir_)
-    # TODO parse definitions also
-    from codegen.cpp.ir_to_cpp import ir_to_cpp
-
-    print(ir_to_cpp(module_name, functions))
+    print(compile_ir_data(ir_, module_name))
 
     return 0
 
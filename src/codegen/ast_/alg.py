@@ -5,6 +5,9 @@ code generator algebraic operations
 """
 from ..node import Node  # to_cpp_method
 from ..cpp.cpp_codegen import CppVariable, cpp_eval, CppAssignment
+from ..last_use import consume
+from ..error_free import keep_error
+from ..tasks import run_independent
 
 OPERATOR_MAP = {
     "=": "==",
@@ -15,8 +18,16 @@ OPERATOR_MAP = {
 class Binary(Node):
 
     def to_cpp(self, block):
+        run_independent(self.in_ports, block)
         left = cpp_eval(self.in_ports[0], block)
         right = cpp_eval(self.in_ports[1], block)
+        if self.operator == "||":
+            # concatenation appends to the left operand in place
+            # when it's not used afterwards:
+            left = consume(self.in_ports[0], left)
+        else:
+            left = keep_error(self.in_ports[0], self.out_ports[0], left)
+            right = keep_error(self.in_ports[1], self.out_ports[0], right)
         result = CppVariable(self.out_ports[0].label
                              if self.out_ports[0].renamed else "bin",
                              self.out_ports[0].type.cpp_type)
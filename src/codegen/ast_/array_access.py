@@ -5,22 +5,52 @@ code generator array access
 """
 
 from ..node import Node
+from ..codegen_state import state
 from ..cpp.cpp_codegen import CppBlock, cpp_eval, CppVariable
 from ..error import CodeGenError
+from ..error_free import is_error_free
+from ..type import ArrayType
+
+
+class RowAccess:
+    """Value of A[i] that is only indexed further, A[i][k] is
+    emitted as A.at(i, k) if A is stored flat"""
+
+    def __init__(self, array, index, flat):
+        self.array = array
+        self.index = index
+        self.flat = flat
+
+    def __str__(self):
+        return f"{self.array}[{self.index}]"
+
+
+def in_bounds(array, index):
+    """C++ condition, that index (counting from 0) is within the array
+    (and the indices of the rows it is in)"""
+    check = f"unsigned({index}) < {array}.size()"
+    if type(array) == RowAccess:
+        check = f"{in_bounds(array.array, array.index)} && {check}"
+    return check
 
 
 class ArrayAccess(Node):
 
+    def only_indexed(self):
+        """Checks if this node's result (a sub-array) is only used as
+        the array input of other ArrayAccess nodes, like A[i] in A[i, k]"""
+        edges = state().edges_from.get(self.out_ports[0].id, [])
+        return bool(edges) and all(
+            type(edge.to.node) == ArrayAccess and edge.to.index == 0
+            for edge in edges
+        )
+
     def to_cpp(self, block: CppBlock):
         # inputs: array, index
 
         array = cpp_eval(self.in_ports[0], block)
         index = cpp_eval(self.in_ports[1], block)
 
-        new_var = CppVariable(self.out_ports[0].label
-                              if self.out_ports[0].renamed else "array_access",
-                              self.out_ports[0].type.cpp_type)
-        block.add_variable(new_var)
         # Cloud Sisal Arrays' indices start from 1 by default
         # hence the {index}-1
 
@@ -32,5 +62,34 @@ class ArrayAccess(Node):
         else:
             index_string = f"{index} - 1"
 
-        block.add_code(f"{new_var} = {array}[{index_string}];")
+        if self.only_indexed():
+            # don't copy the sub-array into a variable, the next
+            # ArrayAccess will index it in place (A[i - 1][k - 1]):
+            self.out_ports[0].value = RowAccess(
+                array, index_string,
+                getattr(self.in_ports[0].type, "flat", False))
+            return
+
+        # elements, that can't have an error, are read without their
+        # error flags:
+        plain = is_error_free(self.out_ports[0])
+        if type(array) == RowAccess and array.flat:
+            method = "value_at" if plain else "at"
+            access = f"{array.array}.{method}({array.index}, {index_string})"
+        elif plain and type(self.in_ports[0].type) == ArrayType:
+            access = f"{array}.value({index_string})"
+        else:
+            access = f"{array}[{index_string}]"
+
+        new_var = CppVariable(self.out_ports[0].label
+                              if self.out_ports[0].renamed else "array_access",
+                              self.out_ports[0].type.cpp_type)
+        block.add_variable(new_var)
+        if getattr(self, "speculative", False):
+            # (the optimizer has moved it out of a loop, that may run
+            # no iterations)
+            block.add_code(f"if ({in_bounds(array, index_string)}) "
+                           f"{new_var} = {access};")
+        else:
+            block.add_code(f"{new_var} = {access};")
         self.out_ports[0].value = new_var
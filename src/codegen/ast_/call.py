@@ -4,8 +4,10 @@
 code generator call
 """
 from ..node import Node
-from ..edge import Edge
-from .function import Function, time_limited_execution_cpp
+from ..codegen_state import state
+from .function import time_limited_call_cpp
+from ..last_use import consume
+from ..tasks import run_independent
 
 from ..cpp.cpp_codegen import (
     CppVariable,
@@ -20,38 +22,29 @@ class FunctionCall(Node):
     def to_cpp(self, block: CppBlock):
         # check if there is special implementation for this function:
         if self.callee not in FunctionCall.overriden_functions:
+            run_independent(self.in_ports, block)
             # build function arguments string
             arg_vars = [str(cpp_eval(i_p, block)) for i_p in self.in_ports]
             args = ", ".join(arg_vars)
 
-            timeout = False
+            call = f"{self.callee}({args})"
             # check if it isn't a built in function:
-            if self.callee in Function.functions:
-                called_function = Function.functions[self.callee]
-                timeout_pragma = called_function.get_pragma("max_time")
-                if timeout_pragma:
-                    result_name, exec_code = time_limited_execution_cpp(
-                                             Function.functions[self.callee],
-                                             args)
-                    block.add_code(exec_code)
-                    timeout = True
+            if self.callee in state().functions:
+                called_function = state().functions[self.callee]
+                if called_function.get_pragma("max_time"):
+                    call = time_limited_call_cpp(called_function, args)
 
             result = None
 
-            def process_timeout():
-                if timeout:
-                    block.add_code(CppAssignment(result,
-                                   f"{result_name}.retval"))
-                else:
-                    block.add_code(CppAssignment(result,
-                                   f"{self.callee}({args})"))
+            def add_call():
+                block.add_code(CppAssignment(result, call))
 
             # if the function has multiple outputs:
             if len(self.out_ports) > 1:
                 name = "call_result"
-                called_function = Function.functions[self.callee]
+                called_function = state().functions[self.callee]
                 result = CppVariable(name, called_function.ret_cpp_type)
-                process_timeout()
+                add_call()
                 block.add_variable(result)
                 for port_index, o_p in enumerate(self.out_ports):
                     type_ = called_function.out_ports[port_index].type.cpp_type
@@ -68,7 +61,7 @@ class FunctionCall(Node):
                 result_type = self.out_ports[0].type
                 result = CppVariable(name, result_type.cpp_type)
                 block.add_variable(result)
-                process_timeout()
+                add_call()
                 self.out_ports[0].value = result
         else:
             FunctionCall.overriden_functions[self.callee](self, block)
@@ -77,37 +70,28 @@ class FunctionCall(Node):
 '''Overriden implementations (used instead of Function's to_cpp method)'''
 
 
-def remh(self, block: CppBlock):
-    '''Remove first element of an array'''
+def update_array(self, block: CppBlock):
+    '''addh, addl, remh and reml: add or remove an element at either
+    end of an array. The array is updated in place if it isn't used
+    after the call.'''
     name = (self.out_ports[0].label
-            if self.out_ports[0].renamed else "remh_call")
-    src_port = Edge.edge_to[self.in_ports[0].id].from_
-    result_type = src_port.type
-    result = CppVariable(name, result_type.cpp_type)
-    block.add_variable(result)
-    arg_vars = [str(cpp_eval(i_p, block)) for i_p in self.in_ports]
-    args = ", ".join(arg_vars)
-    block.add_code(CppAssignment(result, f"{self.callee}({args})"))
-    self.out_ports[0].value = result
-
-
-def reml(self, block: CppBlock):
-    '''Remove last element of an array'''
-    name = (self.out_ports[0].label
-            if self.out_ports[0].renamed else "reml_call")
-    src_port = Edge.edge_to[self.in_ports[0].id].from_
+            if self.out_ports[0].renamed else self.callee + "_call")
+    src_port = state().edge_to[self.in_ports[0].id].from_
     result_type = src_port.type
     result = CppVariable(name, result_type.cpp_type)
     block.add_variable(result)
     arg_vars = [str(cpp_eval(i_p, block)) for i_p in self.in_ports]
+    arg_vars[0] = consume(self.in_ports[0], arg_vars[0])
     args = ", ".join(arg_vars)
     block.add_code(CppAssignment(result, f"{self.callee}({args})"))
     self.out_ports[0].value = result
 
 
 FunctionCall.overriden_functions = {
-    "remh": remh,
-    "reml": reml,
+    "addh": update_array,
+    "addl": update_array,
+    "remh": update_array,
+    "reml": update_array,
 }
 
 FunctionCall.built_in_functions = [
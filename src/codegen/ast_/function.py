@@ -11,85 +11,85 @@ from ..cpp.cpp_codegen import (CppBlock,
                                cpp_eval)
 from ..error import CodeGenError
 from ..cpp import template
-from ..codegen_state import global_no_error
-
-
-def gen_time_limit_template(function):
-
-    class_template = template.load_template("time_out_class.cpp")
-
-    '''generate return values assignments:'''
-    block = CppBlock()
-
-    arg_vars = ["f->" + i_p.label for i_p in function.in_ports]
-    args = ", ".join(arg_vars)
-
-    block.add_code(CppAssignment("f->retval",
-                                 f"{function.cpp_function_name}({args})"))
-
-    write_retvals = indent_cpp(str(block), 2, indent_first=False)
-
-    # generate arguments declaration
-    args = "\n".join([str(i_p.type.cpp_type) + " " + i_p.label + ";"
-                      for i_p in function.in_ports])
-
-    # generate retvals declaration
-    declare_retvals = function.ret_type_str + " " + "retval" + ";"
-
-    # generate code that will copy the args:
-    copy_args = "\n".join([f"this->{i_p.label}" + " = " + i_p.label + ";"
-                           for i_p in function.in_ports])
-
-    # generate args as parameters:
-    call_args = ", ".join([str(i_p.type.cpp_type) + " " + i_p.label
-                           for i_p in function.in_ports])
-
-    set_error_value = "retval.set_error();" if not global_no_error else ""
-
-    inserts = dict(write_retvals=write_retvals,
-                   args=args,
-                   declare_retvals=declare_retvals,
-                   copy_args=copy_args,
-                   call_args=call_args,
-                   set_error_value=set_error_value,
-                   class_name=function.cpp_function_name.title() +
-                   "ExecutionManager")
-
-    class_str = class_template.substitute(inserts)
-    return class_str
-
-
-def time_limited_execution_cpp(function, args: str):
+from ..codegen_state import state
+
+
+# results kept by a memoized function, unless the pragma sets
+# the number (//$memoize = 1000):
+MEMO_TABLE_SIZE = 65536
+
+
+def memoized_function_cpp(function, arg_str: str, body_name: str):
+    """Returns the C++ function, that looks its results up in a table
+    (see templates/memo_table.cpp) and calls body_name on a miss"""
+    memoize_pragma = function.get_pragma("memoize")
+    size = (memoize_pragma["args"][0] if memoize_pragma["args"]
+            else MEMO_TABLE_SIZE)
+    if not str(size).isdigit() or int(size) <= 0:
+        raise CodeGenError("memoize pragma expects a positive integer "
+                           f"(the size of the table), got \"{size}\"",
+                           function.location)
+    size = int(size)
+    table_type = ("MemoTable<" +
+                  ", ".join([function.ret_type_str] +
+                            [str(i_p.type.cpp_type)
+                             for i_p in function.in_ports]) + ">")
+    args = ", ".join([body_name] + [str(i_p.value)
+                                    for i_p in function.in_ports])
     block = CppBlock()
-    if hasattr(function, "cpp_function_name"):
-        code = function.cpp_function_name.title() + "ExecutionManager"
-    else:
-        code = function.function_name.title() + "ExecutionManager"
-    #TODO add error handling here (pragma not there etc.)
-    pragma_timeout = function.get_pragma("max_time")
-    time = pragma_timeout["args"][0]
-    class_object_name = CppVariable.get_name("exec_man")
-    code += f" {class_object_name}({args}, {time});"
-    block.add_code(code)
-    return str(class_object_name), str(block)
+    block.add_code(f"static {table_type} memo_table({size});")
+    block.add_code(f"return memo_table.call({args});")
+    return (f"{function.ret_type_str} {function.cpp_function_name}"
+            f"({arg_str})\n"
+            "{\n" + indent_cpp(str(block)) + "\n}")
+
+
+def time_limited_call_cpp(function, args: str):
+    """Returns C++ expression, that calls the function with its time
+    limit (see templates/time_limit.cpp), the max_time pragma gives it
+    in seconds"""
+    time = function.get_pragma("max_time")["args"][0]
+    cpp_function_name = ("sisal_main" if function.function_name == "main"
+                         else function.function_name)
+    return (f"with_time_limit({time}, {cpp_function_name}"
+            + (f", {args})" if args else ")"))
+
+
+def time_limited_functions():
+    """Returns names of the functions, that may run under a time limit:
+    the ones with max_time pragma and the ones they call (CppModule
+    finds them once, before the functions' code is generated)"""
+    from ..tasks import function_nodes
+
+    names = set()
+    queue = [function for function in state().functions.values()
+             if function.get_pragma("max_time")]
+    while queue:
+        function = queue.pop()
+        if function.function_name in names:
+            continue
+        names.add(function.function_name)
+        for node in function_nodes(function):
+            if (node.name == "FunctionCall" and
+               node.callee in state().functions):
+                queue.append(state().functions[node.callee])
+    return names
 
 
 class Function(Node):
 
-    functions = {}
     name = "function"
-    service_function_counter = 0
     copy_parent_input_values = False
     name_child_output_values = True
     result_name = "function_result"
 
     @staticmethod
     def get_service_name(name):
-        Function.service_function_counter += 1
-        new_name = f"service_function{Function.service_function_counter}_for_" + name
-        while new_name in Function.functions:
-            Function.service_function_counter += 1
-            new_name = f"service_function{Function.service_function_counter}_for_" + name
+        state().service_function_counter += 1
+        new_name = f"service_function{state().service_function_counter}_for_" + name
+        while new_name in state().functions:
+            state().service_function_counter += 1
+            new_name = f"service_function{state().service_function_counter}_for_" + name
         return new_name
 
     @property
@@ -99,7 +99,7 @@ class Function(Node):
     def __init__(self, data):
         super().__init__(data)
         if "dont_register" not in data or not data["dont_register"]:
-            Function.functions[self.function_name] = self
+            state().functions[self.function_name] = self
 
     @property
     def ret_cpp_type(self):
@@ -122,24 +122,34 @@ class Function(Node):
             "sisal_main" if self.function_name == "main"
             else self.function_name
         )
-        arg_str = ", ".join([port.value.definition_str()
+        arg_str = ", ".join([port.value.argument_str()
                              for port in self.in_ports])
 
         return f"{ret_type_str} {cpp_function_name}({arg_str});"
 
+    def process_memoize(self):
+        if self.get_pragma("memoize"):
+            for header in ["mutex", "tuple", "unordered_map"]:
+                self.module.add_header(header)
+            memo_table = str(template.load_template("memo_table.cpp")
+                             .substitute())
+            if memo_table not in self.module.service_classes:
+                self.module.add_service_class(memo_table)
+
     def process_timeout(self):
-        if hasattr(self, "pragmas"):
-            time_out = next((p for p in self.pragmas if p["name"] == "max_time")
-                         , None)
-            if time_out:
-                self.module.add_header("pthread.h")
-                inserts = gen_time_limit_template(self)
-                self.module.add_service_class(inserts)
+        if self.time_limited:
+            for header in ["algorithm", "atomic", "chrono",
+                           "condition_variable", "mutex", "thread", "tuple"]:
+                self.module.add_header(header)
+            time_limit = str(template.load_template("time_limit.cpp")
+                             .substitute())
+            if time_limit not in self.module.service_classes:
+                self.module.add_service_class(time_limit)
 
     @to_cpp_method
     def to_cpp(self, block=None):
         # reset variable index:
-        CppVariable.variable_index = {}
+        state().variable_index = {}
 
         # collect return types in a list:
         ret_types = [port.type for port in self.out_ports]
@@ -148,12 +158,20 @@ class Function(Node):
         for port in self.in_ports:
             port.value = CppVariable(port.label, port.type)
 
-        arg_str = ", ".join([port.value.definition_str()
+        arg_str = ", ".join([port.value.argument_str()
                              for port in self.in_ports])
 
         # initialize a block of C++ code for function body:
         function_block = CppBlock()
 
+        # functions, that may run under a time limit, check if it's
+        # exceeded when they are called (and in their loops):
+        state().current_function = self
+        self.time_limited = (self.function_name in
+                             state().time_limited_functions)
+        if self.time_limited:
+            function_block.add_code("check_time_limit();")
+
         # evaluate function output values (results):
         for index, o_p in enumerate(self.out_ports):
             cpp_eval(
@@ -190,10 +208,17 @@ class Function(Node):
 
         # check if we requested time_out (time limiting) and process that:
         self.process_timeout()
+        self.process_memoize()
+
+        # (a memoized function's body gets a name of its own, the
+        # function looks its results up before calling it)
+        body_name = (self.cpp_function_name + "_uncached"
+                     if self.get_pragma("memoize")
+                     else self.cpp_function_name)
 
         # assemble the final string:
         function_string = (
-            f"{self.ret_type_str} {self.cpp_function_name}({arg_str})\n"
+            f"{self.ret_type_str} {body_name}({arg_str})\n"
             "{\n"
             + (indent_cpp(str_function_block) + "\n"
                if str_function_block else "")
@@ -201,6 +226,10 @@ class Function(Node):
             + "\n}"
         )
 
+        if self.get_pragma("memoize"):
+            function_string += "\n\n" + memoized_function_cpp(
+                self, arg_str, body_name)
+
         return function_string
 
 
@@ -208,9 +237,9 @@ def create_main():
     """Creates a C++ main(...) that loads JSON input data from stdin
     and outputs data as JSON to stdout.
     """
-    if "main" not in Function.functions:
+    if "main" not in state().functions:
         raise CodeGenError("Module must contain main-function.")
-    main = Function.functions["main"]
+    main = state().functions["main"]
 
     body = ("Json::Value root;\n"
             "std::cin >> root;\n"
@@ -238,11 +267,8 @@ def create_main():
     args = ", ".join([str(port.value)
                       for port in main.in_ports])
 
-    time_out = main.get_pragma("max_time")
-    if time_out:
-        class_object_name, added_code = time_limited_execution_cpp(main, args)
-        body += added_code + "\n"
-        sisal_main_call = class_object_name + ".retval"
+    if main.get_pragma("max_time"):
+        sisal_main_call = time_limited_call_cpp(main, args)
     else:
         sisal_main_call = (
             "sisal_main(" + args + ")"
@@ -5,6 +5,7 @@ code generator let
 """
 from ..node import Node, to_cpp_method
 from ..cpp.cpp_codegen import CppBlock, cpp_eval
+from ..tasks import run_independent
 
 
 class Let(Node):
@@ -16,6 +17,9 @@ class Let(Node):
         # initialization code:
         for i_p, init_i_p in zip(self.in_ports, self.init.in_ports):
             init_i_p.value = i_p.value
+        # independent bindings are computed concurrently:
+        self.init.name_child_ports()
+        run_independent(self.init.out_ports, block)
         self.init.to_cpp(block, self.body.in_ports)
 
         self.body.let = self
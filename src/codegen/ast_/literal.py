@@ -12,8 +12,10 @@ class Literal(Node):
     needs_init = True
 
     def to_cpp(self, block: CppBlock):
-        # if self.value == True:
-        #    self.value = "true"
+        # (the optimizer's boolean literals are bools, C++ spells
+        # them in lowercase)
+        if isinstance(self.value, bool):
+            self.value = "true" if self.value else "false"
 
         # literal_variable = CppVariable("literal", self.out_ports[0].type.cpp_type)
         # block.add_variable(literal_variable)
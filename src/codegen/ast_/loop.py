@@ -4,20 +4,42 @@
 code generator loop
 """
 from ..node import Node, to_cpp_method
-from ..cpp.cpp_codegen import CppBlock, cpp_eval, CppVariable, CppAssignment
+from ..codegen_state import state
+from ..cpp.cpp_codegen import (CppBlock, CppLoop, cpp_eval, CppVariable,
+                               CppAssignment, CppTimeLimitCheck,
+                               PARALLEL_MIN_ITERATIONS)
 from ..edge import get_src_node
 from ..port import copy_port_values, copy_port_labels
 from ..error import CodeGenError
+from ..last_use import consume
+from ..error_free import PLAIN_TYPES, is_error_free
+from ..type import ArrayType, IntegerType, RealType
 
 
 class LoopExpression(Node):
 
+    # (the IR may set them, see parser's cost_model)
+    parallel = True
+    min_parallel_iterations = PARALLEL_MIN_ITERATIONS
+
     copy_parent_input_values = True
 
     def __init__(self, data):
         super().__init__(data)
         self.reduction_values = []
         self.reduction_operators = []
+        # arrays written by index and arrays collected by threads
+        # (see Reduction.to_cpp):
+        self.indexed_arrays = []
+        self.filtered_arrays = []
+        # set by reductions, that need iterations to run in order:
+        self.sequential_reductions = False
+        # (counter, first, last) of the ranges:
+        self.ranges = []
+        # elements of the arrays the loop goes through and loops of the
+        # ranges (see Scatter):
+        self.element_bindings = []
+        self.cpp_loops = []
         self.private_vars = []
         for node_name in ["init", "body", "condition", "range_gen", "returns"]:
             if node_name not in self.__dict__:
@@ -65,6 +87,17 @@ class LoopExpression(Node):
         if self.condition:
             self.condition.make_loop_block(block)
 
+        # (a loop, that may run under a time limit, checks it at every
+        # iteration, threads of a parallel loop get the time limit from
+        # a variable set before it)
+        if state().current_function.time_limited:
+            time_limit = None
+            if self.ranges:
+                time_limit = CppVariable("loop_time_limit", "Watchdog::Timer *",
+                                         "time_limit")
+                self.cpp_loop.setup.add_variable(time_limit)
+            self.loop_block.add_head_code(CppTimeLimitCheck(time_limit))
+
         if self.body:
             self.body.to_cpp(self.loop_block)
 
@@ -83,6 +116,33 @@ class LoopExpression(Node):
         copy_port_values(self.in_ports,
                          self.returns.in_ports[-len(self.in_ports):])
 
+    def has_loop_carried_values(self):
+        """Checks if the loop's body redefines values of its init
+        (s := old s + x), so iterations depend on previous ones"""
+        if not self.init or not self.body:
+            return False
+        init_labels = [o_p.label for o_p in self.init.out_ports]
+        return any(o_p.label in init_labels for o_p in self.body.out_ports)
+
+    def range_sizes(self):
+        return [f"std::max<int>({last} - {first} + 1, 0)"
+                for _, first, last in self.ranges]
+
+    def iteration_space(self):
+        """Returns C++ expressions for the number of the current
+        iteration (counting from 0, in the order of the ranges' cross
+        product) and for the number of all iterations, if the loop goes
+        through ranges"""
+        if not self.ranges:
+            return None
+        sizes = self.range_sizes()
+        position = None
+        for (counter, first, _), size in zip(self.ranges, sizes):
+            offset = f"{counter} - {first}"
+            position = (offset if position is None
+                        else f"({position}) * {size} + {offset}")
+        return position, " * ".join(sizes)
+
     @to_cpp_method
     def to_cpp(self, block: CppBlock):
         # create a comment containing names of variables being calculated
@@ -110,13 +170,26 @@ class LoopExpression(Node):
         for var in self.loop_block.variables:
             block.add_variable(var)
         self.loop_block.variables = []
-        red_names = ", ".join([r.name for r in self.reduction_values])
-        red_ops = ", ".join([str(r) for r in self.reduction_operators])
-        if self.reduction_values:
+        reductions = " ".join([f"reduction({op}:{r.name})"
+                               for r, op in zip(self.reduction_values,
+                                                self.reduction_operators)])
+        if ((self.reduction_values or self.indexed_arrays or
+             self.filtered_arrays) and self.parallel and
+           not self.sequential_reductions and
+           not self.has_loop_carried_values()):
             priv_names = " private(" + ", ".join([str(p) for p in self.private_vars]) + ")" if self.private_vars else ""
-            self.pragma_block.add_code(
-                        f"#pragma omp parallel for reduction({red_ops}:{red_names})"# + priv_names
-                    )
+            # (cross product's loops are split as one)
+            collapse = (f"collapse({len(self.ranges)})"
+                        if len(self.ranges) > 1 else "")
+            # (filtered arrays need threads to get chunks in order)
+            schedule = "schedule(static)" if self.filtered_arrays else ""
+            self.cpp_loop.min_iterations = self.min_parallel_iterations
+            self.cpp_loop.pragma = " ".join(
+                ["#pragma omp parallel for"] +
+                [clause for clause in [collapse, schedule, reductions]
+                 if clause])
+        if state().current_function.time_limited and self.ranges:
+            block.add_code(CppTimeLimitCheck())
         block.add_code(f"// loop end: {result_vars_list}")
 
 # copy order in parser:
@@ -173,6 +246,18 @@ class Returns(Node):
 
 class Reduction(Node):
 
+    def array_of_items(self):
+        """Returns the type of items an array reduction collects in
+        a vector, and C++ function making the array of the vector"""
+        # (plain values are moved into the array, booleans are kept as
+        # SisalTypes, vector<bool> can't be written in parallel)
+        element_type = self.in_ports[1].type
+        array_type = f"Array<{element_type.__cpp_type__}>"
+        if (is_error_free(self.in_ports[1]) and
+           type(element_type) in [IntegerType, RealType]):
+            return element_type.cpp_type, f"{array_type}::of_values"
+        return element_type.__cpp_type__, array_type
+
     def to_cpp(self, block: CppBlock):
         """ Reduction node. Receives a boolean (1st port),
         which is a condition for including a new item,
@@ -184,19 +269,58 @@ class Reduction(Node):
         cond = cpp_eval(self.in_ports[0], block)
         input_value = cpp_eval(self.in_ports[1], block)
 
-        cond_header = (f"if({cond})""{" if cond != True else "")
-        cond_footer = ("}" if cond != True else "")
+        # (a reduction without a condition gets the literal true)
+        unconditional = str(cond) == "true"
+        cond_header = (f"if({cond})""{" if not unconditional else "")
+        cond_footer = ("}" if not unconditional else "")
+
+        result = None
+        iteration_space = self.loop_object.iteration_space()
+        if self.operator == "array" and unconditional and iteration_space:
+            # the number of elements is known before the loop, every
+            # iteration writes its own element of a preallocated vector
+            # (so iterations may run in parallel), it becomes the array
+            # after the loop:
+            position, size = iteration_space
+            item_type, make_array = self.array_of_items()
+            reduction_value = CppVariable("reduction_array",
+                                          f"std::vector<{item_type}>")
+            # (the range is computed right before the loop)
+            self.loop_object.cpp_loop.setup.add_code(
+                f"{reduction_value}.resize({size});")
+            self.loop_body_block.add_code(
+                f"{reduction_value}[{position}] = {input_value};")
+            self.loop_object.indexed_arrays += [reduction_value]
+            result = f"{make_array}(std::move({reduction_value}))"
+
+        elif self.operator == "array" and iteration_space:
+            # elements are filtered (or the number of them isn't known
+            # before the loop): every thread collects its elements, and
+            # the parts are joined in order after the loop (see
+            # FilteredParts)
+            item_type, make_array = self.array_of_items()
+            reduction_value = CppVariable("reduction_array",
+                                          f"FilteredParts<{item_type}>")
+            self.loop_body_block.add_code(
+                    cond_header +
+                    f"{reduction_value}.push_back({input_value});" +
+                    cond_footer
+                )
+            self.loop_object.filtered_arrays += [reduction_value]
+            result = f"{make_array}({reduction_value}.join())"
 
-        if self.operator == "array":
+        elif self.operator == "array":
 
+            # (elements may be error-free, the array keeps SisalTypes)
             reduction_value = CppVariable(
                               "reduction_array",
-                              f"Array<{self.in_ports[1].type.cpp_type}>")
+                              f"Array<{self.in_ports[1].type.__cpp_type__}>")
             self.loop_body_block.add_code(
                     cond_header +
                     f"{reduction_value}.push_back({input_value});" +
                     cond_footer
                 )
+            self.loop_object.sequential_reductions = True
 
         elif self.operator == "value":
             reduction_value = CppVariable(
@@ -207,6 +331,7 @@ class Reduction(Node):
                 f"{reduction_value} = {input_value};" +
                 cond_footer
             )
+            self.loop_object.sequential_reductions = True
         elif self.operator == "sum":
             reduction_value = CppVariable(
                               "reduction_sum",
@@ -218,7 +343,8 @@ class Reduction(Node):
                 cond_footer
             )
             self.loop_object.reduction_values += [reduction_value]
-            self.loop_object.reduction_operators = ["sis_sum"]
+            self.loop_object.reduction_operators += [
+                "+" if reduction_value.type_ in PLAIN_TYPES else "sis_sum"]
         elif self.operator == "product":
             reduction_value = CppVariable(
                               "reduction_product",
@@ -230,10 +356,11 @@ class Reduction(Node):
                 cond_footer
             )
             self.loop_object.reduction_values += [reduction_value]
-            self.loop_object.reduction_operators = ["sis_product"]
+            self.loop_object.reduction_operators += [
+                "*" if reduction_value.type_ in PLAIN_TYPES else "sis_product"]
 
         self.init_block.add_variable(reduction_value)
-        self.out_ports[0].value = reduction_value
+        self.out_ports[0].value = result or reduction_value
 
 
 class RangeGen(Node):
@@ -253,12 +380,28 @@ class RangeGen(Node):
                 raise CodeGenError(f"expected scatter node in {self.id}"
                                    f"({self})")
             scatter.loop_object = self.loop_object
+            # all the ranges are computed before the outermost loop, so
+            # loops of a cross product are nested right in each other:
+            cpp_eval(scatter.in_ports[0], block)
+        for o_p in self.out_ports:
             cpp_eval(o_p, block)
 
             # self.loop_object.loop_block = scatter.loop_block
         self.loop_object.loop_block = CppBlock(add_curly_brackets=True,
                                                indent_contents=True)
-        block.add_code(self.loop_object.loop_block)
+        for binding in self.loop_object.element_bindings:
+            self.loop_object.loop_block.add_head_code(binding)
+        cpp_loops = self.loop_object.cpp_loops
+        for outer_loop, inner_loop in zip(cpp_loops, cpp_loops[1:]):
+            outer_loop.body = inner_loop
+        cpp_loops[-1].body = self.loop_object.loop_block
+        # the outermost loop gets the pragma (with collapse for a cross
+        # product, that runs all the iterations):
+        self.loop_object.cpp_loop = cpp_loops[0]
+        if len(cpp_loops) > 1:
+            cpp_loops[0].iterations = " * ".join(
+                self.loop_object.range_sizes())
+        block.add_code(cpp_loops[0])
 
 
 class RangeNumeric(Node):
@@ -285,18 +428,32 @@ class Scatter(Node):
         self.out_ports[0].value = element_var
 
         input_node = get_src_node(self.in_ports[0])
-        # TODO make pragmablocks for multiple loop ranges
-        self.loop_object.pragma_block = CppBlock()
-        block.add_code(self.loop_object.pragma_block)
         if type(input_node) == RangeNumeric:
             left = input_node.in_ports[0].value
             right = input_node.in_ports[1].value
             # block.add_code(f"for (auto {element_var} : "
             #              f"boost::irange({left}, {right}))")
-            block.add_code(f"for(int {element_var} = {left}; {element_var}"
-                           f" <= {right}; {element_var}++)")
+            cpp_loop = CppLoop(f"for(int {element_var} = {left}; "
+                               f"{element_var} <= {right}; {element_var}++)",
+                               f"{right} - {left} + 1")
+            self.loop_object.ranges += [(element_var, left, right)]
         else:
-            block.add_code(f"for (auto&& {element_var}: {input_var}.get())")
+            # an indexed loop (OpenMP splits it the way it splits numeric
+            # ranges), the element is bound as a constant reference at
+            # the start of the loop's body, and if it can't have an
+            # error, only its value is read:
+            size = f"size({input_var})"
+            cpp_loop = CppLoop(f"for({index_var} = 1; {index_var} <= {size}; "
+                               f"{index_var}++)", size)
+            if (is_error_free(self.out_ports[0]) and
+               type(self.in_ports[0].type) == ArrayType):
+                element = f"{input_var}.value({index_var} - 1)"
+            else:
+                element = f"{input_var}[{index_var} - 1]"
+            self.loop_object.element_bindings += [
+                f"const auto& {element_var} = {element};"]
+            self.loop_object.ranges += [(index_var, 1, size)]
+        self.loop_object.cpp_loops += [cpp_loop]
 
 
 class Condition(Node):
@@ -349,5 +506,6 @@ class OldValue(Node):
         olds_block = CppBlock()
         old_value = cpp_eval(self.in_ports[0], olds_block)
         # TODO create olds block in LoopExpression object?
-        olds_block.add_code(CppAssignment(old, old_value))
+        olds_block.add_code(CppAssignment(old, consume(self.in_ports[0],
+                                                       old_value)))
         block.add_head_code(olds_block)
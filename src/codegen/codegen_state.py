@@ -1,4 +1,46 @@
-'''Keeps the state of code generation'''
-current_function = None
-current_module = None
-global_no_error = False
+'''Keeps the state of code generation (in the current compilation
+context, see utils/context.py)'''
+
+from itertools import count
+from utils.context import current_context
+
+
+class CodegenState:
+    def __init__(self):
+        self.current_function = None
+        self.current_module = None
+        # "global" indices for all the nodes, edges and functions:
+        self.node_index = {}
+        self.edges = []
+        self.edges_from = {}
+        self.edge_to = {}
+        self.functions = {}
+        self.port_ids = count()
+        self.service_function_counter = 0
+        # numbers of C++ variables with the same names (in a function):
+        self.variable_index = {}
+        # C++ structs for record types:
+        self.cpp_structs = {}
+        self.in_parallel_loop = False
+        # names of the functions, that may run under a time limit (see
+        # ast_/function.py):
+        self.time_limited_functions = set()
+        # if functions run a loop or a recursion, by their names
+        # (see tasks.does_work):
+        self.does_work = {}
+        # ids of the operations, whose operands have no more tasks
+        # (see tasks.run_independent):
+        self.searched_nodes = set()
+
+
+def state() -> CodegenState:
+    return current_context().state("codegen", CodegenState)
+
+
+def reset():
+    current_context().reset("codegen")
+
+
+def no_error():
+    '''True if the program is compiled without error values (--noerror)'''
+    return current_context().no_error
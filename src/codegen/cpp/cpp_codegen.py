@@ -2,15 +2,27 @@
 # -*- coding: utf-8 -*-
 #
 """C++ code generation"""
-from ..edge import Edge
-from ..type import AnyType, ArrayType, RecordType
+from ..type import AnyType, ArrayType
 from string import Template
-from ..codegen_state import global_no_error
+from ..codegen_state import state, no_error
 import os
+from utils.context import current_context
 
 GROUP_VARIABLES = True
 
+# parallel loops with fewer iterations run without OpenMP (unless
+# the IR tells how many iterations are worth it, see parser's
+# cost_model):
+PARALLEL_MIN_ITERATIONS = 1000
+
 CPP_INDENT = "  "
+# (used in programs without error values, see --noerror)
+CPP_PLAIN_TYPES = """
+#define integer int
+#define real float
+#define boolean bool
+#define Array std::vector
+"""
 CPP_MODULE_HEADER = (
     """\
 #include <stdio.h>
@@ -21,14 +33,7 @@ CPP_MODULE_HEADER = (
 #include <string>
 #include <json/json.h> // uses jsoncpp library
 $sisal_types_h
-$extra_headers\n"""
-    + """
-#define integer int
-#define real float
-#define boolean bool
-#define Array std::vector
-"""
-    * global_no_error
+$extra_headers\n$plain_types"""
     + """#define CHECK_INPUT_ARGUMENT(arg) if(root[arg].isNull())\\
   {\\
     Json::Value error;\\
@@ -46,44 +51,164 @@ $extra_headers\n"""
 #pragma omp declare reduction (sis_sum:integer:omp_out+=omp_in) initializer (omp_priv=0)
 #pragma omp declare reduction(sis_sum:real : omp_out = omp_out + omp_in) initializer(omp_priv = 0)
 
+// the array arguments are taken by value: if the caller passes an
+// array that isn't used afterwards (with std::move), it is updated
+// in place, otherwise the copy shares the buffer until it is modified
+
 template <typename I>
-inline Array<I> addh (const Array<I> A, auto item)
+inline Array<I> addh (Array<I> A, auto item)
 {
-  Array<I> result = A;
-  result.push_back(item);
-  return result;
+  A.push_back(item);
+  return A;
 }
 
 template <typename I>
-inline Array<I> remh (const Array<I> A)
+inline Array<I> remh (Array<I> A)
 {
-  Array<I> result = A;
-  result.pop_back();
-  return result;
+  A.pop_back();
+  return A;
 }
 
 template <typename I>
-inline Array<I> reml (const Array<I> A)
+inline Array<I> reml (Array<I> A)
 {
-  Array<I> result = A;
-  result.pop_front();
-  return result;
+  A.pop_front();
+  return A;
 }
 
 template <typename I>
-inline Array<I> addl (const Array<I> A, auto item)
+inline Array<I> addl (Array<I> A, auto item)
 {
-  Array<I> result = A;
-  result.push_front(item);
-  return result;
+  A.push_front(item);
+  return A;
 }
 
 template <typename I>
-inline unsigned int size (Array<I> A)
+inline unsigned int size (const Array<I> &A)
 {
   return A.size();
 }
 
+// elements of an array reduction with a "when" filter, collected in
+// a parallel loop: every thread appends the elements of its iterations
+// to a part of its own. With schedule(static) threads get consecutive
+// chunks of iterations in order of their numbers, so the parts joined
+// in that order keep the order of the loop.
+template <typename T>
+class FilteredParts{
+  private:
+    // (parts don't share cache lines)
+    struct alignas(64) Part{
+      std::vector<T> items;
+    };
+    // the first thread's part is kept here, so a loop run without
+    // OpenMP doesn't allocate the others:
+    Part first;
+    std::unique_ptr<Part[]> others;
+    int threads;
+
+    inline std::vector<T>& items(int thread)
+    {
+      return thread ? others[thread - 1].items : first.items;
+    }
+
+  public:
+    // (a loop in a parallel region, e.g. in a task, runs sequentially
+    // in whichever thread of the region, so it fills the first part)
+    FilteredParts ()
+      : threads(omp_in_parallel() ? 1 : omp_get_max_threads())
+    {
+      if (threads > 1)
+        others.reset(new Part[threads - 1]);
+    }
+
+    inline void push_back(const T &item)
+    {
+      items(threads > 1 ? omp_get_thread_num() : 0).push_back(item);
+    }
+
+    // the parts are placed one after another (their offsets are
+    // an exclusive scan of their sizes) and copied in parallel:
+    std::vector<T> join()
+    {
+      std::vector<size_t> offsets(threads + 1, 0);
+      for (int thread = 0; thread < threads; thread++)
+        offsets[thread + 1] = offsets[thread] + items(thread).size();
+      if (offsets.back() == first.items.size())
+        return std::move(first.items);
+      std::vector<T> result(offsets.back());
+      #pragma omp parallel for
+      for (int thread = 0; thread < threads; thread++)
+        std::copy(items(thread).begin(), items(thread).end(),
+                  result.begin() + offsets[thread]);
+      return result;
+    }
+};
+
+// independent calls and loops (see codegen's tasks) run as OpenMP
+// tasks, given as lambdas, if tasks_wanted (otherwise they run one after
+// another). Calls start a team of threads, the calls they make run as
+// tasks in turn, until task_depth reaches task_depth_limit (then there
+// are enough tasks for every thread, the rest runs sequentially in
+// them). Loops in the team run sequentially, so independent loops only
+// become tasks in a team started by calls. Parallel loops don't make
+// tasks either.
+inline thread_local int task_depth = 0;
+inline int task_depth_limit = 0;
+inline const int task_threads = omp_get_max_threads();
+
+// (most calls run sequentially, tasks are expected to be rare)
+inline bool tasks_wanted(bool start_team)
+{
+  if (__builtin_expect(task_threads == 1, 1))
+    return false;
+  if (task_depth > 0)
+    return __builtin_expect(task_depth < task_depth_limit, 0);
+  return start_team && !omp_in_parallel();
+}
+
+template <typename Job>
+inline void run_at_depth(int depth, Job &job)
+{
+  int parent_depth = task_depth;
+  task_depth = depth;
+  job();
+  task_depth = parent_depth;
+}
+
+// (the last job runs in the current task)
+template <typename Job, typename... Jobs>
+inline void spawn_tasks(int depth, Job &job, Jobs &... jobs)
+{
+  if constexpr (sizeof...(jobs) > 0)
+  {
+    #pragma omp task shared(job) firstprivate(depth)
+    run_at_depth(depth, job);
+    spawn_tasks(depth, jobs...);
+  }
+  else
+    run_at_depth(depth, job);
+}
+
+template <typename... Jobs>
+__attribute__((noinline, cold)) void run_tasks(Jobs... jobs)
+{
+  if (task_depth > 0)
+  {
+    spawn_tasks(task_depth + 1, jobs...);
+    #pragma omp taskwait
+    return;
+  }
+  // about 8 tasks for every thread, if each call makes two:
+  task_depth_limit = 4;
+  for (int threads = task_threads; threads > 1; threads /= 2)
+    task_depth_limit++;
+  // (the team waits for all the tasks at the end of the region)
+  #pragma omp parallel
+  #pragma omp single
+  spawn_tasks(1, jobs...);
+}
+
 //------------------------------------------------------------
 """
 )
@@ -101,8 +226,6 @@ def indent_cpp(src_code, indent_level=1, indent_first=True):
 class CppVariable:
     """Holds C++ variables"""
 
-    variable_index = {}
-
     def init_code(self):
         # it has to be "!= None" (not "if self.value:"),
         # otherwise 0 would trigger it too
@@ -116,13 +239,13 @@ class CppVariable:
         if not name:
             name = "var"
 
-        if name not in CppVariable.variable_index:
-            CppVariable.variable_index[name] = 0
+        if name not in state().variable_index:
+            state().variable_index[name] = 0
 
-        CppVariable.variable_index[name] += 1
+        state().variable_index[name] += 1
 
-        if CppVariable.variable_index[name] > 1:
-            name = name + str(CppVariable.variable_index[name])
+        if state().variable_index[name] > 1:
+            name = name + str(state().variable_index[name])
 
         return name
 
@@ -141,29 +264,39 @@ class CppVariable:
     def definition_str(self):
         return f"{self.type_.cpp_type} {self.name}"
 
+    def argument_str(self):
+        """definition used in function parameter lists"""
+        return f"{self.type_.cpp_arg_type} {self.name}"
+
     def get_load_from_json_code(self, json_object=None):
         return self.type_.load_from_json_code(self.name, json_object)
 
 
 class CppModule:
-    def __init__(self, name: str, functions: dict, definitions: dict = {}):
+    def __init__(self, name: str, functions: dict, definitions: dict = {},
+                 context=None):
+        # (the functions' nodes and the C++ structs of records are kept
+        # in the compilation context)
+        self.context = context or current_context()
         self.functions = []
         self.extra_headers = []
         self.prototypes = []
         self.service_classes = []
-        for name, f in functions.items():
-            f.module = self
-            self.functions += [f.to_cpp(None)]
-            self.add_prototype(f)
+        with self.context:
+            from ..ast_.function import create_main, time_limited_functions
 
-        from ..ast_.function import create_main
+            state().time_limited_functions = time_limited_functions()
+            for name, f in functions.items():
+                f.module = self
+                self.functions += [f.to_cpp(None)]
+                self.add_prototype(f)
 
-        self.functions += [create_main()]
+            self.functions += [create_main()]
 
-        self.definitions = [
-            f"typedef {type_.internal_type} {def_};\n"
-            for def_, type_ in definitions.items()
-        ]
+            self.definitions = [
+                f"typedef {type_.internal_type} {def_};\n"
+                for def_, type_ in definitions.items()
+            ]
 
     def add_header(self, name: str):
         if name not in self.extra_headers:
@@ -176,22 +309,29 @@ class CppModule:
         self.prototypes.append(function.get_cpp_prototype())
 
     def __str__(self):
+        with self.context:
+            return self.cpp_code()
+
+    def cpp_code(self):
         m_h_template = Template(CPP_MODULE_HEADER)
         extra_headers_str = "\n".join([f"#include <{h}>" for h in self.extra_headers])
         path = os.path.dirname(os.path.abspath(__file__))
-        if global_no_error:
+        if no_error():
             sisal_types_h_str = ""
+            plain_types_str = CPP_PLAIN_TYPES
         else:
             sisal_types_h_str = "\n" + open(path + "/sisal_types.h", "r").read()
+            plain_types_str = ""
 
         module_header = m_h_template.substitute(
-            extra_headers=extra_headers_str, sisal_types_h=sisal_types_h_str
+            extra_headers=extra_headers_str, sisal_types_h=sisal_types_h_str,
+            plain_types=plain_types_str
         )
 
         return (
             module_header
             + "\n\n".join(
-                [struct["string"] for _, struct in RecordType.cpp_structs.items()]
+                [struct["string"] for _, struct in state().cpp_structs.items()]
             )
             + "\n\n"
             + "\n\n".join(self.definitions)
@@ -246,6 +386,12 @@ class CppBlock:
             self.types[var.type_] = []
         self.types[var.type_] += [var]
 
+    def remove_variable(self, var: CppVariable):
+        self.variables.remove(var)
+        self.types[var.type_].remove(var)
+        if not self.types[var.type_]:
+            del self.types[var.type_]
+
     # add arbitrary code to this block:
     def add_code(self, code):
         self.statements += [code]
@@ -305,13 +451,100 @@ class CppBlock:
         return ret_val
 
 
+class CppTasks:
+    """Blocks of code computing independent values, each one is put
+    into a lambda run by run_tasks (see CPP_MODULE_HEADER) as an OpenMP
+    task, when it's worth it. Otherwise the blocks run one after another
+    as they are (without lambdas, so C++ compiler optimizes them as
+    usual). Tasks that may start a team of threads have start_team
+    set."""
+
+    def __init__(self, start_team):
+        self.start_team = start_team
+        self.blocks = []
+
+    def add_block(self):
+        block = CppBlock(add_curly_brackets=True, indent_contents=True)
+        self.blocks.append(block)
+        return block
+
+    def __str__(self):
+        jobs = ",\n".join("[&]" + str(block) for block in self.blocks)
+        sequential = "\n".join(str(block) for block in self.blocks)
+        return (f"if (tasks_wanted({str(self.start_team).lower()}))"
+                "\n{\n" + indent_cpp("run_tasks(\n" + indent_cpp(jobs) + ");")
+                + "\n}\nelse\n{\n" + indent_cpp(sequential) + "\n}")
+
+
+class CppLoop:
+    """A for loop header followed by its body (the body of a cross
+    product's loop is the loop of the next range). Loop
+    expression sets the pragma, that makes it a parallel loop, once its
+    body is made. If the number of iterations is known, the loop is run
+    in parallel only if there are enough of them (min_iterations), and
+    it isn't called from a parallel region. Loops nested in a parallel
+    loop don't start parallel regions of their own (they wouldn't get
+    more threads anyway)."""
+
+    # (state().in_parallel_loop is set while a parallel loop is being
+    # turned into a string)
+
+    def __init__(self, header, iterations=None):
+        self.header = header
+        self.iterations = iterations
+        self.min_iterations = PARALLEL_MIN_ITERATIONS
+        # code that goes before the loop (and its pragma):
+        self.setup = CppBlock()
+        self.pragma = None
+        self.body = None
+
+    def loop_code(self):
+        return "\n".join(str(part) for part in [self.header, self.body]
+                         if part is not None)
+
+    def __str__(self):
+        if not self.pragma or state().in_parallel_loop:
+            code = self.loop_code()
+        else:
+            sequential = self.loop_code()
+            state().in_parallel_loop = True
+            try:
+                parallel = self.pragma + "\n" + self.loop_code()
+            finally:
+                state().in_parallel_loop = False
+            code = parallel
+            if self.iterations is not None:
+                code = (f"if (!omp_in_parallel() && "
+                        f"{self.iterations} >= {self.min_iterations})"
+                        "\n{\n" + indent_cpp(parallel) + "\n}\nelse\n{\n"
+                        + indent_cpp(sequential) + "\n}")
+        setup = str(self.setup)
+        return setup + "\n" + code if setup else code
+
+
+class CppTimeLimitCheck:
+    """Stops code running under a time limit, when it's exceeded (see
+    templates/time_limit.cpp). An exception can't leave a parallel loop,
+    so the loop skips its iterations instead (checking the time limit
+    variable, that it got from the thread, which started it), and the
+    check after the loop stops the code."""
+
+    def __init__(self, time_limit=None):
+        self.time_limit = time_limit
+
+    def __str__(self):
+        if state().in_parallel_loop and self.time_limit:
+            return f"if (time_limit_exceeded({self.time_limit})) continue;"
+        return "check_time_limit();"
+
+
 def cpp_eval(in_port, block):
     """Calculates the value for specified port (in_port),
     if value isnt present in the specified port, and assigns that value to
     the port.
     Returns the calculated value.
     """
-    port = Edge.edge_to[in_port.id].from_
+    port = state().edge_to[in_port.id].from_
 
     if not port.value:
         port.node.to_cpp(block)
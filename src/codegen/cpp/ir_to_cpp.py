@@ -3,8 +3,14 @@
 #
 """generate cpp"""
 
+from contextlib import nullcontext
 from .cpp_codegen import CppModule
+from ..error_free import mark_error_free_values
+from ..codegen_state import no_error
 
 
-def ir_to_cpp(module_name, functions: dict, definitions: dict):
-    return CppModule(module_name, functions, definitions)
+def ir_to_cpp(module_name, functions: dict, definitions: dict, context=None):
+    with context or nullcontext():
+        if not no_error():
+            mark_error_free_values()
+        return CppModule(module_name, functions, definitions, context)
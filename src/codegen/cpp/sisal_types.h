@@ -2,6 +2,10 @@
 #define SISAL_TYPES_H
 
 #include <type_traits>
+#include <memory>
+#include <algorithm>
+#include <vector>
+#include <cstdint>
 
 
 template<class T>
@@ -11,7 +15,7 @@ private:
 public:
     bool error;
     template <typename R>
-    constexpr SisalType<T> operator/(SisalType<R> const& rhs) noexcept
+    constexpr SisalType<T> operator/(SisalType<R> const& rhs) const noexcept
     {
         SisalType<T> result;
         if (rhs.get() == 0)
@@ -25,7 +29,7 @@ public:
         return result;
     }
     template <typename R>
-    constexpr SisalType<T> operator/(R const& rhs) noexcept
+    constexpr SisalType<T> operator/(R const& rhs) const noexcept
     {
         SisalType<T> result;
         if (rhs == 0)
@@ -38,10 +42,10 @@ public:
         }
         return result;
     }
-    operator T(){
+    operator T() const{
         return value;
     }
-    operator Json::Value(){
+    operator Json::Value() const{
         return value;
     }
     SisalType &operator = (const T &&new_value)
@@ -177,85 +181,1280 @@ constexpr SisalType<T> operator|(SisalType<T> const& lhs, SisalType<N> const& rh
 
 using namespace std;
 
+// random access iterator, that takes elements from their owner by
+// index (owner[index]); OpenMP needs random access iterators for
+// parallel range-based loops:
+template <typename Owner, typename Value>
+class IndexIterator{
+    public:
+        typedef std::random_access_iterator_tag iterator_category;
+        typedef Value value_type;
+        typedef long difference_type;
+        typedef const Value *pointer;
+        typedef Value reference;
+
+    private:
+        const Owner *items;
+        long index;
+
+    public:
+        IndexIterator ()
+        {
+            items = nullptr;
+            index = 0;
+        }
+
+        IndexIterator (const Owner *owner, long position)
+        {
+            items = owner;
+            index = position;
+        }
+
+        inline const Owner *owner() const
+        {
+            return items;
+        }
+
+        inline long position() const
+        {
+            return index;
+        }
+
+        inline Value operator * () const
+        {
+            return (*items)[index];
+        }
+
+        inline Value operator [] (long offset) const
+        {
+            return (*items)[index + offset];
+        }
+
+        inline IndexIterator &operator ++ ()
+        {
+            index++;
+            return *this;
+        }
+
+        inline IndexIterator operator ++ (int)
+        {
+            return IndexIterator(items, index++);
+        }
+
+        inline IndexIterator &operator -- ()
+        {
+            index--;
+            return *this;
+        }
+
+        inline IndexIterator operator -- (int)
+        {
+            return IndexIterator(items, index--);
+        }
+
+        inline IndexIterator &operator += (long offset)
+        {
+            index += offset;
+            return *this;
+        }
+
+        inline IndexIterator &operator -= (long offset)
+        {
+            index -= offset;
+            return *this;
+        }
+
+        inline IndexIterator operator + (long offset) const
+        {
+            return IndexIterator(items, index + offset);
+        }
+
+        inline IndexIterator operator - (long offset) const
+        {
+            return IndexIterator(items, index - offset);
+        }
+
+        inline long operator - (const IndexIterator &other) const
+        {
+            return index - other.index;
+        }
+
+        inline bool operator == (const IndexIterator &other) const
+        {
+            return index == other.index;
+        }
+
+        inline bool operator != (const IndexIterator &other) const
+        {
+            return index != other.index;
+        }
+
+        inline bool operator < (const IndexIterator &other) const
+        {
+            return index < other.index;
+        }
+
+        inline bool operator > (const IndexIterator &other) const
+        {
+            return index > other.index;
+        }
+
+        inline bool operator <= (const IndexIterator &other) const
+        {
+            return index <= other.index;
+        }
+
+        inline bool operator >= (const IndexIterator &other) const
+        {
+            return index >= other.index;
+        }
+};
+
+// non-owning, read-only view of a contiguous range of elements
+// (a minimal std::span, which needs C++20), or of packed Bits:
+template <typename T, typename Iterator = const T *>
+class ArrayView{
+    private:
+        Iterator first;
+        unsigned int length;
+    public:
+        ArrayView (Iterator data, unsigned int size)
+        {
+            first = data;
+            length = size;
+        }
+
+        inline decltype(auto) operator [] (int index) const
+        {
+            return first[index];
+        }
+
+        inline Iterator begin() const
+        {
+            return first;
+        }
+
+        inline Iterator end() const
+        {
+            return first + length;
+        }
+
+        inline unsigned int size() const
+        {
+            return length;
+        }
+};
+
+// Arrays share their element buffer: copying an Array (passing it to
+// a function, binding it to a new name, returning it) only copies a
+// reference-counted pointer. The buffer is copied when an Array that
+// shares it is about to be modified (copy-on-write).
+// Each Array sees a window (offset, length) of the buffer, so removing
+// elements from either end never copies, and the buffer keeps spare
+// room in front of the window so that adding elements at the front is
+// amortised O(1), like adding them at the back.
+// An Array that is the only owner of its buffer is modified in place;
+// code generator passes arrays that aren't used afterwards with
+// std::move, so addh(std::move(A), x) doesn't copy A.
 template <typename T>
 class Array{
     private:
-        vector<T> value;
+        shared_ptr<vector<T>> buffer;
+        unsigned int offset;
+        unsigned int length;
+
+        inline bool unique() const
+        {
+            return buffer.use_count() == 1;
+        }
+
+        // makes sure this Array is the only owner of its buffer
+        // before it gets modified:
+        inline vector<T> &detach()
+        {
+            if (!unique())
+            {
+                buffer = make_shared<vector<T>>(begin(), end());
+                offset = 0;
+            }
+            return *buffer;
+        }
+
+        // drops buffer elements behind the window, so the next push_back
+        // can simply append to the buffer:
+        inline vector<T> &detach_back()
+        {
+            vector<T> &items = detach();
+            items.resize(offset + length);
+            return items;
+        }
+
     public:
+        typedef const T *const_iterator;
         bool error;
         Array ()
         {
+            offset = 0;
+            length = 0;
             error = false;
         }
 
         Array (vector<T> init)
         {
-            value = init;
+            length = init.size();
+            offset = 0;
+            buffer = make_shared<vector<T>>(std::move(init));
             error = false;
         }
 
-        inline operator vector<T>(){
-            return value;
+        Array (const Array<T> &other) = default;
+        Array &operator = (const Array<T> &other) = default;
+
+        Array (Array<T> &&other) noexcept
+        {
+            buffer = std::move(other.buffer);
+            offset = other.offset;
+            length = other.length;
+            error = other.error;
+            other.offset = other.length = 0;
+        }
+
+        Array &operator = (Array<T> &&other) noexcept
+        {
+            buffer = std::move(other.buffer);
+            offset = other.offset;
+            length = other.length;
+            error = other.error;
+            other.offset = other.length = 0;
+            return *this;
+        }
+
+        inline operator vector<T>() const{
+            return vector<T>(begin(), end());
         }
 
         Array &operator = (const vector<T> &&new_value)
         {
-            value = new_value;
+            buffer = make_shared<vector<T>>(new_value);
+            offset = 0;
+            length = new_value.size();
             return *this;
         }
 
-        T operator [] (int index)
+        // element access returns references, so reading A[i]
+        // (or A[i][j] for nested arrays) doesn't copy anything.
+        // Elements are read-only, so reading never triggers a copy
+        // of a shared buffer:
+        inline const T &operator [] (int index) const
         {
-            return value[index];
+            return (*buffer)[offset + index];
         }
 
-        inline vector<T> get()
+        // iteration (used by scatters: for (const auto& x: A)):
+        inline const_iterator begin() const
         {
-            return value;
+            return buffer ? buffer->data() + offset : nullptr;
         }
 
-        Array<T> &operator || (const vector<T> &&appended)
+        inline const_iterator end() const
         {
-            value.insert(value.end(), appended.begin(), appended.end());
-            return *this;
+            return begin() + length;
+        }
+
+        // read-only view of the elements:
+        inline ArrayView<T> view() const
+        {
+            return ArrayView<T>(begin(), length);
+        }
+
+        // number of Arrays sharing the buffer (0 if there is none yet):
+        inline long use_count() const
+        {
+            return buffer.use_count();
+        }
+
+        inline void append(const Array<T> &appended)
+        {
+            if (!length && !error)
+            {
+                *this = appended;
+                return;
+            }
+            // (appended may share the buffer with this Array)
+            vector<T> items(appended.begin(), appended.end());
+            vector<T> &target = detach_back();
+            target.insert(target.end(), items.begin(), items.end());
+            length += items.size();
+            error |= appended.error;
+        }
+
+        inline void reserve(unsigned int capacity)
+        {
+            detach_back().reserve(offset + capacity);
         }
 
         inline void push_back(T item)
         {
-            value.push_back(item);
+            detach_back().push_back(item);
+            length++;
         }
 
         inline void push_front(T item)
         {
-            value.insert(value.begin(), item);
+            if (!unique() || !offset)
+            {
+                // move the elements to a new buffer with spare room
+                // in front of them:
+                unsigned int room = length ? length : 1;
+                auto grown = make_shared<vector<T>>(room + length);
+                std::copy(begin(), end(), grown->begin() + room);
+                buffer = grown;
+                offset = room;
+            }
+            (*buffer)[--offset] = item;
+            length++;
+        }
+
+        // (removing from an empty array leaves it empty, the length
+        // is unsigned)
+        inline void pop_back()
+        {
+            if (length == 0) return;
+            length--;
+        }
+
+        inline void pop_front()
+        {
+            if (length == 0) return;
+            offset++;
+            length--;
+        }
+
+        inline unsigned int size() const
+        {
+            return length;
+        }
+        void set_error()
+        {
+            vector<T> &items = detach();
+            for(unsigned int index = offset; index < offset + length; index++)
+            {
+                items[index].set_error();
+            }
+            error = true;
+        }
+};
+
+// Packed bits, like vector<bool>, but with access to the words holding
+// them, so that ranges of bits are copied, filled, combined and counted
+// a word at a time. Bits past the end of the last word are kept 0.
+class Bits{
+    public:
+        typedef uint64_t Word;
+        typedef bool const_reference;
+        static constexpr unsigned int WORD_BITS = 64;
+
+        class reference{
+            private:
+                Bits *bits;
+                unsigned int index;
+            public:
+                reference (Bits *owner, unsigned int position)
+                {
+                    bits = owner;
+                    index = position;
+                }
+
+                inline operator bool () const
+                {
+                    return bits->get(index);
+                }
+
+                inline reference &operator = (bool value)
+                {
+                    bits->set(index, value);
+                    return *this;
+                }
+        };
+
+        typedef IndexIterator<Bits, bool> const_iterator;
+
+    private:
+        vector<Word> words;
+        unsigned int length;
+
+        static inline unsigned int words_for(unsigned int size)
+        {
+            return (size + WORD_BITS - 1) / WORD_BITS;
+        }
+
+        // the lowest count bits of a word:
+        static inline Word low_bits(Word word, unsigned int count)
+        {
+            return count < WORD_BITS ? word & ((Word(1) << count) - 1) : word;
+        }
+
+    public:
+        Bits ()
+        {
+            length = 0;
+        }
+
+        explicit Bits (unsigned int size, bool value = false) : Bits()
+        {
+            append_fill(size, value);
+        }
+
+        // a copy of a range of bits:
+        Bits (const_iterator first, const_iterator last) : Bits()
+        {
+            if (first != last)
+                append(*first.owner(), first.position(), last.position());
+        }
+
+        inline unsigned int size() const
+        {
+            return length;
+        }
+
+        inline bool empty() const
+        {
+            return !length;
+        }
+
+        inline void reserve(unsigned int capacity)
+        {
+            words.reserve(words_for(capacity));
+        }
+
+        inline bool get(unsigned int index) const
+        {
+            return words[index / WORD_BITS] >> (index % WORD_BITS) & 1;
+        }
+
+        inline void set(unsigned int index, bool value)
+        {
+            Word bit = Word(1) << (index % WORD_BITS);
+            if (value)
+                words[index / WORD_BITS] |= bit;
+            else
+                words[index / WORD_BITS] &= ~bit;
+        }
+
+        inline bool operator [] (unsigned int index) const
+        {
+            return get(index);
+        }
+
+        inline reference operator [] (unsigned int index)
+        {
+            return reference(this, index);
+        }
+
+        inline const_iterator begin() const
+        {
+            return const_iterator(this, 0);
+        }
+
+        inline const_iterator end() const
+        {
+            return const_iterator(this, length);
+        }
+
+        // WORD_BITS bits starting from bit first (0 past the end):
+        inline Word word_at(unsigned int first) const
+        {
+            unsigned int index = first / WORD_BITS;
+            unsigned int shift = first % WORD_BITS;
+            if (index >= words.size())
+                return 0;
+            Word word = words[index] >> shift;
+            if (shift && index + 1 < words.size())
+                word |= words[index + 1] << (WORD_BITS - shift);
+            return word;
+        }
+
+        // appends the lowest count bits of word:
+        inline void append_word(Word word, unsigned int count)
+        {
+            word = low_bits(word, count);
+            unsigned int shift = length % WORD_BITS;
+            if (!shift)
+                words.push_back(word);
+            else
+            {
+                words.back() |= word << shift;
+                if (shift + count > WORD_BITS)
+                    words.push_back(word >> (WORD_BITS - shift));
+            }
+            length += count;
+        }
+
+        inline void push_back(bool value)
+        {
+            append_word(value, 1);
+        }
+
+        void append_fill(unsigned int count, bool value)
+        {
+            for (; count >= WORD_BITS; count -= WORD_BITS)
+                append_word(value ? ~Word(0) : 0, WORD_BITS);
+            if (count)
+                append_word(value ? ~Word(0) : 0, count);
+        }
+
+        // appends bits of other from first up to last:
+        void append(const Bits &other, unsigned int first, unsigned int last)
+        {
+            for (unsigned int index = first; index < last; index += WORD_BITS)
+                append_word(other.word_at(index),
+                            std::min(WORD_BITS, last - index));
+        }
+
+        void resize(unsigned int size, bool value = false)
+        {
+            if (size > length)
+            {
+                append_fill(size - length, value);
+                return;
+            }
+            length = size;
+            words.resize(words_for(size));
+            if (length % WORD_BITS)
+                words.back() = low_bits(words.back(), length % WORD_BITS);
+        }
+
+        // inserts bits from first up to last before position:
+        void insert(const_iterator position,
+                    const_iterator first, const_iterator last)
+        {
+            Bits inserted(first, last);
+            Bits tail(position, end());
+            resize(position.position());
+            append(inserted, 0, inserted.size());
+            append(tail, 0, tail.size());
+        }
+
+        void insert(const_iterator position, unsigned int count, bool value)
+        {
+            Bits tail(position, end());
+            resize(position.position());
+            append_fill(count, value);
+            append(tail, 0, tail.size());
+        }
+
+        void fill(unsigned int first, unsigned int last, bool value)
+        {
+            for (unsigned int index = first; index < last;)
+            {
+                unsigned int shift = index % WORD_BITS;
+                unsigned int count = std::min(WORD_BITS - shift, last - index);
+                Word mask = low_bits(~Word(0), count) << shift;
+                if (value)
+                    words[index / WORD_BITS] |= mask;
+                else
+                    words[index / WORD_BITS] &= ~mask;
+                index += count;
+            }
+        }
+
+        // number of set bits from first up to last:
+        unsigned int count(unsigned int first, unsigned int last) const
+        {
+            unsigned int result = 0;
+            for (unsigned int index = first; index < last; index += WORD_BITS)
+                result += __builtin_popcountll(
+                    low_bits(word_at(index), last - index));
+            return result;
+        }
+
+        bool any(unsigned int first, unsigned int last) const
+        {
+            for (unsigned int index = first; index < last; index += WORD_BITS)
+                if (low_bits(word_at(index), last - index))
+                    return true;
+            return false;
+        }
+};
+
+// Element buffer of arrays of scalars: plain values, and the error
+// flags of the values in a bitmap. The bitmap is only made once some
+// value gets an error, while it's empty, no value has an error and
+// elements are read, copied and saved without looking at the flags.
+// Values of boolean arrays are packed into Bits as well.
+template <typename T>
+class ScalarBuffer{
+    public:
+        typedef std::conditional_t<std::is_same_v<T, bool>, Bits, vector<T>>
+            Values;
+        Values values;
+        Bits errors;
+
+        ScalarBuffer () {}
+
+        ScalarBuffer (unsigned int size) : values(size) {}
+
+        // a copy of the values from first up to last:
+        ScalarBuffer (const ScalarBuffer &other,
+                      unsigned int first, unsigned int last)
+            : values(other.values.begin() + first,
+                     other.values.begin() + last)
+        {
+            if (other.has_errors())
+                errors.append(other.errors, first, last);
+        }
+
+        inline bool has_errors() const
+        {
+            return !errors.empty();
+        }
+
+        // checks if any of the values from first up to last has an error:
+        inline bool has_errors(unsigned int first, unsigned int last) const
+        {
+            return has_errors() && errors.any(first, last);
+        }
+
+        inline SisalType<T> get(unsigned int index) const
+        {
+            SisalType<T> item = values[index];
+            item.error = has_errors() && errors[index];
+            return item;
+        }
+
+        inline void set_error(unsigned int index, bool error)
+        {
+            if (!has_errors())
+            {
+                if (!error)
+                    return;
+                errors.resize(values.size());
+            }
+            errors[index] = error;
+        }
+
+        inline void set(unsigned int index, const SisalType<T> &item)
+        {
+            values[index] = item.get();
+            set_error(index, item.error);
+        }
+
+        inline void push_back(const SisalType<T> &item)
+        {
+            values.push_back(item.get());
+            if (has_errors())
+                errors.push_back(item.error);
+            else
+                set_error(values.size() - 1, item.error);
+        }
+
+        inline void resize(unsigned int size)
+        {
+            values.resize(size);
+            if (has_errors())
+                errors.resize(size);
+        }
+
+        // inserts the values of other from first up to last
+        // before position:
+        void insert(unsigned int position, const ScalarBuffer &other,
+                    unsigned int first, unsigned int last)
+        {
+            if (&other == this)
+            {
+                ScalarBuffer copy(other, first, last);
+                insert(position, copy, 0, last - first);
+                return;
+            }
+            values.insert(values.begin() + position,
+                          other.values.begin() + first,
+                          other.values.begin() + last);
+            if (!has_errors() && !other.has_errors())
+                return;
+            if (!has_errors())
+                errors.resize(values.size() - (last - first));
+            if (other.has_errors())
+                errors.insert(errors.begin() + position,
+                              other.errors.begin() + first,
+                              other.errors.begin() + last);
+            else
+                errors.insert(errors.begin() + position, last - first, false);
+        }
+
+        // sets the error flags of the values from first up to last:
+        void set_errors(unsigned int first, unsigned int last)
+        {
+            if (!has_errors())
+                errors.resize(values.size());
+            errors.fill(first, last, true);
+        }
+};
+
+// Arrays of scalars (array[integer] and the like) work like Array<T>,
+// but keep their elements in a ScalarBuffer instead of a vector of
+// SisalTypes, that stores an error flag next to every value. Elements
+// are made from a value and its flag when they are read, so A[i] and
+// the iterators return them by value; value(i) and view() read the
+// plain values, when the code generator knows they have no errors.
+template <typename T>
+class Array<SisalType<T>>{
+    public:
+        typedef SisalType<T> Element;
+        typedef typename ScalarBuffer<T>::Values Values;
+
+        typedef IndexIterator<Array, Element> const_iterator;
+
+    private:
+        shared_ptr<ScalarBuffer<T>> buffer;
+        unsigned int offset;
+        unsigned int length;
+
+        // (two-dimensional arrays copy rows' elements between buffers)
+        friend class Array<Array<Element>>;
+
+        inline bool unique() const
+        {
+            return buffer.use_count() == 1;
+        }
+
+        inline ScalarBuffer<T> &detach()
+        {
+            if (!buffer)
+            {
+                buffer = make_shared<ScalarBuffer<T>>();
+                offset = 0;
+            }
+            else if (!unique())
+            {
+                buffer = make_shared<ScalarBuffer<T>>(*buffer, offset,
+                                                      offset + length);
+                offset = 0;
+            }
+            return *buffer;
+        }
+
+        inline ScalarBuffer<T> &detach_back()
+        {
+            ScalarBuffer<T> &items = detach();
+            items.resize(offset + length);
+            return items;
+        }
+
+    public:
+        bool error;
+        Array ()
+        {
+            offset = 0;
+            length = 0;
+            error = false;
+        }
+
+        Array (const vector<Element> &init) : Array()
+        {
+            ScalarBuffer<T> &items = detach();
+            items.values.reserve(init.size());
+            for (const Element &item: init)
+                items.push_back(item);
+            length = init.size();
+        }
+
+        // an array of values without errors, made of a vector of them
+        // (without copying it):
+        static Array of_values(vector<T> &&values)
+        {
+            Array result;
+            result.length = values.size();
+            result.buffer = make_shared<ScalarBuffer<T>>();
+            result.buffer->values = std::move(values);
+            return result;
+        }
+
+        // a window of an existing buffer (rows of two-dimensional
+        // arrays are handed out this way, without copying them):
+        static Array window(shared_ptr<ScalarBuffer<T>> shared,
+                            unsigned int first, unsigned int size)
+        {
+            Array result;
+            result.buffer = std::move(shared);
+            result.offset = first;
+            result.length = size;
+            return result;
+        }
+
+        Array (const Array &other) = default;
+        Array &operator = (const Array &other) = default;
+
+        Array (Array &&other) noexcept
+        {
+            buffer = std::move(other.buffer);
+            offset = other.offset;
+            length = other.length;
+            error = other.error;
+            other.offset = other.length = 0;
+        }
+
+        Array &operator = (Array &&other) noexcept
+        {
+            buffer = std::move(other.buffer);
+            offset = other.offset;
+            length = other.length;
+            error = other.error;
+            other.offset = other.length = 0;
+            return *this;
+        }
+
+        inline operator vector<Element>() const{
+            vector<Element> items;
+            items.reserve(length);
+            for (unsigned int index = 0; index < length; index++)
+                items.push_back((*this)[index]);
+            return items;
+        }
+
+        Array &operator = (const vector<Element> &&new_value)
+        {
+            bool had_error = error;
+            *this = Array(new_value);
+            error = had_error;
+            return *this;
+        }
+
+        inline Element operator [] (int index) const
+        {
+            return buffer->get(offset + index);
+        }
+
+        // A[i] without its error flag:
+        inline typename Values::const_reference value(int index) const
+        {
+            return buffer->values[offset + index];
+        }
+
+        // checks if any element has an error:
+        inline bool element_errors() const
+        {
+            return buffer && buffer->has_errors(offset, offset + length);
+        }
+
+        inline const_iterator begin() const
+        {
+            return const_iterator(this, 0);
+        }
+
+        inline const_iterator end() const
+        {
+            return const_iterator(this, length);
+        }
+
+        // read-only view of the values (without error flags):
+        inline ArrayView<T, typename Values::const_iterator> view() const
+        {
+            return ArrayView<T, typename Values::const_iterator>(
+                buffer ? buffer->values.begin() + offset
+                       : typename Values::const_iterator(), length);
+        }
+
+        inline long use_count() const
+        {
+            return buffer.use_count();
+        }
+
+        inline void append(const Array &appended)
+        {
+            if (!length && !error)
+            {
+                *this = appended;
+                return;
+            }
+            if (appended.length)
+            {
+                ScalarBuffer<T> &items = detach_back();
+                items.insert(offset + length, *appended.buffer,
+                             appended.offset,
+                             appended.offset + appended.length);
+                length += appended.length;
+            }
+            error |= appended.error;
+        }
+
+        inline void reserve(unsigned int capacity)
+        {
+            detach_back().values.reserve(offset + capacity);
+        }
+
+        inline void push_back(const Element &item)
+        {
+            detach_back().push_back(item);
+            length++;
+        }
+
+        inline void push_front(const Element &item)
+        {
+            if (!unique() || !offset)
+            {
+                // move the elements to a new buffer with spare room
+                // in front of them:
+                unsigned int room = length ? length : 1;
+                auto grown = make_shared<ScalarBuffer<T>>(room);
+                if (length)
+                    grown->insert(room, *buffer, offset, offset + length);
+                buffer = grown;
+                offset = room;
+            }
+            buffer->set(--offset, item);
+            length++;
+        }
+
+        // (removing from an empty array leaves it empty, the length
+        // is unsigned)
+        inline void pop_back()
+        {
+            if (length == 0) return;
+            length--;
+        }
+
+        inline void pop_front()
+        {
+            if (length == 0) return;
+            offset++;
+            length--;
+        }
+
+        inline unsigned int size() const
+        {
+            return length;
+        }
+
+        void set_error()
+        {
+            ScalarBuffer<T> &items = detach();
+            items.set_errors(offset, offset + length);
+            error = true;
+        }
+
+        // (boolean arrays only) number of true elements:
+        inline unsigned int count() const
+        {
+            return buffer ? buffer->values.count(offset, offset + length) : 0;
+        }
+
+        // (boolean arrays only) element-wise operation on two arrays,
+        // applied to whole words of their values; elements get errors
+        // of both operands, and arrays of different sizes give an error:
+        template <typename Operation>
+        Array combine(const Array &other, Operation operation) const
+        {
+            Array result;
+            unsigned int size = std::min(length, other.length);
+            ScalarBuffer<T> &items = result.detach();
+            items.values.reserve(size);
+            bool errors = element_errors() || other.element_errors();
+            for (unsigned int index = 0; index < size;
+                 index += Bits::WORD_BITS)
+            {
+                unsigned int count = std::min(Bits::WORD_BITS, size - index);
+                items.values.append_word(
+                    operation(buffer->values.word_at(offset + index),
+                              other.buffer->values.word_at(
+                                  other.offset + index)),
+                    count);
+                if (errors)
+                    items.errors.append_word(
+                        buffer->errors.word_at(offset + index) |
+                        other.buffer->errors.word_at(other.offset + index),
+                        count);
+            }
+            result.length = size;
+            result.error = error || other.error || length != other.length;
+            return result;
+        }
+};
+
+// Two-dimensional arrays of scalars (array[array[real]] and the like)
+// keep all their elements in one contiguous buffer, row after row,
+// instead of a separate buffer for every row. A table of row starts
+// says where each row begins (and the previous one ends), so A[i, k]
+// (at(i, k)) is one lookup in the buffer, and a row A[i] is a window
+// of the buffer, handed out without copying.
+// Like Array<T>, the buffer and the table are shared between copies
+// until one of them is modified, and the array sees a window of rows
+// (first, rows) of them.
+template <typename T>
+class Array<Array<SisalType<T>>>{
+    public:
+        typedef SisalType<T> Element;
+        typedef Array<Element> Row;
+
+        typedef IndexIterator<Array, Row> const_iterator;
+
+    private:
+        shared_ptr<ScalarBuffer<T>> buffer;
+        // row r occupies buffer elements from (*starts)[r]
+        // up to (*starts)[r + 1]:
+        shared_ptr<vector<unsigned int>> starts;
+        // error flags of the rows, only made once a row has an error:
+        shared_ptr<vector<char>> row_errors;
+        unsigned int first;
+        unsigned int rows;
+
+        // makes sure this Array is the only owner of its buffer and
+        // tables, and that they end with its last row, so that rows
+        // can be appended to them:
+        inline void detach_back()
+        {
+            if (!starts)
+            {
+                buffer = make_shared<ScalarBuffer<T>>();
+                starts = make_shared<vector<unsigned int>>(1, 0);
+            }
+            unsigned int begin = (*starts)[first];
+            unsigned int end = (*starts)[first + rows];
+            if (buffer.use_count() != 1 || starts.use_count() != 1)
+            {
+                buffer = make_shared<ScalarBuffer<T>>(*buffer, begin, end);
+                auto moved = make_shared<vector<unsigned int>>();
+                moved->reserve(rows + 1);
+                for (unsigned int row = first; row <= first + rows; row++)
+                    moved->push_back((*starts)[row] - begin);
+                starts = moved;
+                if (row_errors)
+                    row_errors = make_shared<vector<char>>(
+                        row_errors->begin() + first,
+                        row_errors->begin() + first + rows);
+                first = 0;
+            }
+            else
+            {
+                buffer->resize(end);
+                starts->resize(first + rows + 1);
+                if (row_errors)
+                    row_errors->resize(first + rows);
+            }
+        }
+
+        inline void set_row_error(unsigned int row, bool row_error)
+        {
+            if (!row_errors && row_error)
+                row_errors = make_shared<vector<char>>(first + rows, 0);
+            if (row_errors)
+                (*row_errors)[row] = row_error;
+        }
+
+    public:
+        bool error;
+        Array ()
+        {
+            first = 0;
+            rows = 0;
+            error = false;
+        }
+
+        Array (vector<Row> init) : Array()
+        {
+            for (const Row &row: init)
+                push_back(row);
+        }
+
+        // an array with rows made of elements, the table of row
+        // starts has an extra item, the end of the last row:
+        static Array flat(vector<Element> elements,
+                          vector<unsigned int> row_starts)
+        {
+            Array result;
+            result.rows = row_starts.size() - 1;
+            result.buffer = make_shared<ScalarBuffer<T>>();
+            result.buffer->values.reserve(elements.size());
+            for (const Element &item: elements)
+                result.buffer->push_back(item);
+            result.starts = make_shared<vector<unsigned int>>(
+                std::move(row_starts));
+            return result;
+        }
+
+        Array (const Array &other) = default;
+        Array &operator = (const Array &other) = default;
+
+        Array (Array &&other) noexcept
+        {
+            *this = std::move(other);
+        }
+
+        Array &operator = (Array &&other) noexcept
+        {
+            buffer = std::move(other.buffer);
+            starts = std::move(other.starts);
+            row_errors = std::move(other.row_errors);
+            first = other.first;
+            rows = other.rows;
+            error = other.error;
+            other.first = other.rows = 0;
+            return *this;
+        }
+
+        inline operator vector<Row>() const{
+            return vector<Row>(begin(), end());
+        }
+
+        Array &operator = (const vector<Row> &&new_value)
+        {
+            bool had_error = error;
+            *this = Array(new_value);
+            error = had_error;
+            return *this;
+        }
+
+        inline Row operator [] (int index) const
+        {
+            unsigned int begin = (*starts)[first + index];
+            Row row = Row::window(buffer, begin,
+                                  (*starts)[first + index + 1] - begin);
+            row.error = row_errors && (*row_errors)[first + index];
+            return row;
+        }
+
+        // A[row][column] without making the row:
+        inline Element at(int row, int column) const
+        {
+            return buffer->get((*starts)[first + row] + column);
+        }
+
+        // A[row][column] without its error flag:
+        inline typename Row::Values::const_reference
+        value_at(int row, int column) const
+        {
+            return buffer->values[(*starts)[first + row] + column];
+        }
+
+        inline const_iterator begin() const
+        {
+            return const_iterator(this, 0);
+        }
+
+        inline const_iterator end() const
+        {
+            return const_iterator(this, rows);
+        }
+
+        inline long use_count() const
+        {
+            return buffer.use_count();
+        }
+
+        inline void append(const Array &appended)
+        {
+            if (!rows && !error)
+            {
+                *this = appended;
+                return;
+            }
+            // (appended may be this Array)
+            unsigned int count = appended.rows;
+            for (unsigned int row = 0; row < count; row++)
+                push_back(appended[row]);
+            error |= appended.error;
+        }
+
+        inline void reserve(unsigned int capacity)
+        {
+            detach_back();
+            starts->reserve(first + capacity + 1);
+        }
+
+        inline void push_back(const Row &row)
+        {
+            detach_back();
+            if (row.length)
+                buffer->insert(buffer->values.size(), *row.buffer,
+                               row.offset, row.offset + row.length);
+            starts->push_back(buffer->values.size());
+            rows++;
+            if (row_errors)
+                row_errors->push_back(0);
+            set_row_error(first + rows - 1, row.error);
         }
 
+        // (unlike Array<T>::push_front, it moves all the elements)
+        inline void push_front(const Row &row)
+        {
+            detach_back();
+            unsigned int begin = (*starts)[first];
+            if (row.length)
+                buffer->insert(begin, *row.buffer,
+                               row.offset, row.offset + row.length);
+            starts->insert(starts->begin() + first + 1, begin);
+            for (unsigned int index = first + 1; index <= first + rows + 1;
+                 index++)
+                (*starts)[index] += row.size();
+            rows++;
+            if (row_errors)
+                row_errors->insert(row_errors->begin() + first, 0);
+            set_row_error(first, row.error);
+        }
+
+        // (removing from an empty array leaves it empty)
         inline void pop_back()
         {
-            value.pop_back();
+            if (rows == 0) return;
+            rows--;
         }
 
         inline void pop_front()
         {
-            value.erase(value.begin());
+            if (rows == 0) return;
+            first++;
+            rows--;
         }
 
-        inline unsigned int size()
+        inline unsigned int size() const
         {
-            return value.size();
+            return rows;
         }
+
         void set_error()
         {
-            for(auto &item: value)
+            detach_back();
+            buffer->set_errors((*starts)[first], (*starts)[first + rows]);
+            for (unsigned int row = first; row < first + rows; row++)
             {
-                item.set_error();
+                set_row_error(row, true);
             }
             error = true;
         }
 };
 
+// concatenation (A || B) creates a new array, operands stay unchanged:
+template <typename T>
+Array<T> operator || (const Array<T> &lhs, const Array<T> &rhs)
+{
+    Array<T> result = lhs;
+    result.append(rhs);
+    return result;
+}
+
+// if the left operand isn't used afterwards (it is passed with
+// std::move), the right one is appended to it in place:
+template <typename T>
+Array<T> operator || (Array<T> &&lhs, const Array<T> &rhs)
+{
+    lhs.append(rhs);
+    return std::move(lhs);
+}
+
 typedef SisalType<int> integer;
 typedef SisalType<float> real;
 typedef SisalType<bool> boolean;
 
+// element-wise A & B and A | B of boolean arrays:
+inline Array<boolean> operator & (const Array<boolean> &lhs,
+                                  const Array<boolean> &rhs)
+{
+    return lhs.combine(rhs, [](Bits::Word a, Bits::Word b) { return a & b; });
+}
+
+inline Array<boolean> operator | (const Array<boolean> &lhs,
+                                  const Array<boolean> &rhs)
+{
+    return lhs.combine(rhs, [](Bits::Word a, Bits::Word b) { return a | b; });
+}
+
 #endif
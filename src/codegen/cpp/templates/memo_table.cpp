@@ -0,0 +1,225 @@
+// used for memoized functions: results of calls are kept by their
+// arguments (compared by contents of arrays and fields of records).
+// A table keeps a bounded number of results, it is split into shards
+// with locks of their own, so the functions may be called from parallel
+// loops. A full shard evicts entries with the CLOCK algorithm: an entry
+// used since the clock hand passed it last time gets another round.
+
+inline void memo_combine(size_t &seed, size_t hash)
+{
+  seed ^= hash + 0x9e3779b97f4a7c15ULL + (seed << 6) + (seed >> 2);
+}
+
+template <typename T, typename = void>
+struct has_error_flag : std::false_type {};
+
+template <typename T>
+struct has_error_flag<T, std::void_t<decltype(std::declval<T>().error)>>
+  : std::true_type {};
+
+// (declared first, since they call each other)
+template <typename T>
+std::enable_if_t<std::is_arithmetic_v<T>, size_t> memo_hash(const T &value);
+template <typename T>
+size_t memo_hash(const Array<T> &A);
+template <typename... T>
+size_t memo_hash(const std::tuple<T...> &values);
+template <typename T>
+auto memo_hash(const T &record) -> decltype(record.memo_key(), size_t());
+
+template <typename T>
+std::enable_if_t<std::is_arithmetic_v<T>, bool>
+memo_equal(const T &a, const T &b);
+template <typename T>
+bool memo_equal(const Array<T> &A, const Array<T> &B);
+template <typename... T>
+bool memo_equal(const std::tuple<T...> &a, const std::tuple<T...> &b);
+template <typename T>
+auto memo_equal(const T &a, const T &b) -> decltype(a.memo_key(), bool());
+
+#ifdef SISAL_TYPES_H
+template <typename T>
+size_t memo_hash(const SisalType<T> &value)
+{
+  size_t seed = std::hash<T>()(value.get());
+  memo_combine(seed, value.error);
+  return seed;
+}
+
+template <typename T>
+bool memo_equal(const SisalType<T> &a, const SisalType<T> &b)
+{
+  return a.error == b.error && a.get() == b.get();
+}
+#endif
+
+template <typename T>
+std::enable_if_t<std::is_arithmetic_v<T>, size_t> memo_hash(const T &value)
+{
+  return std::hash<T>()(value);
+}
+
+template <typename T>
+size_t memo_hash(const Array<T> &A)
+{
+  size_t seed = A.size();
+  if constexpr (has_error_flag<Array<T>>::value)
+    memo_combine(seed, A.error);
+  for (size_t index = 0; index < A.size(); index++)
+    memo_combine(seed, memo_hash(static_cast<const T &>(A[index])));
+  return seed;
+}
+
+template <typename... T>
+size_t memo_hash(const std::tuple<T...> &values)
+{
+  size_t seed = 0;
+  std::apply([&seed](const auto &... value) {
+    (memo_combine(seed, memo_hash(value)), ...);
+  }, values);
+  return seed;
+}
+
+template <typename T>
+auto memo_hash(const T &record) -> decltype(record.memo_key(), size_t())
+{
+  return memo_hash(record.memo_key());
+}
+
+template <typename T>
+std::enable_if_t<std::is_arithmetic_v<T>, bool>
+memo_equal(const T &a, const T &b)
+{
+  return a == b;
+}
+
+template <typename T>
+bool memo_equal(const Array<T> &A, const Array<T> &B)
+{
+  if (A.size() != B.size())
+    return false;
+  if constexpr (has_error_flag<Array<T>>::value)
+    if (A.error != B.error)
+      return false;
+  for (size_t index = 0; index < A.size(); index++)
+    if (!memo_equal(static_cast<const T &>(A[index]),
+                    static_cast<const T &>(B[index])))
+      return false;
+  return true;
+}
+
+template <typename... T>
+bool memo_equal(const std::tuple<T...> &a, const std::tuple<T...> &b)
+{
+  return std::apply([&b](const auto &... a_values) {
+    return std::apply([&](const auto &... b_values) {
+      return (memo_equal(a_values, b_values) && ...);
+    }, b);
+  }, a);
+}
+
+template <typename T>
+auto memo_equal(const T &a, const T &b) -> decltype(a.memo_key(), bool())
+{
+  return memo_equal(a.memo_key(), b.memo_key());
+}
+
+template <typename Result, typename... Args>
+class MemoTable{
+
+  private:
+    static constexpr size_t SHARDS = 64;
+    typedef std::tuple<Args...> Key;
+
+    struct Entry{
+      Key key;
+      Result result;
+      size_t hash;
+      bool referenced;
+    };
+
+    struct alignas(64) Shard{
+      std::mutex lock;
+      std::vector<Entry> entries;
+      // hashes of the keys to the entries' positions:
+      std::unordered_multimap<size_t, size_t> positions;
+      size_t hand = 0;
+    };
+
+    Shard shards[SHARDS];
+    size_t shard_capacity;
+
+    // (true if the key is in the table, position gets its entry)
+    bool find(Shard &shard, const Key &key, size_t hash, size_t &position)
+    {
+      auto range = shard.positions.equal_range(hash);
+      for (auto item = range.first; item != range.second; ++item)
+        if (memo_equal(shard.entries[item->second].key, key))
+        {
+          position = item->second;
+          return true;
+        }
+      return false;
+    }
+
+    void forget(Shard &shard, size_t position)
+    {
+      auto range = shard.positions.equal_range(shard.entries[position].hash);
+      for (auto item = range.first; item != range.second; ++item)
+        if (item->second == position)
+        {
+          shard.positions.erase(item);
+          return;
+        }
+    }
+
+    void insert(Shard &shard, Key &&key, size_t hash, const Result &result)
+    {
+      size_t position;
+      if (find(shard, key, hash, position))
+        // (another thread has got it first)
+        return;
+      position = shard.entries.size();
+      if (position < shard_capacity)
+        shard.entries.push_back({std::move(key), result, hash, false});
+      else
+      {
+        while (shard.entries[shard.hand].referenced)
+        {
+          shard.entries[shard.hand].referenced = false;
+          shard.hand = (shard.hand + 1) % shard.entries.size();
+        }
+        position = shard.hand;
+        shard.hand = (shard.hand + 1) % shard.entries.size();
+        forget(shard, position);
+        shard.entries[position] = {std::move(key), result, hash, false};
+      }
+      shard.positions.emplace(hash, position);
+    }
+
+  public:
+    MemoTable(size_t capacity)
+      : shard_capacity(std::max<size_t>(capacity / SHARDS, 1)) {}
+
+    template <typename Function>
+    Result call(Function function, const Args &... args)
+    {
+      Key key(args...);
+      size_t hash = memo_hash(key);
+      Shard &shard = shards[hash % SHARDS];
+      {
+        std::lock_guard<std::mutex> guard(shard.lock);
+        size_t position;
+        if (find(shard, key, hash, position))
+        {
+          shard.entries[position].referenced = true;
+          return shard.entries[position].result;
+        }
+      }
+      // (computed without the lock: the function may call itself)
+      Result result = function(args...);
+      std::lock_guard<std::mutex> guard(shard.lock);
+      insert(shard, std::move(key), hash, result);
+      return result;
+    }
+};
@@ -0,0 +1,171 @@
+// used for time-limiting executions of functions (max_time pragma).
+// A timed call runs in the calling thread, a single watchdog thread
+// keeps the deadlines of the calls (on the monotonic clock) in a heap
+// and marks the ones that pass. The timed code checks the mark when it
+// enters a function and at every iteration of its loops, and unwinds
+// to the timed call (with TimeLimitExceeded), which then returns a
+// value with the error flag set. A nested timed call, that would end
+// later than the one it's in, shares its deadline. Exceptions can't
+// leave a parallel region, so a parallel loop of the timed call skips
+// its remaining iterations instead, the check after the loop stops
+// the call.
+
+struct TimeLimitExceeded {};
+
+class Watchdog{
+
+  public:
+    typedef std::chrono::steady_clock Clock;
+
+    struct Timer{
+      Clock::time_point deadline;
+      int level;
+      std::atomic<bool> expired{false};
+    };
+
+  private:
+    struct Later{
+      bool operator()(const Timer *a, const Timer *b) const
+      {
+        return a->deadline > b->deadline;
+      }
+    };
+
+    std::mutex lock;
+    std::condition_variable changed;
+    // (a heap of the timers, the earliest deadline on top)
+    std::vector<Timer *> timers;
+    std::thread thread;
+    bool stopping = false;
+
+    void watch()
+    {
+      std::unique_lock<std::mutex> guard(lock);
+      while (!stopping)
+        if (timers.empty())
+          changed.wait(guard);
+        else if (Clock::now() >= timers.front()->deadline)
+        {
+          timers.front()->expired.store(true, std::memory_order_relaxed);
+          std::pop_heap(timers.begin(), timers.end(), Later());
+          timers.pop_back();
+        }
+        else
+          changed.wait_until(guard, timers.front()->deadline);
+    }
+
+  public:
+    ~Watchdog()
+    {
+      {
+        std::lock_guard<std::mutex> guard(lock);
+        stopping = true;
+      }
+      changed.notify_one();
+      if (thread.joinable())
+        thread.join();
+    }
+
+    void add(Timer *timer)
+    {
+      std::lock_guard<std::mutex> guard(lock);
+      if (!thread.joinable())
+        thread = std::thread(&Watchdog::watch, this);
+      timers.push_back(timer);
+      std::push_heap(timers.begin(), timers.end(), Later());
+      // (the watchdog waits for an earlier deadline otherwise)
+      if (timers.front() == timer)
+        changed.notify_one();
+    }
+
+    void remove(Timer *timer)
+    {
+      std::lock_guard<std::mutex> guard(lock);
+      auto position = std::find(timers.begin(), timers.end(), timer);
+      if (position != timers.end())
+      {
+        timers.erase(position);
+        std::make_heap(timers.begin(), timers.end(), Later());
+      }
+    }
+};
+
+inline Watchdog watchdog;
+// the deadline of the timed call the thread is in:
+inline thread_local Watchdog::Timer *time_limit = nullptr;
+
+inline bool time_limit_exceeded(const Watchdog::Timer *limit)
+{
+  return limit && limit->expired.load(std::memory_order_relaxed);
+}
+
+inline void check_time_limit()
+{
+  if (time_limit && time_limit->expired.load(std::memory_order_relaxed) &&
+      omp_get_level() == time_limit->level)
+    throw TimeLimitExceeded();
+}
+
+class TimeLimit{
+
+  private:
+    Watchdog::Timer timer;
+    Watchdog::Timer *parent;
+
+  public:
+    TimeLimit(double seconds) : parent(time_limit)
+    {
+      timer.deadline = Watchdog::Clock::now() +
+        std::chrono::round<std::chrono::milliseconds>(
+          std::chrono::duration<double>(seconds));
+      if (parent && parent->deadline <= timer.deadline &&
+          parent->level == omp_get_level())
+        return;
+      timer.level = omp_get_level();
+      watchdog.add(&timer);
+      time_limit = &timer;
+    }
+
+    ~TimeLimit()
+    {
+      if (time_limit == &timer)
+      {
+        watchdog.remove(&timer);
+        time_limit = parent;
+      }
+    }
+};
+
+template <typename T>
+auto set_time_limit_error(T &value, int) -> decltype(value.set_error(), void())
+{
+  value.set_error();
+}
+
+template <typename T>
+void set_time_limit_error(T &value, long) {}
+
+template <typename... T>
+void set_time_limit_error(std::tuple<T...> &values, int)
+{
+  std::apply([](auto &... value) {
+    (set_time_limit_error(value, 0), ...);
+  }, values);
+}
+
+template <typename Function, typename... Args>
+auto with_time_limit(double seconds, Function function, const Args &... args)
+  -> decltype(function(args...))
+{
+  TimeLimit limit(seconds);
+  try
+  {
+    return function(args...);
+  }
+  catch (const TimeLimitExceeded &)
+  {
+    decltype(function(args...)) result{};
+    set_time_limit_error(result, 0);
+    return result;
+  }
+}
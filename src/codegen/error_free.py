@@ -0,0 +1,205 @@
+'''Error-free values analysis.
+Scalars of generated code are SisalTypes, they carry an error flag
+through every operation. Most values can't ever get an error though:
+errors only appear after a division (unless it's by a non-zero literal)
+or come from a function cut off by a timeout, and spread to the values
+computed from those. Values that don't depend on any such source get
+plain int, float or bool instead (their ports' types are marked as
+error_free), which C++ compiler can keep in registers and vectorize.
+
+Ports holding the same C++ variable (connected by an edge or matched by
+label between a compound node and its parts) make up a group, that gets
+one type. Groups are connected by the operations computing one from
+another, a group may carry an error if there is a path to it from
+a group that produces one.'''
+
+from .codegen_state import state
+from .type import IntegerType, RealType, BooleanType
+from .cpp.cpp_codegen import CppVariable
+
+SCALAR_TYPES = [IntegerType, RealType, BooleanType]
+PLAIN_TYPES = [type_.__plain_cpp_type__ for type_ in SCALAR_TYPES]
+
+# comparisons of SisalTypes give plain C++ bools:
+COMPARISONS = ["<", "<=", ">", ">=", "=", "~=", "==", "!="]
+
+# functions that only move elements of their array argument around:
+ARRAY_FUNCTIONS = ["addh", "addl", "remh", "reml"]
+
+# nodes, that make new values out of their inputs:
+OPERATIONS = ["Binary", "Unary", "ArrayAccess", "ArrayInit",
+              "RecordAccess", "RecordInit", "Scatter"]
+
+# nodes, that only pass values between their parts:
+COMPOUND_NODES = ["Lambda", "If", "Then", "Else", "ElseIf", "Branch",
+                  "Condition", "Let", "LoopExpression", "Init", "Body",
+                  "PreCondition", "PostCondition", "Returns", "RangeGen",
+                  "Range", "OldValue", "Reduction", "Literal"]
+
+
+class PortGroups:
+    '''Disjoint sets of ports (of their ids)'''
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, port):
+        root = self.parent.setdefault(port.id, port.id)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        # make the path from port to root short:
+        port_id = port.id
+        while port_id != root:
+            self.parent[port_id], port_id = root, self.parent[port_id]
+        return root
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+    def union_in_order(self, ports, other_ports):
+        for port, other_port in zip(ports, other_ports):
+            self.union(port, other_port)
+
+    def union_by_label(self, ports, other_ports):
+        for port in ports:
+            for other_port in other_ports:
+                if port.label == other_port.label:
+                    self.union(port, other_port)
+
+
+def out_ports(nodes):
+    return [o_p for node in nodes if node for o_p in node.out_ports]
+
+
+def group_ports(nodes):
+    '''Puts the ports that share a C++ variable in the same group
+    (see copy_port_values calls in compound nodes' to_cpp)'''
+    groups = PortGroups()
+    for edge in state().edges:
+        if edge.from_ and edge.to:
+            groups.union(edge.from_, edge.to)
+
+    for node in nodes:
+        if node.name == "LoopExpression":
+            parts = [node.init, node.range_gen, node.body]
+            for part in [node.init, node.body, node.condition, node.returns]:
+                if part:
+                    groups.union_by_label(node.in_ports, part.in_ports)
+                    groups.union_by_label(out_ports(parts), part.in_ports)
+            if node.range_gen:
+                groups.union_in_order(node.range_gen.in_ports, node.in_ports)
+            groups.union_in_order(node.out_ports, node.returns.out_ports)
+        elif node.name == "Let":
+            groups.union_in_order(node.in_ports, node.init.in_ports)
+            groups.union_in_order(node.init.out_ports, node.body.in_ports)
+            groups.union_in_order(node.in_ports,
+                                  node.body.in_ports[-len(node.in_ports):])
+            groups.union_in_order(node.out_ports, node.body.out_ports)
+        elif node.name == "If":
+            for part in node.branches + [node.condition]:
+                groups.union_in_order(node.in_ports, part.in_ports)
+            for branch in node.branches:
+                groups.union_in_order(node.out_ports, branch.out_ports)
+        elif node.name == "OldValue":
+            groups.union(node.in_ports[0], node.out_ports[0])
+        elif node.name == "Reduction":
+            # the reduction's variable has the type of its input:
+            groups.union(node.in_ports[1], node.out_ports[0])
+    return groups
+
+
+def is_nonzero_literal(port):
+    src_port = state().edge_to[port.id].from_
+    if src_port.in_port or src_port.node.name != "Literal":
+        return False
+    try:
+        return float(src_port.node.value) != 0
+    except ValueError:
+        return False
+
+
+def find_error_groups(nodes, groups):
+    '''Returns the groups, whose values may carry an error'''
+    sources = set()
+    flows = {}
+
+    def flow(src_port, dst_port):
+        flows.setdefault(groups.find(src_port), set()).add(
+            groups.find(dst_port))
+
+    def produces_errors(node):
+        sources.update(groups.find(o_p) for o_p in node.out_ports)
+
+    for node in nodes:
+        if node.name in OPERATIONS:
+            if node.name == "Binary" and node.operator in COMPARISONS:
+                continue
+            # (array indices don't affect the element)
+            in_ports = (node.in_ports[:1]
+                        if node.name in ["ArrayAccess", "Scatter"]
+                        else node.in_ports)
+            for i_p in in_ports:
+                flow(i_p, node.out_ports[0])
+            if (node.name == "Binary" and node.operator == "/" and
+               not is_nonzero_literal(node.in_ports[1])):
+                produces_errors(node)
+        elif node.name == "FunctionCall":
+            callee = state().functions.get(node.callee)
+            if callee:
+                for arg, param in zip(node.in_ports, callee.in_ports):
+                    flow(arg, param)
+                for result, callee_result in zip(node.out_ports,
+                                                 callee.out_ports):
+                    flow(callee_result, result)
+                if callee.get_pragma("max_time"):
+                    produces_errors(node)
+            elif node.callee in ARRAY_FUNCTIONS:
+                for i_p in node.in_ports:
+                    flow(i_p, node.out_ports[0])
+            elif node.callee != "size":
+                produces_errors(node)
+        elif node.name not in COMPOUND_NODES:
+            produces_errors(node)
+
+    error_groups = set()
+    queue = list(sources)
+    while queue:
+        group = queue.pop()
+        if group not in error_groups:
+            error_groups.add(group)
+            queue.extend(flows.get(group, []))
+    return error_groups
+
+
+def mark_error_free_values():
+    '''Marks types of scalar ports that never carry an error,
+    function parameters and results keep SisalTypes'''
+    nodes = list(state().node_index.values())
+    groups = group_ports(nodes)
+    error_groups = find_error_groups(nodes, groups)
+
+    for node in nodes:
+        if node.name == "Lambda":
+            continue
+        for port in node.in_ports + node.out_ports:
+            if (type(port.type) in SCALAR_TYPES and
+               not getattr(port.type, "custom_type", False) and
+               groups.find(port) not in error_groups):
+                port.type.error_free = True
+
+
+def is_error_free(port):
+    return getattr(port.type, "error_free", False)
+
+
+def keep_error(operand_port, result_port, value):
+    '''Returns C++ code for an operand, that makes an operation on it
+    keep the error flag of the other operand: an error-free operand of
+    an operation, that may give an error, is made a SisalType, otherwise
+    the operation would use plain C++ operator and drop the flag.'''
+    if (is_error_free(operand_port) and
+       type(result_port.type) in SCALAR_TYPES and
+       not is_error_free(result_port) and
+       not (type(value) == CppVariable and value.type_ not in PLAIN_TYPES)):
+        return f"{operand_port.type.__cpp_type__}({value})"
+    return value
@@ -0,0 +1,50 @@
+'''Last-use (uniqueness) analysis used for updating arrays in place.
+A value can be handed over to an operation (with std::move) instead of
+being copied, if that operation is the value's only consumer, i.e. it is
+dead afterwards. Together with Array's copy-on-write buffer this lets
+addh/addl/remh/reml and || modify their array operand in place.'''
+from .codegen_state import state
+
+# nodes whose to_cpp stores every result in a variable of its own,
+# that isn't read by anything but the port's edges:
+FRESH_VALUE_NODES = ["FunctionCall",
+                     "Binary",
+                     "ArrayInit",
+                     "ArrayAccess",
+                     "RecordAccess",
+                     "OldValue"]
+
+
+def is_loop_carried(port):
+    '''Checks if port is a loop body's input holding a value that is
+    redefined in that body (the "A" in "A := addh(old A, x)"). The C++
+    variable holding it is reassigned at the end of each iteration.'''
+    node = port.node
+    if node.name != "Body" or not hasattr(node, "loop_object"):
+        return False
+    init = node.loop_object.init
+    if not init:
+        return False
+    return (port.label in [o_p.label for o_p in init.out_ports] and
+            port.label in [o_p.label for o_p in node.out_ports])
+
+
+def is_last_use(in_port):
+    '''Checks if in_port is the only consumer of the value it receives'''
+    src_port = state().edge_to[in_port.id].from_
+    if len(state().edges_from[src_port.id]) != 1:
+        return False
+    if src_port.in_port:
+        # only "old A" may take the value of a loop-carried variable,
+        # the variable gets the new value at the end of the iteration:
+        return (in_port.node.name == "OldValue" and
+                is_loop_carried(src_port))
+    return src_port.node.name in FRESH_VALUE_NODES
+
+
+def consume(in_port, value):
+    '''Returns C++ code for value passed to an operation, that may
+    modify it in place when it's not used afterwards'''
+    if is_last_use(in_port):
+        return f"std::move({value})"
+    return str(value)
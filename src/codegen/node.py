@@ -7,10 +7,11 @@ from .port import Port
 from .type import get_type
 from .edge import Edge
 from .cpp.cpp_codegen import cpp_eval
+from .codegen_state import state
 
 
 def get_node(node_id):
-    return Node.node_index[node_id]
+    return state().node_index[node_id]
 
 
 def to_cpp_method(fn):
@@ -20,7 +21,7 @@ def to_cpp_method(fn):
 
             # label the ports:
             for index, o_p in enumerate(self.out_ports):
-                src_port = Edge.edge_to[o_p.id].from_
+                src_port = state().edge_to[o_p.id].from_
                 if src_port.node.name != "Lambda":
                     src_port.label = (self.result_name +
                                   (str(index) if len(self.out_ports) > 1
@@ -47,13 +48,12 @@ def to_cpp_method(fn):
 
 class Node:
 
-    node_index = {}
     needs_init = False
 
     def name_child_ports(self):
         # label child nodes' output ports:
         for o_p in self.out_ports:
-            src_port = Edge.edge_to[o_p.id].from_
+            src_port = state().edge_to[o_p.id].from_
             # make sure it's not input value
             # which must be determined by now:
             if not src_port.in_port:
@@ -64,23 +64,23 @@ class Node:
 
     @staticmethod
     def get_node(node_id):
-        return Node.node_index[node_id]
+        return state().node_index[node_id]
 
     def get_node_paragma_group(node):
         if not hasattr(node, "pragma_group"):
             return [node]
 
-        return [n for _, n in Node.node_index.items()
+        return [n for _, n in state().node_index.items()
                 if hasattr(n, "pragma_group")
                 and n.pragma_group == node.pragma_group]
 
     def get_group(group_index):
-        return [node for _, node in Node.node_index.items()
+        return [node for _, node in state().node_index.items()
                 if hasattr(node, "pragma_group")
                 and node.pragma_group == group_index]
 
     def get_parent_node(self):
-        for name, node in Node.node_index.items():
+        for name, node in state().node_index.items():
             if hasattr(node, "nodes") and self in node.nodes:
                 return node
 
@@ -144,12 +144,14 @@ class Node:
     def parse_edges(self, edges):
         self.edges = []
         for edge in edges:
-            if "from" in edge and "to" in edge:
-                src_index = edge["from"][1]
+            if "to" in edge:
+                # ("from_" comes from the parser's output, "from" from JSON)
+                origin = edge["from"] if "from" in edge else edge["from_"]
+                src_index = origin[1]
                 dst_index = edge["to"][1]
 
-                src_node = self.node_index[edge["from"][0]]
-                dst_node = self.node_index[edge["to"][0]]
+                src_node = state().node_index[origin[0]]
+                dst_node = state().node_index[edge["to"][0]]
 
                 from_type = "in" if dst_node.is_parent(src_node) else "out"
                 to_type = "out" if src_node.is_parent(dst_node) else "in"
@@ -162,8 +164,8 @@ class Node:
                 src_index = edge[0]["index"]
                 dst_index = edge[1]["index"]
 
-                src_node = self.node_index[edge[0]["node_id"]]
-                dst_node = self.node_index[edge[1]["node_id"]]
+                src_node = state().node_index[edge[0]["node_id"]]
+                dst_node = state().node_index[edge[1]["node_id"]]
 
                 from_type = "in" if dst_node.is_parent(src_node) else "out"
                 to_type = "out" if src_node.is_parent(dst_node) else "in"
@@ -189,7 +191,7 @@ class Node:
 
     def read_data(self, data):
         if "dont_register" not in data or not data["dont_register"]:
-            Node.node_index[data["id"]] = self
+            state().node_index[data["id"]] = self
         self.location = data["location"] if "location" in data else None
         self.id = data["id"]
         self.name = data["name"]
@@ -227,7 +229,9 @@ class Node:
                 if "name" in value and value["name"] in self.class_map:
                     self.__dict__[field] = self.class_map[value["name"]](value)
             elif field in ["value", "operator", "function_name",
-                           "callee", "field", "pragmas", "pragma_group", "port_to_name_index"]:
+                           "callee", "field", "pragmas", "pragma_group", "port_to_name_index",
+                           "parallel", "min_parallel_iterations",
+                           "speculative"]:
                 self.__dict__[field] = value
 
         if "edges" in data:
@@ -248,7 +252,7 @@ class Node:
         nodes = [self]
 
         for i_p in self.in_ports:
-            input_edge = Edge.edge_to[i_p.id]
+            input_edge = state().edge_to[i_p.id]
             from_ = input_edge.from_
             if not from_.in_port:
                 new_nodes, new_edges, new_input_edges = from_.node.trace_back()
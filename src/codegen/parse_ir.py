@@ -4,6 +4,9 @@
 code generator node parsing
 """
 
+from contextlib import nullcontext
+from utils.context import CompilationContext
+
 from .ast_ import (function,
                    array_access,
                    call,
@@ -19,6 +22,7 @@ from .ast_ import (function,
 from .node import Node
 from .type import get_type
 from .timeout import process_timeout
+from .codegen_state import state, reset
 
 class_map = {
     "Lambda": function.Function,
@@ -62,14 +66,18 @@ def parse_definition():
     pass
 
 
-def parse_ir(ir_data):
-    for fn_ in ir_data["functions"]:
-        parse_node(fn_)
-    definitions = {}
-    if "definitions" in ir_data:
-        for def_ in ir_data["definitions"]:
-            definitions[def_["name"]] = get_type(def_["type"])
+def parse_ir(ir_data, context: CompilationContext = None):
+    """Builds code generator's nodes, they are kept in the context
+    (if it's given, otherwise in the current one)"""
+    with context or nullcontext():
+        reset()
+        for fn_ in ir_data["functions"]:
+            parse_node(fn_)
+        definitions = {}
+        if "definitions" in ir_data:
+            for def_ in ir_data["definitions"]:
+                definitions[def_["name"]] = get_type(def_["type"])
 
-    process_timeout()
+        process_timeout()
 
-    return function.Function.functions, definitions
+        return state().functions, definitions
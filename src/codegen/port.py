@@ -5,20 +5,18 @@ Port for code generator
 """
 
 from .type import Type
-from itertools import count
 from .error import CodeGenError
+from .codegen_state import state
 
 
 class Port:
 
-    __ids__ = count()
-
     def __init__(self, node, type: Type, index, label, in_port: bool):
         self.node = node
         self.type = type
         self.index = index
         self.label = label
-        self.id = next(Port.__ids__)
+        self.id = next(state().port_ids)
         self.value = None
         self.renamed = False  # set it to True when renamed
         self.in_port = in_port  # shows if is it an in-port
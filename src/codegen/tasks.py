@@ -0,0 +1,164 @@
+'''Task parallelism for independent calls and loops.
+Sisal functions have no side effects, so calls, whose arguments don't
+depend on each other's results, may run concurrently: sort(Less) and
+sort(More) of a quicksort, Fib(M - 1) and Fib(M - 2). So may loops,
+e.g. the ones a let binds to Less, Same and More. When an operation
+needs the values of two or more of those (directly or through other
+operations, that aren't computed yet), their arguments are computed
+first, then the calls and loops are put into lambdas, that
+run_tasks (see CPP_MODULE_HEADER) runs as OpenMP tasks.
+
+Only calls of functions, that do some work (run a loop or a recursion),
+are worth a task. Independent loops don't start a team of threads, since
+each of them runs in parallel by itself. In a team started by calls
+(recursion making more tasks as it goes deeper) they run as tasks too.'''
+
+from collections import deque
+from .codegen_state import state
+from .cpp.cpp_codegen import CppTasks, cpp_eval
+
+# nodes, whose operands are searched for independent calls and loops:
+EXPRESSION_NODES = ["Binary", "Unary", "ArrayAccess", "ArrayInit",
+                    "RecordAccess", "RecordInit", "FunctionCall"]
+
+PARTS = ["condition", "init", "range_gen", "body", "returns"]
+
+
+def sub_nodes(node):
+    nodes = list(getattr(node, "nodes", []))
+    nodes += getattr(node, "branches", [])
+    for part in PARTS:
+        if getattr(node, part, None):
+            nodes.append(getattr(node, part))
+    return nodes
+
+
+def function_nodes(function):
+    nodes = []
+    queue = [function]
+    while queue:
+        node = queue.pop()
+        nodes.append(node)
+        queue.extend(sub_nodes(node))
+    return nodes
+
+
+def does_work(function):
+    '''Checks if function (or any function it calls) runs a loop or
+    a recursion (the results are kept in the state by functions' names)'''
+    known = state().does_work
+    name = function.function_name
+    if name in known:
+        # (None: the function is on the current path of calls, so the
+        # call is a recursion)
+        return known[name] is not False
+    known[name] = None
+    result = False
+    for node in function_nodes(function):
+        if node.name == "LoopExpression" or (
+                node.name == "FunctionCall" and
+                node.callee in state().functions and
+                does_work(state().functions[node.callee])):
+            result = True
+            break
+    known[name] = result
+    return result
+
+
+def is_task(node):
+    '''Checks if node is a loop or a call, that is worth a task'''
+    if node.name == "LoopExpression":
+        return True
+    if node.name != "FunctionCall" or node.callee not in state().functions:
+        return False
+    return does_work(state().functions[node.callee])
+
+
+def pending_node(in_port, edge_to):
+    '''Returns the node, whose output in_port gets, if its value isn't
+    computed yet (edge_to is the index of the edges by their targets)'''
+    src_port = edge_to[in_port.id].from_
+    if src_port.in_port or src_port.value:
+        return None
+    return src_port.node
+
+
+def find_tasks(in_ports, searched):
+    '''Returns the loops and calls worth a task, that the values of
+    in_ports are computed from (before any other such node), adds ids
+    of the operations searched for them (through their operands) to
+    searched'''
+    tasks = []
+    seen = set()
+    queue = deque(in_ports)
+    edge_to = state().edge_to
+    while queue:
+        node = pending_node(queue.popleft(), edge_to)
+        if node is None or id(node) in seen:
+            continue
+        seen.add(id(node))
+        if is_task(node):
+            tasks.append(node)
+        elif node.name in EXPRESSION_NODES:
+            searched.add(id(node))
+            queue.extend(node.in_ports)
+    return tasks
+
+
+def inputs_of(node):
+    '''Returns ids of all the nodes (not computed yet), that node's
+    inputs are computed from'''
+    inputs = set()
+    queue = list(node.in_ports)
+    edge_to = state().edge_to
+    while queue:
+        src_node = pending_node(queue.pop(), edge_to)
+        if src_node is not None and id(src_node) not in inputs:
+            inputs.add(id(src_node))
+            queue.extend(src_node.in_ports)
+    return inputs
+
+
+def run_independent(in_ports, block):
+    '''Computes the independent loops and calls, that the values of
+    in_ports need, as tasks (if there are two or more of them)'''
+    # (code under a time limit is stopped by an exception, that can't
+    # leave a task)
+    if state().current_function.time_limited:
+        return
+    # (an operation, that a search from the ones using its result has
+    # gone through, has no other tasks: they are all computed, or
+    # there are less than two of them)
+    if in_ports and id(in_ports[0].node) in state().searched_nodes:
+        return
+    searched = set()
+    tasks = find_tasks(in_ports, searched)
+    if len(tasks) < 2:
+        state().searched_nodes |= searched
+        return
+    # a node, that another one needs, is computed with its inputs:
+    needed = set()
+    for node in tasks:
+        needed |= inputs_of(node)
+    independent = [node for node in tasks if id(node) not in needed]
+    if len(independent) == len(tasks):
+        state().searched_nodes |= searched
+    tasks = independent
+    if len(tasks) < 2:
+        return
+
+    for node in tasks:
+        for i_p in node.in_ports:
+            cpp_eval(i_p, block)
+
+    cpp_tasks = CppTasks(start_team=any(node.name == "FunctionCall"
+                                        for node in tasks))
+    for node in tasks:
+        task_block = cpp_tasks.add_block()
+        node.to_cpp(task_block)
+        # the results are declared outside of the lambdas:
+        for o_p in node.out_ports:
+            if o_p.value in task_block.variables:
+                task_block.remove_variable(o_p.value)
+                block.add_variable(o_p.value)
+    block.add_code(cpp_tasks)
@@ -6,6 +6,7 @@ from .ast_.function import Function
 from .ast_.call import FunctionCall
 from .port import Port
 from collections import OrderedDict
+from .codegen_state import state
 
 
 def collect_pragma_ir(node):
@@ -23,7 +24,7 @@ def collect_pragma_ir(node):
 
     for n in group:
         for o_p in n.out_ports:
-            output_edges.extend(Edge.edges_from[o_p.id])
+            output_edges.extend(state().edges_from[o_p.id])
 
     return nodes, internal_edges, input_edges, output_edges
 
@@ -34,7 +35,7 @@ def process_timeout():
        a call. Timed function execution is implemented in
        codegen/ast_/function.py. This is done at IR level'''
 
-    for id_, node in Node.node_index.copy().items():
+    for id_, node in state().node_index.copy().items():
         if node.name != "Lambda" and node.get_pragma("max_time"):
             # nodes - all the nodes involved in calculation
             # internal edges - all the edges between those nodes
@@ -48,7 +49,7 @@ def process_timeout():
             # create a new function for the calculation of the
             # pragma-affected expression
             new_function = Function(dict(
-                                    id="node" + str(len(Node.node_index)),
+                                    id="node" + str(len(state().node_index)),
                                     function_name=Function.get_service_name
                                     ("timed_expression"),
                                     name="Lambda",
@@ -57,7 +58,7 @@ def process_timeout():
 
             new_call = FunctionCall(dict(
                                     callee=new_function.function_name,
-                                    id="node" + str(len(Node.node_index)),
+                                    id="node" + str(len(state().node_index)),
                                     name="FunctionCall"))
 
             for index, e in enumerate(output_edges):
@@ -5,7 +5,7 @@ Type for code generator
 """
 import re
 import json
-from .codegen_state import global_no_error
+from .codegen_state import state, no_error
 """Type classes have load_from_json_code and save_to_json_code
  methods. They return C++ code for those corresponding purposes
 """
@@ -33,15 +33,23 @@ class Type:
     def cpp_type(self):
         if "custom_type" in self.__dict__ and self.custom_type:
             return self.type_name
+        elif "error_free" in self.__dict__ and self.error_free:
+            # scalars that can't get an error (see error_free.py):
+            return self.__plain_cpp_type__
         else:
             return f"{self.__cpp_type__}"
 
+    @property
+    def cpp_arg_type(self):
+        """C++ type used for function parameters"""
+        return self.cpp_type
+
     @property
     def internal_type(self):
         return self.__cpp_type__
 
     def save_to_json_code(self, target_object, object_):
-        if global_no_error:
+        if no_error():
             return f'{target_object} = {object_};'
         else:
             return f'if ({object_}.error) {target_object} = "ERROR"; else {target_object} = {object_};'
@@ -49,6 +57,7 @@ class Type:
 
 class IntegerType(Type):
     __cpp_type__ = "integer"
+    __plain_cpp_type__ = "int"
 
     def load_from_json_code(self, name, src_object):
         return f"{self.cpp_type} {name} = {src_object}.asInt();"
@@ -56,6 +65,7 @@ class IntegerType(Type):
 
 class RealType(Type):
     __cpp_type__ = "real"
+    __plain_cpp_type__ = "float"
 
     def load_from_json_code(self, name, src_object):
         return f"{self.cpp_type} {name} = {src_object}.asFloat();"
@@ -63,6 +73,7 @@ class RealType(Type):
 
 class BooleanType(Type):
     __cpp_type__ = "boolean"
+    __plain_cpp_type__ = "bool"
 
     def load_from_json_code(self, name, src_object):
         return f"{self.cpp_type} {name} = {src_object}.asBool();"
@@ -77,6 +88,12 @@ class ArrayType(Type):
     def __cpp_type__(self):
         return f"Array<{self.element.cpp_type}>"
 
+    @property
+    def cpp_arg_type(self):
+        # arrays are never modified by the callee, so they are passed
+        # as constant references instead of being copied:
+        return f"const {self.cpp_type}&"
+
     def dimensions(self):
         return 1 + (
             self.element.dimensions if "element" in self.element.__dict__ else 0
@@ -90,13 +107,22 @@ class ArrayType(Type):
             else self.element
         )
 
-    def load_from_json_code(self, name, src_object):
+    @property
+    def flat(self):
+        """Checks if this is a two-dimensional array of scalars, those
+        are stored in one contiguous buffer (see sisal_types.h)"""
+        return (not no_error() and
+                type(self.element) == ArrayType and
+                type(self.element.element) in [IntegerType,
+                                               RealType,
+                                               BooleanType])
+
+    def load_items_code(self, name, src_object):
         from .cpp.cpp_codegen import indent_cpp
 
         index_name = "index_for_" + remove_spec_symbols(name)
         item_name = "item_for_" + remove_spec_symbols(name)
-        retval = (
-            f"{self.cpp_type} {name};\n"
+        return (
             f"for(unsigned int {index_name} = 0;\n"
             f"{index_name} < {src_object}.size();\n++{index_name})\n"
             "{\n"
@@ -109,32 +135,88 @@ class ArrayType(Type):
             + "\n}"
         )
 
-        return retval
+    def load_flat_code(self, name, src_object):
+        """Loads a two-dimensional array right into its buffer
+        (instead of making an Array for every row)"""
+        from .cpp.cpp_codegen import indent_cpp
+
+        items = "items_for_" + remove_spec_symbols(name)
+        starts = "starts_for_" + remove_spec_symbols(name)
+        row = "row_for_" + remove_spec_symbols(name)
+        column = "column_for_" + remove_spec_symbols(name)
+        item_name = "item_for_" + remove_spec_symbols(name)
+        element_code = (
+            self.element.element.load_from_json_code(
+                item_name, f"{src_object}[{row}][{column}]")
+            + f"\n{items}.push_back({item_name});"
+        )
+        return (
+            f"vector<{self.element.element.cpp_type}> {items};\n"
+            f"vector<unsigned int> {starts} = {{0}};\n"
+            f"for(unsigned int {row} = 0; {row} < {src_object}.size();"
+            f" ++{row})\n"
+            "{\n"
+            + indent_cpp(
+                f"for(unsigned int {column} = 0;\n"
+                f"{column} < {src_object}[{row}].size();\n++{column})\n"
+                "{\n"
+                + indent_cpp(element_code)
+                + "\n}\n"
+                f"{starts}.push_back({items}.size());"
+            )
+            + "\n}\n"
+            f"{name} = {self.cpp_type}::flat(std::move({items}), "
+            f"std::move({starts}));"
+        )
+
+    def load_from_json_code(self, name, src_object):
+        items_code = (self.load_flat_code(name, src_object)
+                      if self.flat
+                      else self.load_items_code(name, src_object))
+        return f"{self.cpp_type} {name};\n" + items_code
 
     def save_to_json_code(self, target_object, object_):
         from .cpp.cpp_codegen import indent_cpp
 
         index = "index_for_" + remove_spec_symbols(target_object)
         item_name = "item_for_" + remove_spec_symbols(target_object)
-
-        return (
-            (f"if ({object_}.error)"
-             "{\n"
-             + indent_cpp(f'{target_object}="ERROR";') +
-             "\n}\nelse\n") * (not global_no_error) +
-            f"for(unsigned int {index} = 0;\n"
-            f"    {index} < size({object_});"
-            f"\n    ++{index})"
-            "\n{\n"
-            + indent_cpp(f"Json::Value {item_name};")
-            + "\n"
-            + indent_cpp(
-                self.element.save_to_json_code(item_name, object_ + f"[{index}]")
+        # the element (for two-dimensional arrays it's a row, which is
+        # made on every indexing) is bound to a reference once:
+        value_name = "value_for_" + remove_spec_symbols(target_object)
+
+        def for_each_element(body):
+            return (
+                f"for(unsigned int {index} = 0;\n"
+                f"    {index} < size({object_});"
+                f"\n    ++{index})"
+                "\n{\n"
+                + indent_cpp(body)
+                + "\n}"
             )
-            + "\n"
-            + indent_cpp(f"{target_object}.append({item_name});")
-            + "\n}"
+
+        save_elements = for_each_element(
+            f"Json::Value {item_name};\n"
+            f"const auto &{value_name} = {object_}[{index}];\n"
+            + self.element.save_to_json_code(item_name, value_name)
+            + f"\n{target_object}.append({item_name});"
         )
+        if no_error():
+            return save_elements
+
+        code = (f"if ({object_}.error)"
+                "{\n"
+                + indent_cpp(f'{target_object}="ERROR";') +
+                "\n}\nelse\n")
+        if type(self.element) in [IntegerType, RealType, BooleanType]:
+            # arrays of scalars know if any element has an error,
+            # if none has, the values are saved without checking them:
+            code += (
+                f"if (!{object_}.element_errors())\n"
+                + for_each_element(
+                    f"{target_object}.append({object_}.value({index}));")
+                + "\nelse\n"
+            )
+        return code + save_elements
 
 
 class StreamType(Type):
@@ -160,11 +242,17 @@ def get_struct_string(name: str, fields: list[str]):
         + ";\n".join([str(field) + ".set_error()" for field, _ in fields.items()])
         + ";\n}"
     )
-    extra = ("bool error;" + set_error_code) * (not global_no_error)
+    extra = ("bool error;" + set_error_code) * (not no_error())
     field_defs = "\n".join(
         [f"{str(type_.cpp_type)} {str(field)};" for field, type_ in fields.items()]
     )
-    return "struct " + name + "{\n" + indent_cpp(field_defs + "\n" + extra) + "\n};"
+    # (memoized functions compare records by their fields)
+    key_fields = [str(field) for field in fields] + ["error"] * (not no_error())
+    memo_key = ("\nauto memo_key() const{\n"
+                + indent_cpp(f"return std::tie({', '.join(key_fields)});")
+                + "\n}")
+    return ("struct " + name + "{\n"
+            + indent_cpp(field_defs + "\n" + extra + memo_key) + "\n};")
 
 
 class RecordType(Type):
@@ -176,18 +264,17 @@ class RecordType(Type):
     def cpp_type(self):
         return self.get_struct()["name"]
 
-    # static, contains description of corresponding C++
-    # structs as strings
-    cpp_structs = {}
+    # (descriptions of corresponding C++ structs as strings are kept
+    # in state().cpp_structs)
 
     def get_struct(self):
         """returns a C++ struct based on this record"""
 
-        if hash(self) not in RecordType.cpp_structs:
-            name = "record" + str(len(RecordType.cpp_structs))
+        if hash(self) not in state().cpp_structs:
+            name = "record" + str(len(state().cpp_structs))
             struct_str = get_struct_string(name, self.fields)
-            RecordType.cpp_structs[hash(self)] = dict(name=name, string=struct_str)
-        return RecordType.cpp_structs[hash(self)]
+            state().cpp_structs[hash(self)] = dict(name=name, string=struct_str)
+        return state().cpp_structs[hash(self)]
 
     def __hash__(self):
         return hash(
@@ -197,7 +284,7 @@ class RecordType(Type):
             )
         )
 
-    # declare struct and put it on the list "bool" if global_no_error else
+    # declare struct and put it on the list "bool" if no_error() else
     # use it as type
     def load_from_json_code(self, name, src_object):
         ret_str = "\n".join(
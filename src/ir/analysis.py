@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cached analyses of the IR graph: use-def chains, topological order,
+reachability and dominance within each complex node (a scope), and
+purity of functions.
+
+A scope's results only depend on its nodes and the edges between them,
+so the module's mutators (Edge constructor, attach_origin,
+attach_target, delete_edge, delete_node, swap_complex_node and the node
+factories) drop the results of the scopes they touch, and other scopes
+keep theirs. Code, that moves nodes between scopes by itself, calls
+invalidate for both of them.
+"""
+
+from .node import SUBNODE_NAMES
+
+
+def sub_nodes(node):
+    nodes = list(getattr(node, "nodes", []))
+    nodes += getattr(node, "branches", [])
+    nodes += [node.__dict__[name] for name in SUBNODE_NAMES
+              if hasattr(node, name)]
+    return nodes
+
+
+class Analyses:
+    def __init__(self, module):
+        self.module = module
+        # scope -> name of an analysis -> result:
+        self.scopes = {}
+        # function name -> True if its result only depends on its
+        # arguments (None until it's needed):
+        self.purity = None
+
+    def invalidate(self, scope=None):
+        """Drops the results for scope (or for all the scopes)"""
+        if scope is None:
+            self.scopes = {}
+            self.purity = None
+        else:
+            self.scopes.pop(scope, None)
+
+    def invalidate_purity(self):
+        self.purity = None
+
+    def cached(self, scope, name, compute):
+        results = self.scopes.setdefault(scope, {})
+        if name not in results:
+            results[name] = compute(scope)
+        return results[name]
+
+    # use-def chains:
+    def defs(self, scope):
+        """Maps scope's nodes to the nodes of scope, that they get their
+        inputs from"""
+        return self.cached(scope, "defs", self.compute_defs)
+
+    def uses(self, scope):
+        """Maps scope's nodes to the nodes of scope, that get their
+        results, scope itself stands for the values leaving it"""
+        return self.cached(scope, "uses", self.compute_uses)
+
+    @staticmethod
+    def compute_defs(scope):
+        members = set(scope.nodes)
+        defs = {}
+        for node in scope.nodes:
+            sources = []
+            for i_p in node.in_ports:
+                edge = i_p.input_edge
+                if (edge and not edge.from_.in_port and
+                        edge.from_.node in members and
+                        edge.from_.node not in sources):
+                    sources.append(edge.from_.node)
+            defs[node] = sources
+        return defs
+
+    @staticmethod
+    def compute_uses(scope):
+        members = set(scope.nodes)
+        uses = {}
+        for node in scope.nodes:
+            users = []
+            for o_p in node.out_ports:
+                for edge in o_p.output_edges:
+                    user = edge.to.node
+                    if user not in members:
+                        user = scope
+                    if user not in users:
+                        users.append(user)
+            uses[node] = users
+        return uses
+
+    def topological_order(self, scope):
+        """Returns scope's nodes, every node goes after the nodes
+        it gets its inputs from"""
+        return self.cached(scope, "order", self.compute_order)
+
+    def compute_order(self, scope):
+        defs = self.defs(scope)
+        users = {node: [] for node in scope.nodes}
+        waiting = {}
+        for node in scope.nodes:
+            waiting[node] = len(defs[node])
+            for source in defs[node]:
+                users[source].append(node)
+        ready = [node for node in scope.nodes if not waiting[node]]
+        ordered = []
+        while ready:
+            node = ready.pop()
+            ordered.append(node)
+            for user in users[node]:
+                waiting[user] -= 1
+                if not waiting[user]:
+                    ready.append(user)
+        return ordered
+
+    # reachability:
+    def inputs_of(self, node, scope=None):
+        """Returns the set of the nodes (of the scope containing node),
+        that node's inputs are computed from"""
+        scope = scope or node.parent_node
+        reachable = self.cached(scope, "inputs", lambda scope: {})
+        if node not in reachable:
+            defs = self.defs(scope)
+            found = set()
+            stack = list(defs.get(node, []))
+            while stack:
+                source = stack.pop()
+                if source in found:
+                    continue
+                found.add(source)
+                if source in reachable:
+                    found |= reachable[source]
+                else:
+                    stack.extend(defs[source])
+            reachable[node] = found
+        return reachable[node]
+
+    # dominance:
+    def post_dominators(self, scope):
+        """Maps scope's nodes to their immediate post-dominators: the
+        nodes, that every use of their results goes through (scope
+        itself if the results leave it in more than one way, None if
+        they aren't used)"""
+        return self.cached(scope, "post_dominators",
+                           self.compute_post_dominators)
+
+    def compute_post_dominators(self, scope):
+        order = self.topological_order(scope)
+        uses = self.uses(scope)
+        position = {node: index for index, node in enumerate(order)}
+        position[scope] = len(order)
+        idom = {scope: scope}
+
+        def intersect(a, b):
+            while a is not b:
+                while position[a] < position[b]:
+                    a = idom[a]
+                while position[b] < position[a]:
+                    b = idom[b]
+            return a
+
+        for node in reversed(order):
+            dominator = None
+            for user in uses[node]:
+                if user is not scope and idom.get(user) is None:
+                    # (a user, whose results aren't used)
+                    continue
+                dominator = (user if dominator is None
+                             else intersect(dominator, user))
+            idom[node] = dominator
+        del idom[scope]
+        return idom
+
+    def dominated(self, node, scope=None):
+        """Returns the nodes, whose results are only used through
+        node's (they aren't needed without it)"""
+        scope = scope or node.parent_node
+        if "post_dominators" in self.scopes.get(scope, {}):
+            idom = self.post_dominators(scope)
+            result = set()
+            for other in reversed(self.topological_order(scope)):
+                dominator = idom.get(other)
+                if dominator is node or dominator in result:
+                    result.add(other)
+            return result
+
+        # (a rewrite changes the scope, rebuilding the tree for it would
+        # cost more than going back from node through the edges)
+        def sources(node):
+            return [i_p.input_edge.from_.node for i_p in node.in_ports
+                    if i_p.input_edge and not i_p.input_edge.from_.in_port]
+
+        result = set()
+        stack = sources(node)
+        while stack:
+            other = stack.pop()
+            if other in result or other is node:
+                continue
+            if all(edge.to.node is node or edge.to.node in result
+                   for o_p in other.out_ports for edge in o_p.output_edges):
+                result.add(other)
+                stack.extend(sources(other))
+        return result
+
+    # purity:
+    def is_pure(self, function_name):
+        """Checks if the function's result only depends on its arguments:
+        it isn't time-limited and doesn't call functions, that are
+        (built-in functions are pure)"""
+        if self.purity is None:
+            self.purity = self.compute_purity()
+        return self.purity.get(function_name, True)
+
+    def compute_purity(self):
+        callers = {}
+        impure = []
+        for name, function in self.module.functions.items():
+            queue = [function]
+            while queue:
+                node = queue.pop()
+                if getattr(node, "pragmas", None) and node.get_pragma("max_time"):
+                    if name not in impure:
+                        impure.append(name)
+                if node.name == "FunctionCall":
+                    callers.setdefault(node.callee, set()).add(name)
+                queue.extend(sub_nodes(node))
+        purity = {name: True for name in self.module.functions}
+        while impure:
+            name = impure.pop()
+            if not purity.get(name, True):
+                continue
+            purity[name] = False
+            impure.extend(callers.get(name, []))
+        return purity
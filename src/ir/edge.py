@@ -5,6 +5,7 @@ Description of IR Edges
 """
 
 from .port import Port
+from utils.ir_export import ir_data
 PORT_FULL_DESCRIPTION_IN_EDGES = False
 
 
@@ -27,6 +28,8 @@ class Edge:
         self.module.edges_from[self.from_.id].append(self)
         self.module.edge_to[self.to.id] = self
         self.module.edges.append(self)
+        self.module.edges_added += 1
+        self.module.analyses.invalidate(node)
 
     def attach_origin(self, new_origin):
         if new_origin.id not in self.module.edges_from:
@@ -34,19 +37,23 @@ class Edge:
         self.module.edges_from[self.from_.id].remove(self)
         self.from_ = new_origin
         self.module.edges_from[new_origin.id].append(self)
+        self.module.analyses.invalidate(self.containing_node)
 
     def attach_target(self, new_target):
         self.module.edge_to.pop(self.to.id)
         self.to = new_target
         self.module.edge_to[new_target.id] = self
+        self.module.analyses.invalidate(self.containing_node)
 
     def detatch_origin(self):
         self.module.edges_from[self.from_.id].remove(self)
         self.from_ = None
+        self.module.analyses.invalidate(self.containing_node)
 
     def detatch_target(self):
         self.module.edge_to[self.to.id] = None
         self.to = None
+        self.module.analyses.invalidate(self.containing_node)
 
     def __repr__(self):
         return (f"E<{self.from_.node}:{self.from_.index},"
@@ -54,8 +61,11 @@ class Edge:
 
     def ir_(self):
         """An IR form of this edge as a dict"""
+        return ir_data(self)
+
+    def ir_shallow(self):
         if PORT_FULL_DESCRIPTION_IN_EDGES:
-            return [self.from_.ir_(), self.to.ir_()]
+            return [self.from_, self.to]
         else:
             return dict(
                 from_=(self.from_.node.id, self.from_.index),
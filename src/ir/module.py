@@ -2,13 +2,17 @@
 
 from .parse_ir import parse_node
 import json
-from utils.python_names import python_names, json_names
+from io import BytesIO
+from utils.python_names import python_names, json_name
+from utils.ir_export import ir_data, write_json
+from utils.ir_binary import write_binary, read_binary, is_binary
 from .edge import Edge
 from .node import Node, SUBNODE_NAMES
 from .type import get_type
 from .port import Port
 from .ast_ import alg, literal, let, common, function
 from .error import IRProcessingError
+from .analysis import Analyses
 from copy import deepcopy
 
 PORT_MISMATCH_TEXT = "configuration mismatch when swapping nodes."
@@ -24,14 +28,34 @@ class Module:
         self.edges_from = {}
         self.edge_to = {}
         self.deleted_nodes = []
+        # counts of nodes and edges added and deleted, so that optimizer
+        # can tell if a transformation has changed anything:
+        self.nodes_added = 0
+        self.nodes_deleted = 0
+        self.edges_added = 0
+        self.edges_deleted = 0
+        self.analyses = Analyses(self)
 
     def __init__(self, file_name=None):
         self.reset()
         if file_name:
-            self.load_from_json(file_name)
+            with open(file_name, "rb") as file:
+                binary = is_binary(file.read(16))
+            if binary:
+                self.load_from_binary(file_name)
+            else:
+                self.load_from_json(file_name)
 
     def add_node(self, node):
         self.nodes[node.id] = node
+        self.nodes_added += 1
+        if getattr(node, "name", None) in ("FunctionCall", "Lambda"):
+            self.analyses.invalidate_purity()
+
+    @property
+    def changes(self):
+        return (self.nodes_added + self.nodes_deleted +
+                self.edges_added + self.edges_deleted)
 
     def get_node(self, node_id):
         """Returns node specified by it's ID"""
@@ -47,6 +71,7 @@ class Module:
         to_port = edge.to
         # remove edge from all registries:
         self.edges.remove(edge)
+        self.edges_deleted += 1
         if from_port.id in self.edges_from: 
             """During transformations in the compiler a situation may appear 
             when a few edges temporarily have origin in the same port, 
@@ -58,6 +83,7 @@ class Module:
         if to_port.id in self.edge_to:
             del self.edge_to[to_port.id]
         edge.containing_node.edges.remove(edge)
+        self.analyses.invalidate(edge.containing_node)
 
     def delete_edges_attached_to_node(self, node):
         """Deletes edges connected to node's output ports or it's input ports"""
@@ -80,10 +106,15 @@ class Module:
 
         if type(node) is function.Function:
             del self.functions[node.function_name]
+            self.analyses.invalidate_purity()
         else:
             if del_from_parent:
                 parent_node = node.parent_node
                 parent_node.nodes.remove(self.nodes[node.id])
+                self.analyses.invalidate(parent_node)
+        # (a deleted call can only make its function purer, so the purity
+        # known before stays safe to use)
+        self.analyses.invalidate(node)
 
         if delete_attached_edges:
             self.delete_edges_attached_to_node(node)
@@ -95,6 +126,7 @@ class Module:
                 self.delete_edge(edge)
 
         self.deleted_nodes.append(node_to_delete.id)
+        self.nodes_deleted += 1
         if node_to_delete.id in self.nodes:
             del self.nodes[node_to_delete.id]
 
@@ -131,8 +163,21 @@ class Module:
 
     def load_from_json_data(self, module_json_data):
         """Loads module from JSON data in RAM"""
+        self.load_from_data(python_names(module_json_data))
+
+    def load_from_binary(self, file_name):
+        """Loads module from a binary IR file (see utils/ir_binary.py)"""
+        with open(file_name, "rb") as file:
+            self.load_from_binary_data(file.read())
+
+    def load_from_binary_data(self, data: bytes):
+        """Loads module from a binary IR in RAM"""
+        self.load_from_data(read_binary(data))
+
+    def load_from_data(self, module_data):
+        """Loads module from an IR with Python names (the parser's
+        output or ir_())"""
         self.reset()
-        module_data = python_names(module_json_data)
         for fn_ in module_data["functions"]:
             function = parse_node(fn_, self)
             self.functions[function.function_name] = function
@@ -145,23 +190,47 @@ class Module:
         """Creates a dictionary suitable for JSON export out of this module
         it changes names to camelCase to fit JS convention
         """
-        output = {
-            "functions": [function.ir_() for name, function in self.functions.items()],
-            "definitions": [
-                definition.ir_() for _, definition in self.definitions.items()
-            ],
+        return ir_data(self, json_name)
+
+    def write_json(self, file):
+        """Writes this module to file as JSON text (the same as
+        save_to_json's), without making the dictionary first"""
+        write_json(self, file, json_name)
+
+    def save_to_binary(self) -> bytes:
+        """Exports this module as a binary IR (see utils/ir_binary.py)"""
+        file = BytesIO()
+        self.write_binary(file)
+        return file.getvalue()
+
+    def write_binary(self, file):
+        """Writes this module to file (opened in binary mode) as
+        a binary IR"""
+        write_binary(self, file)
+
+    def ir_(self):
+        """Exports this module's IR as a dict with Python names (as
+        load_from_data and the code generator take it)"""
+        return ir_data(self)
+
+    def ir_shallow(self):
+        return {
+            "functions": list(self.functions.values()),
+            "definitions": [{"name": name, "type": type_}
+                            for name, type_ in self.definitions.items()],
         }
-        return json_names(output)
 
     def parse_edges(self, edges, node):
         """Used for reading edges from JSON representation, no need to call it outside of the class"""
         new_edges = []
         for edge in edges:
-            if "from" in edge and "to" in edge:
-                src_index = edge["from"][1]
+            if "to" in edge:
+                # ("from_" comes from ir_() output, "from" from JSON)
+                origin = edge["from"] if "from" in edge else edge["from_"]
+                src_index = origin[1]
                 dst_index = edge["to"][1]
 
-                src_node = self.get_node(edge["from"][0])
+                src_node = self.get_node(origin[0])
                 dst_node = self.get_node(edge["to"][0])
 
                 from_type = "in" if dst_node.is_parent(src_node) else "out"
@@ -263,6 +332,7 @@ class Module:
 
         if src_node.has_nodes():
             parent.nodes += src_node.nodes
+        self.analyses.invalidate(parent)
 
         src_node.edges = []
         src_node.nodes = []
@@ -275,11 +345,13 @@ class Module:
         """Create a new literal node and put it inside the "container" node"""
         lit = literal.Literal()
         lit.value = value
+        lit.in_ports = []
         lit.out_ports = [Port(lit, type, 0, "value", False, "")]
         lit.id = self.get_new_node_id()
         self.add_node(lit)
         lit.module = self
         container.nodes.append(lit)
+        self.analyses.invalidate(container)
         lit.name = "Literal"
         return lit
 
@@ -295,6 +367,7 @@ class Module:
         bin.out_ports = [Port(bin, left_type, 0, "output", False, "")]
         self.add_node(bin)
         container.nodes.append(bin)
+        self.analyses.invalidate(container)
         bin.module = self
         return bin
 
@@ -307,6 +380,7 @@ class Module:
         un.out_ports = [Port(un, value_type, 0, "output", False, "")]
         self.add_node(un)
         container.nodes.append(un)
+        self.analyses.invalidate(container)
         un.module = self
         return un
 
@@ -340,6 +414,7 @@ class Module:
         self.add_node(init)
 
         container.nodes.append(let_node)
+        self.analyses.invalidate(container)
 
         def make_ports(node, values, in_ports):
             custom_ports = [
@@ -8,7 +8,7 @@ base class for IR nodes
 from .port import Port
 from .type import get_type
 from .edge import Edge
-from copy import deepcopy
+from utils.ir_export import ir_data
 
 SUBNODE_NAMES = ["init", "body", "condition", "range_gen", "returns"]
 
@@ -105,6 +105,9 @@ class Node:
                 "pragmas",
                 "pragma_group",
                 "port_to_name_index",
+                "parallel",
+                "min_parallel_iterations",
+                "speculative",
             ]:
                 self.__dict__[field] = value
 
@@ -121,16 +124,13 @@ class Node:
 
     def ir_(self) -> dict:
         """Common for all nodes, converts the fields to export-ready dict"""
-        retval = deepcopy(self).__dict__
+        return ir_data(self)
+
+    def ir_shallow(self) -> dict:
+        """The fields for export (ports, edges and sub-nodes are exported
+        by ir_data, see utils/ir_export.py)"""
+        retval = dict(self.__dict__)
         del retval["module"]
-        for key in ["in_ports", "out_ports", "nodes", "edges"]:
-            if key in retval:
-                retval[key] = [item.ir_() for item in retval[key]]
-        for key in ["init", "body", "range_gen", "returns", "condition"]:
-            if key in retval:
-                retval[key] = retval[key].ir_()
-        if hasattr(self, "branches"):
-            retval["branches"] = [branch.ir_() for branch in retval["branches"]]
         if "pragmas" in retval and retval["pragmas"] == []:
             del retval["pragmas"]
         return retval
@@ -164,21 +164,20 @@ class Node:
         """Finds all chains (nodes and edges) leading to this node's inputs.
         Returns the Nodes and all involved Edges.
         """
+        analyses = self.module.analyses
+        scope = self.parent_node
+        inputs = analyses.inputs_of(self, scope)
+        nodes = [self] + [node for node in analyses.topological_order(scope)
+                          if node in inputs]
         internal_edges = []
         input_edges = []
-        nodes = [self]
-
-        for i_p in self.in_ports:
-            input_edge = i_p.input_edge#self.module.edge_to[i_p.id]
-            from_ = input_edge.from_
-            if not from_.in_port:
-                new_nodes, new_edges, new_input_edges = from_.node.trace_back()
-                nodes.extend(new_nodes)
-                internal_edges.extend(new_edges)
-                input_edges.extend(new_input_edges)
-                internal_edges.append(input_edge)
-            else:
-                input_edges.append(input_edge)
+        for node in nodes:
+            for i_p in node.in_ports:
+                input_edge = i_p.input_edge
+                if input_edge.from_.in_port:
+                    input_edges.append(input_edge)
+                else:
+                    internal_edges.append(input_edge)
 
         return nodes, internal_edges, input_edges
 
@@ -201,6 +200,14 @@ class Node:
 
     @property
     def parent_node(self):
+        # edges of a node belong to the node containing it (unless
+        # a transformation has left them behind, hence the check):
+        for port in self.in_ports + self.out_ports:
+            edges = [port.input_edge] if port.in_port else port.output_edges
+            for edge in edges:
+                if edge and self in getattr(edge.containing_node, "nodes", []):
+                    return edge.containing_node
+
         for name, node in self.module.nodes.items():
             if hasattr(node, "nodes") and self in node.nodes:
                 return node
@@ -308,11 +315,15 @@ class Node:
 
     def delete_port(self,port):
         if port in self.in_ports:
-            self.in_ports.remove(port)
+            ports = self.in_ports
         elif port in self.out_ports:
-            self.out_ports.remove(port)
+            ports = self.out_ports
         else:
             raise Exception("Port does not belong to the node")
+        ports.remove(port)
+        # (edges refer to the ports by their indices)
+        for index, other in enumerate(ports):
+            other.index = index
         
     def get_in_ports_by_label(self,label):
         ports=[]
@@ -6,7 +6,7 @@ IR Port
 
 from .type import Type
 from itertools import count
-from copy import deepcopy
+from utils.ir_export import ir_data
 
 DONT_ADD_EMPTY_LABELS = True
 
@@ -30,7 +30,7 @@ class Port:
 
     @property
     def connected_ports(self) -> list:
-        return [edge.to for edge in self.node.module.edges_from[self.id]]
+        return [edge.to for edge in self.output_edges]
 
     @property
     def input_port(self):
@@ -54,14 +54,16 @@ class Port:
 
     def ir_(self):
         """Exports port's IR form as a dict"""
-        retval = deepcopy(self.__dict__)
-        retval["node_id"] = retval["node"].id
+        return ir_data(self)
+
+    def ir_shallow(self):
+        retval = dict(self.__dict__)
+        retval["node_id"] = self.node.id
         del retval["node"]
         del retval["id"]
         del retval["in_port"]
         if self.label is None and DONT_ADD_EMPTY_LABELS:
             del retval["label"]
-        retval.update(type=self.type.ir_())
         return retval
 
     @property
@@ -4,7 +4,7 @@
 Type for code generator
 """
 import re
-from copy import deepcopy
+from utils.ir_export import ir_data
 
 
 class Type:
@@ -32,8 +32,10 @@ class Type:
 
     def ir_(self):
         """An IR form of the type"""
-        retval = self.__dict__
-        return retval
+        return ir_data(self)
+
+    def ir_shallow(self):
+        return dict(self.__dict__)
 
     def __init__(self):
         if hasattr(self, "name"):
@@ -51,8 +53,15 @@ class RealType(Type):
     name = "real"
 
 
+def to_boolean(value):
+    """Converts a literal's value ("true", "false" or a bool) to bool"""
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
+
+
 class BooleanType(Type):
-    convert=bool
+    convert=staticmethod(to_boolean)
     name="boolean"
     pass
 
@@ -75,9 +84,8 @@ class ArrayType(Type):
             else self.element
         )
 
-    def ir_(self):
-        retval = deepcopy(self.__dict__)
-        retval["element"] = retval["element"].ir_()
+    def ir_shallow(self):
+        retval = dict(self.__dict__)
         # retval["multi_type"] = "array"
         return retval
 
@@ -5,13 +5,14 @@ sys.path.append("/home/newt/cpps/src")
 
 from ir.module import Module
 from ir.edge import Edge
-from ir.node import Node
+from ir.node import Node, SUBNODE_NAMES
 from ir.ast_.literal import Literal
 from ir.ast_.call import FunctionCall
 from ir.ast_.function import Function
 from ir.type import IntegerType, BooleanType
 from ir.port import Port
-import configparser
+from collections import deque
+from copy import deepcopy
 
 operators = {
     "+": lambda x, y: x + y,
@@ -36,20 +37,40 @@ def printm(module):
     print(json.dumps(module.save_to_json(), indent=2))
 
 
+def redirect_output(node: Node, new_origin: Port):
+    '''Connects everything, that uses node's result, to new_origin'''
+    for edge in list(node.out_ports[0].output_edges):
+        edge.attach_origin(new_origin)
+
+def delete_if_unused(module, node: Node):
+    if not any(o_p.output_edges for o_p in node.out_ports):
+        module.delete_node(node, True)
+
+def delete_dominated(module, node: Node, keep=()):
+    '''Deletes the nodes, whose results are only used through node's
+    (they aren't needed, when node's result is replaced)'''
+    for other in module.analyses.dominated(node) - set(keep):
+        if module.nodes.get(other.id) is other:
+            module.delete_node(other, True)
+
 def constant_folding_bin(module, bnode: Node):
         left = bnode.in_ports[0].input_node
         right = bnode.in_ports[1].input_node
         if type(left) is Literal:
             if type(right) is Literal:
                 if ((left.value!='Error')and(right.value!='Error')):#or ErrDef(bnode) - как реализовать ErrDef?
-                    result = operators[bnode.operator](left.value, right.value)
+                    try:
+                        result = operators[bnode.operator](left.value, right.value)
+                    except ZeroDivisionError:
+                        # (the program gets an error value at run time)
+                        return module
                     result = bnode.out_ports[0].type.convert(result)
                     parent = bnode.parent_node
                     lit = module.Literal(result, bnode.out_ports[0].type, parent)
-                    bnode.out_ports[0].output_edges[0].attach_origin(lit.out_ports[0])
-                    module.delete_node(left, True)
-                    module.delete_node(right, True)
+                    redirect_output(bnode, lit.out_ports[0])
                     module.delete_node(bnode, True)
+                    delete_if_unused(module, left)
+                    delete_if_unused(module, right)
         return module
 
 def sub_bin_cut(module, bnode: Node):
@@ -58,17 +79,16 @@ def sub_bin_cut(module, bnode: Node):
         # function removing the binary node and it's unnecessary argument
         nonlocal module
         nonlocal bnode
-        edge = bnode.out_ports[0].output_edges[0]
         if attach_to_opposite:
             # if the non-literal value is unchanged by the operator (e.g. +0,*1)
-            edge.attach_origin(bnode.in_ports[ind_opp].input_edge.from_)
-            nodes,inted,inped=arg.trace_back()
-            for node in nodes:
-                module.delete_node(node, True)
+            redirect_output(bnode, bnode.in_ports[ind_opp].input_edge.from_)
+            module.delete_node(bnode, True)
+            delete_if_unused(module, arg)
         else:
             # if the result is always the same literal (e.g. *0)
-            edge.attach_origin(arg.out_ports[0])            
-        module.delete_node(bnode, True)
+            delete_dominated(module, bnode, [arg])
+            redirect_output(bnode, arg.out_ports[0])
+            module.delete_node(bnode, True)
 
     left = bnode.in_ports[0].input_node
     right = bnode.in_ports[1].input_node
@@ -80,12 +100,11 @@ def sub_bin_cut(module, bnode: Node):
                 reduce_to_arg(left, 1, False)
             elif bnode.operator == "-":
                 un = module.Unary("-", bnode.out_ports[0].type, bnode.parent_node)
-                edge = bnode.out_ports[0].output_edges[0]
-                edge.attach_origin(un.out_ports[0])
+                redirect_output(bnode, un.out_ports[0])
                 edge = bnode.in_ports[1].input_edge
                 edge.attach_target(un.in_ports[0])
-                module.delete_node(left, True)
                 module.delete_node(bnode, True)
+                delete_if_unused(module, left)
         elif left.value == 1:
             if bnode.operator == "*":
                 reduce_to_arg(left, 1)
@@ -108,15 +127,13 @@ def sub_bin_cut(module, bnode: Node):
             elif bnode.operator == "*":
                 reduce_to_arg(right, 0, False)
             elif bnode.operator == "**":
+                delete_dominated(module, bnode)
                 lit = module.Literal(
                     bnode.out_ports[0].type.convert(1),
                     bnode.out_ports[0].type,
                     bnode.parent_node
                 )
-                edge = bnode.out_ports[0].output_edges[0]
-                edge.attach_origin(lit.out_ports[0])
-                module.delete_node(left, True)
-                module.delete_node(right, True)
+                redirect_output(bnode, lit.out_ports[0])
                 module.delete_node(bnode, True)
         elif right.value == 1:
             if bnode.operator in ("*", "**", "/"):
@@ -144,99 +161,95 @@ def constant_folding_if(module, ifnode: Node):
     return module
 
 def constant_folding_let(module, letnode: Node):
+    '''Replaces the let's variables, that are literals or the let's inputs,
+    with those in its body, and the let with its body, when no variables
+    are left'''
     body = letnode.body
     init = letnode.init
-    for port in init.out_ports:
-        # get the origin of a local variable and check if it's literal
-        inp = port.input_node
-        if type(inp) is Literal:
-            # connect nodes using the unnecessary local variable to the literal
-            # do the labels of the ports need to be deleted, if the variable they represent is?
-            lb = port.label
-            bports=body.get_in_ports_by_label(lb)
-            for port2 in bports:
-                edges=port2.output_edges
-                for edge in edges:
-                    lit = module.Literal(inp.value, port.type, body)
-                    edge.attach_origin(lit.out_ports[0])
-                body.delete_port(port2)
-            # remove the no longer needed literal
-            module.delete_node(inp, True)
+    # (the body's in_ports get the variables first, then the let's inputs)
+    inputs = body.in_ports[len(init.out_ports):]
+    init_inputs = {port.id: index for index, port in enumerate(init.in_ports)}
+    for port, body_port in list(zip(init.out_ports, body.in_ports)):
+        edge = port.input_edge
+        if edge is None:
+            continue
+        src = edge.from_
+        if src.id in init_inputs:
+            # (a copy of an input: its uses get the input)
+            origin = inputs[init_inputs[src.id]]
+        elif type(src.node) is Literal:
+            origin = None
+        else:
+            continue
+        edges = list(body_port.output_edges)
+        if origin is None and edges:
+            # (one literal for all the uses of the variable)
+            origin = module.Literal(src.node.value, port.type, body).out_ports[0]
+        for body_edge in edges:
+            body_edge.attach_origin(origin)
+        module.delete_edge(edge)
+        init.delete_port(port)
+        body.delete_port(body_port)
+        if type(src.node) is Literal:
+            delete_if_unused(module, src.node)
     # if all the local variables either were literals or are equivalent to the global ones, swap let with it's body
-    if not init.nodes:
-        module.swap_complex_node(body,letnode)
+    if not init.out_ports and not init.has_nodes():
+        module.swap_complex_node(body, letnode)
     return module
 
 def open_substitution(module, callnode: Node): #тут надо будет перепилить с учетом списков вызовов
+    '''Replaces the only call of a function with a Let (without variables,
+    its inputs are the call's arguments), that has the function's nodes
+    in its body'''
     f = callnode.callee
-    if f != "main":
+    # (built-in functions can't be substituted, nor the ones with pragmas:
+    # the time limit or the memo table are the function's)
+    if (f != "main" and f in module.functions
+            and not getattr(module.functions[f], "pragmas", None)):
         i = 0
         for c in module.get_nodes("FunctionCall"):
             if c.callee == f:
                 c1 = c
                 i += 1
         if i == 1:
-            fnode=False
-            for fn in module.get_nodes('Lambda'):
-                if fn.function_name==f:
-                    fnode=fn
-            if not fnode:
-                raise Exception("Nonexistent function is called")
-            parent=c1.get_containing_function
+            fnode = module.functions[f]
+            parent = c1.get_containing_function
             if parent is not fnode:
-                vars_=[]
-                outs_=[]
-                for port in fnode.in_ports:
-                    vars_.append((port.label,port.type))
-                for port in fnode.out_ports:
-                    outs_.append((port.label,port.type))
-                parent=c1.parent_node
-                subs=module.Let(parent,vars_,outs_)
-                cnodes,internal_edges,input_edges=c1.trace_back()
-                
-                init=subs.init
-                body=subs.body
-                cnodes.remove(c1)
-                init.nodes.extend(cnodes)
-                init.edges.extend(internal_edges)
-                if parent.in_ports:
-                    for port1,port2,port3 in zip(parent.in_ports, init.in_ports, subs.in_ports):
-                        for edge in port1.output_edges:
-                            if edge in input_edges:
-                                tar=edge.to
-                                edge.attach_target(port3)
-                                edge2=Edge(port2,tar,init)
-                                
-                if c1.in_ports:
-                    for port1, port2 in zip(fnode.in_ports, body.in_ports):
-                        for edge in port1.output_edges:
-                            edge.attach_origin(port2)
-                            
-                    for port1,port2 in zip(c1.in_ports,init.out_ports):
-                        edge=port1.input_edge
-                        edge.attach_target(port2)
-                        
-                body.nodes+=fnode.nodes
+                outs_ = [(port.label, port.type) for port in fnode.out_ports]
+                parent = c1.parent_node
+                subs = module.Let(parent, [], outs_, False)
+                init = subs.init
+                body = subs.body
+                for owner in [subs, init, body]:
+                    owner.in_ports = [
+                        Port(owner, deepcopy(port.type), index, port.label,
+                             True, "")
+                        for index, port in enumerate(fnode.in_ports)]
+
+                # the call's arguments go to the Let:
+                for port1, port2 in zip(c1.in_ports, subs.in_ports):
+                    port1.input_edge.attach_target(port2)
+                for port1, port2 in zip(fnode.in_ports, body.in_ports):
+                    for edge in list(port1.output_edges):
+                        edge.attach_origin(port2)
+
+                body.nodes += fnode.nodes
                 for edge in fnode.edges:
-                    edge.containing_node=body
+                    edge.containing_node = body
                     body.edges.append(edge)
-                    
-                for port1,port2 in zip(fnode.out_ports,body.out_ports):
-                    edge=port1.input_edge
-                    edge.attach_target(port2)
-                  
-                for port1,port2 in zip(c1.out_ports,subs.out_ports):
-                    for edge in port1.output_edges:
+
+                for port1, port2 in zip(fnode.out_ports, body.out_ports):
+                    port1.input_edge.attach_target(port2)
+
+                for port1, port2 in zip(c1.out_ports, subs.out_ports):
+                    for edge in list(port1.output_edges):
                         edge.attach_origin(port2)
-                module.add_node(subs)
-                del fnode.nodes
-                del fnode.edges
+                fnode.nodes = []
+                fnode.edges = []
                 module.delete_node(fnode)
                 module.delete_node(c1)
-                module.add_node(subs.init)
-                module.add_node(subs.body)
-                module.edges.extend(internal_edges)
-                module.edges.extend(subs.body.edges)
+                # (nodes and edges have been moved between scopes by hand)
+                module.analyses.invalidate()
     return module
 
 def constant_folding_un (module, unode: Node):
@@ -246,11 +259,11 @@ def constant_folding_un (module, unode: Node):
         result=unode.out_ports[0].type.convert(result)
         parent=unode.parent_node
         lit=module.Literal(result,unode.out_ports[0].type,parent)
-        unode.out_ports[0].output_edges[0].attach_origin(lit.out_ports[0])
-        module.delete_node(arg,True)
+        redirect_output(unode,lit.out_ports[0])
         module.delete_node(unode,True)
+        delete_if_unused(module,arg)
     elif unode.operator=='+':
-        unode.out_ports[0].output_edges[0].attach_origin(arg.out_ports[0])
+        redirect_output(unode,unode.in_ports[0].input_edge.from_)
         module.delete_node(unode,True)
     return module
         
@@ -266,96 +279,307 @@ reductions = {'Binary': lambda x,y:  bin_red(x,y),
     'Let':lambda x,y:  constant_folding_let(x,y)
     }
 
-red_names={'Binary','Unary','FunctionCall','If','Let'}          
- 
-def parseRanks (complex_node: Node):
-    rankMap={}
-    def tracebackMap(node:Node):
-        nonlocal rankMap
-        nonlocal complex_node
-        acc_set=set()
-        if hasattr(node,"in_ports"):
-            for port in node.in_ports:
-                new_node=port.input_node
-                if not new_node==complex_node:
-                    acc_set.union(tracebackMap(new_node))
-                    acc_set.add(new_node)
-        r=len(acc_set)
-        rankMap[node]=[r, acc_set]
-        return acc_set
-
-    for port in complex_node.out_ports:
-        tracebackMap (port.input_node)
-    return rankMap
-
-def right_numeration (rankMap):
-    r_max=0
-    for m in rankMap.values():
-        if m[0]>r_max:
-            r_max=m[0]
-    r=0
-    nums={}
-    k=1
-    while r<=r_max:
-        for node in rankMap:
-            if (r==rankMap[node][0])and(node not in nums.values()):
-                nums[k]=node
-                k+=1
-        r+=1
-    return nums
-
-def unused_clean (module, complex_node: Node):
-    rankMap=parseRanks(complex_node)
-    nodes_at_work=set()
-    for acc in rankMap.values():
-        nodes_at_work.union(acc[1])
-    for node in complex_node.nodes:
-        if node.id not in nodes_at_work:
-            module.delete_node(node,True)
+# loop-invariant code motion:
+# nodes, that may be computed once before a loop, if their inputs don't
+# change between iterations (they have no side effects and can't stop
+# the program, the loop may run no iterations at all):
+INVARIANT_NODES = {"Binary", "Unary", "ArrayAccess", "RecordAccess"}
+INVARIANT_CALLS = {"size"}
+LOOP_PARTS = ["init", "range_gen", "condition", "body", "returns"]
+
+
+def sub_nodes(node: Node):
+    nodes = list(getattr(node, "nodes", []))
+    nodes += getattr(node, "branches", [])
+    nodes += [node.__dict__[name] for name in SUBNODE_NAMES
+              if hasattr(node, name)]
+    return nodes
+
+
+def inner_loops_first(node: Node):
+    '''Returns the loops contained in node, every loop goes after
+    the loops nested in it'''
+    loops = []
+    for sub_node in sub_nodes(node):
+        loops += inner_loops_first(sub_node)
+    if node.name == "LoopExpression":
+        loops.append(node)
+    return loops
+
+
+def loop_inputs(loop: Node, part: Node):
+    '''Maps ids of part's in_ports, that get the loop's inputs (they go
+    last, in the same order as the loop's in_ports), to those in_ports'''
+    count = len(loop.in_ports)
+    ports = part.in_ports[len(part.in_ports) - count:] if count else []
+    if ([port.label for port in ports] !=
+            [port.label for port in loop.in_ports]):
+        return {}
+    return {port.id: l_port for port, l_port in zip(ports, loop.in_ports)
+            if l_port.input_edge}
+
+
+def may_hoist(node: Node):
+    if node.name == "FunctionCall":
+        return node.callee in INVARIANT_CALLS
+    if node.name not in INVARIANT_NODES:
+        return False
+    if node.name == "Binary" and node.operator == "/":
+        # (division by zero stops programs compiled without error values)
+        divisor = node.in_ports[1].input_node
+        return type(divisor) is Literal and divisor.value not in (0, "0")
+    return True
+
+
+def invariant_nodes(part: Node, inputs: dict):
+    '''Returns the nodes of a loop's part, that only depend on the loop's
+    inputs and literals, in the order they are computed'''
+    hoisted = []
+
+    def is_invariant(port):
+        edge = port.input_edge
+        if not edge:
+            return False
+        src = edge.from_
+        if src.in_port:
+            return src.id in inputs
+        return src.node in hoisted or type(src.node) is Literal
+
+    for node in part.module.analyses.topological_order(part):
+        if may_hoist(node) and all(is_invariant(i_p) for i_p in node.in_ports):
+            hoisted.append(node)
+    return hoisted
+
+
+def move_edge(edge: Edge, src_node: Node, dst_node: Node):
+    src_node.edges.remove(edge)
+    dst_node.edges.append(edge)
+    edge.containing_node = dst_node
+
+
+def add_loop_input(loop: Node, port: Port, container: Node):
+    '''Passes the value of port (computed in container, before the loop)
+    to the loop and its parts as a new input, returns the new in_ports
+    by their nodes'''
+    label = f"invariant_{port.node.id}"
+    new_ports = {}
+    for owner in [loop] + [loop.__dict__[name] for name in LOOP_PARTS
+                           if hasattr(loop, name)]:
+        new_port = Port(owner, deepcopy(port.type), len(owner.in_ports),
+                        label, True, "")
+        owner.in_ports.append(new_port)
+        new_ports[owner] = new_port
+    Edge(port, new_ports[loop], container)
+    return new_ports
+
+
+def hoist(module, loop: Node, part: Node, nodes: list, inputs: dict):
+    '''Moves nodes out of the loop's part to the node containing the loop'''
+    container = loop.parent_node
+    for node in nodes:
+        part.nodes.remove(node)
+        container.nodes.append(node)
+        if node.name == "ArrayAccess":
+            # (it's read even if the loop runs no iterations, so
+            # the code generator checks the index)
+            node.speculative = True
+        for i_p in node.in_ports:
+            edge = i_p.input_edge
+            src = edge.from_
+            if src.id in inputs:
+                edge.attach_origin(inputs[src.id].input_port)
+            elif src.node not in nodes:
+                # a literal of the part:
+                lit = module.Literal(src.node.value, src.type, container)
+                edge.attach_origin(lit.out_ports[0])
+                if not src.output_edges:
+                    module.delete_node(src.node, True)
+            move_edge(edge, part, container)
+    module.analyses.invalidate(part)
+    module.analyses.invalidate(container)
+
+    for node in nodes:
+        for o_p in node.out_ports:
+            edges = [edge for edge in o_p.output_edges
+                     if edge.to.node not in nodes]
+            if edges:
+                new_ports = add_loop_input(loop, o_p, container)
+                for edge in edges:
+                    edge.attach_origin(new_ports[part])
     return module
 
-def IR_traverse (module, complex_node):
-    #module=unused_clean(module,complex_node)
-    clean_nodes=set()
-    ind=1
-    while ind==1:
-        rankMap=parseRanks(complex_node)
-        nums=right_numeration(rankMap) #сделать, если получится, так, чтобы преобразования сами пересчитывали нумерацию и ранги. вряд ли выйдет, как будто
-        ind=0
-        for i in range (1,len(nums)+1):
-            node=nums[i]
-            if (rankMap[node][1].issubset(clean_nodes))and(node not in clean_nodes):
-                ind=1
-                name=node.name
-                if node.is_complex:
-                    module=IR_traverse(module,node)
-                    break
-                if node.is_multi:
-                    if name=="Let":
-                        module=IR_traverse(module,node.init)
-                        module=IR_traverse(module,node.body)
-                    elif name=="If":
-                        module=IR_traverse(module,node.condition)
-                    elif name=="Case":
-                        pass
-                clean_nodes.add(node)
-                if name in red_names:
-                    module=reductions[name](module,node)#не забыть учесть преобразования внутренних узлов, карту переменных (а они не только в let?...)
-                    break
-    #module=unused_clean(module,complex_node)
+
+def licm(module, loop: Node):
+    '''Hoists the values, that are the same in every iteration, out of
+    the loop's body and returns (A[1], size(A), i * N in a loop over j
+    and the like)'''
+    for name in ["body", "returns"]:
+        if not hasattr(loop, name):
+            continue
+        part = loop.__dict__[name]
+        inputs = loop_inputs(loop, part)
+        nodes = invariant_nodes(part, inputs)
+        if nodes:
+            module = hoist(module, loop, part, nodes, inputs)
     return module
-    
-def default (module: Module):
-    functions=module.get_nodes('Lambda')
-    for f in functions:
-        if f.function_name=='main':
-            sismain=f #можно ли в этот просмотр запихать что-нибудь еще? можно ли изящнее
-    module=IR_traverse(module,sismain)
+
+
+def hoist_loop_invariants(module):
+    for function in list(module.functions.values()):
+        # (values hoisted out of an inner loop may go further out of
+        # the outer one)
+        for loop in inner_loops_first(function):
+            module = licm(module, loop)
     return module
 
-def optimize_ir (module):
-    config = configparser.ConfigParser()  # создаём объект парсера
-    settings=config.read("optimizer_settings.ini")
-    if settings['BASIC SETTINGS']['mode']=='default':
-        module=default(module)
+# value numbering:
+# nodes, whose results only depend on their inputs (so do calls of Sisal
+# functions, they have no side effects, unless they are time-limited,
+# and of these built-ins):
+PURE_NODES = {"Binary", "Unary", "ArrayAccess", "RecordAccess"}
+PURE_CALLS = {"size"}
+COMMUTATIVE_OPERATORS = {"+", "*", "=", "!=", "~=", "&", "|"}
+
+
+def scopes(node: Node):
+    '''Returns node and all nodes inside it, that contain other nodes'''
+    found = [node] if hasattr(node, "nodes") else []
+    for sub_node in sub_nodes(node):
+        found += scopes(sub_node)
+    return found
+
+
+def value_key(module, node: Node, numbers: dict):
+    '''Returns a key, that is the same for nodes computing the same
+    value in a scope, or None for nodes, that can't be merged'''
+    if node.name == "Literal":
+        o_p = node.out_ports[0]
+        return ("Literal", type(o_p.type).__name__, repr(node.value))
+    if node.name == "FunctionCall":
+        if node.callee in module.functions:
+            if not module.analyses.is_pure(node.callee):
+                return None
+        elif node.callee not in PURE_CALLS:
+            return None
+    elif node.name not in PURE_NODES:
+        return None
+    inputs = [numbers.get(i_p.input_edge.from_.id) if i_p.input_edge else None
+              for i_p in node.in_ports]
+    if None in inputs:
+        return None
+    if node.name == "Binary" and node.operator in COMMUTATIVE_OPERATORS:
+        inputs.sort(key=repr)
+    return (node.name, getattr(node, "operator", None),
+            getattr(node, "callee", None), getattr(node, "field", None),
+            tuple(inputs))
+
+
+def value_numbering(module, scope: Node):
+    '''Merges the nodes of scope, that compute the same value'''
+    numbers = {i_p.id: ("in", i_p.index) for i_p in scope.in_ports}
+    values = {}
+    for node in module.analyses.topological_order(scope):
+        key = value_key(module, node, numbers)
+        if key is None or key not in values:
+            if key is not None:
+                values[key] = node
+            for o_p in node.out_ports:
+                numbers[o_p.id] = (node.id, o_p.index)
+            continue
+        same = values[key]
+        for o_p, same_o_p in zip(node.out_ports, same.out_ports):
+            for edge in list(o_p.output_edges):
+                edge.attach_origin(same_o_p)
+            numbers[o_p.id] = numbers[same_o_p.id]
+        module.delete_node(node, True)
     return module
+
+
+def eliminate_common_subexpressions(module):
+    for function in list(module.functions.values()):
+        for scope in scopes(function):
+            module = value_numbering(module, scope)
+    return module
+
+# worklist optimizer:
+def nodes_in_order(node: Node):
+    '''Returns node and the nodes inside it: the nodes of a part go before
+    the node the part belongs to, the nodes of a scope go after the nodes
+    they get their inputs from'''
+    ordered = []
+    for cluster in node.get_clusters():
+        ordered += nodes_in_order(cluster)
+    if hasattr(node, "nodes"):
+        for sub_node in node.module.analyses.topological_order(node):
+            ordered += nodes_in_order(sub_node)
+    ordered.append(node)
+    return ordered
+
+
+def users(node: Node, owners: dict):
+    '''Returns the nodes, that get node's results (for parts of compound
+    nodes, like If's Condition, returns the compound nodes)'''
+    found = []
+    for o_p in node.out_ports:
+        for edge in o_p.output_edges:
+            found.append(owners.get(edge.to.node, edge.to.node))
+    return found
+
+
+def optimize_function(module, function: Node, reductions=reductions):
+    '''Applies the reductions to function's nodes, a node is tried
+    again only when a node it gets its inputs from has changed.
+    Returns the number of the reductions, that have changed anything'''
+    owners = {}
+    worklist = deque()
+    for node in nodes_in_order(function):
+        for cluster in node.get_clusters():
+            owners[cluster] = node
+        worklist.append(node)
+    queued = set(worklist)
+    rewrites = 0
+    while worklist:
+        node = worklist.popleft()
+        queued.discard(node)
+        if node.name not in reductions or module.nodes.get(node.id) is not node:
+            continue
+        affected = users(node, owners)
+        if node.is_multi:
+            # (folding an If or a Let moves its nodes out of it)
+            affected += nodes_in_order(node)[:-1]
+        changes = module.changes
+        module = reductions[node.name](module, node)
+        if module.changes == changes:
+            continue
+        rewrites += 1
+        for user in affected:
+            if module.nodes.get(user.id) is user and user not in queued:
+                worklist.append(user)
+                queued.add(user)
+    return rewrites
+
+
+def optimize_functions(module, reductions=reductions, stats=None):
+    '''Applies the reductions to every function, until none of them
+    changes anything (substitution of a function makes new nodes
+    in another one, those are tried on the next pass).
+    Adds the numbers of passes and of changes to stats'''
+    changed = True
+    while changed:
+        changed = False
+        for name in list(module.functions):
+            if name not in module.functions:
+                continue
+            rewrites = optimize_function(module, module.functions[name],
+                                         reductions)
+            if stats is not None:
+                stats["rewrites"] += rewrites
+            changed = changed or rewrites > 0
+        if stats is not None:
+            stats["iterations"] += 1
+    return module
+
+def optimize_ir (module):
+    from optimizer.pass_manager import PassManager
+
+    return PassManager.from_settings().run(module)
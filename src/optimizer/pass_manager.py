@@ -0,0 +1,158 @@
+"""
+Optimizer's pass manager: runs the passes chosen in optimizer_settings.ini
+(or on the command line) in their order, and repeats the sequence while
+it changes the module. Keeps time and counts of nodes and edges each pass
+has added and removed.
+"""
+
+import configparser
+from os import path
+from time import perf_counter
+
+from optimizer.optimize_ir import (
+    constant_folding_bin,
+    constant_folding_un,
+    sub_bin_cut,
+    constant_folding_if,
+    constant_folding_let,
+    open_substitution,
+    optimize_functions,
+    hoist_loop_invariants,
+    eliminate_common_subexpressions,
+)
+
+SETTINGS_FILE = path.join(path.dirname(path.dirname(path.abspath(__file__))),
+                          "optimizer_settings.ini")
+
+# passes, that rewrite single nodes (they run on a worklist of the nodes,
+# see optimize_functions), by the names of the nodes they rewrite:
+NODE_PASSES = {
+    "constant_folding": {"Binary": constant_folding_bin,
+                         "Unary": constant_folding_un},
+    "identity_cuts": {"Binary": sub_bin_cut},
+    "if_folding": {"If": constant_folding_if},
+    "let_folding": {"Let": constant_folding_let},
+    "inlining": {"FunctionCall": open_substitution},
+}
+
+# passes, that go through the whole module:
+MODULE_PASSES = {
+    "licm": hoist_loop_invariants,
+    "cse": eliminate_common_subexpressions,
+}
+
+PASSES = list(NODE_PASSES) + list(MODULE_PASSES)
+
+MAX_ROUNDS = 10
+
+
+class PassStats:
+    """What a pass has done over all the rounds: runs are the rounds it
+    ran in, iterations are its passes over the module (a node pass goes
+    through the functions until none of its reductions applies), and
+    rewrites are the reductions of single nodes, that have changed
+    anything"""
+
+    def __init__(self, name):
+        self.name = name
+        self.time = 0.0
+        self.runs = 0
+        self.iterations = 0
+        self.rewrites = 0
+        self.nodes_added = 0
+        self.nodes_removed = 0
+        self.edges_added = 0
+        self.edges_removed = 0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+class PassManager:
+
+    def __init__(self, passes=PASSES, max_rounds=MAX_ROUNDS):
+        for index, name in enumerate(passes):
+            if name not in PASSES:
+                raise ValueError(f"unknown optimizer pass: {name} "
+                                 f"(known ones are: {', '.join(PASSES)})")
+            # (the statistics are kept by the passes' names)
+            if name in passes[:index]:
+                raise ValueError(f"optimizer pass {name} is listed twice "
+                                 "(the sequence is repeated anyway)")
+        self.passes = list(passes)
+        self.max_rounds = max_rounds
+        self.stats = {name: PassStats(name) for name in self.passes}
+        self.rounds = 0
+        self.time = 0.0
+        self.size = {}
+
+    @classmethod
+    def from_settings(cls, args=(), settings_file=SETTINGS_FILE):
+        """Makes a pass manager with the passes listed in [PASSES] section
+        of the settings file, command line arguments may override them:
+        --opt-settings <file>, --passes <pass,pass...>,
+        --disable-passes <pass,pass...>"""
+        def arg_value(name):
+            if name in args and args.index(name) + 1 < len(args):
+                return args[args.index(name) + 1]
+            return None
+
+        def names(value):
+            return [name.strip() for name in value.split(",") if name.strip()]
+
+        settings_file = arg_value("--opt-settings") or settings_file
+        config = configparser.ConfigParser()
+        config.read(settings_file)
+        passes = names(config.get("PASSES", "order", fallback=",".join(PASSES)))
+        max_rounds = config.getint("PASSES", "max_rounds", fallback=MAX_ROUNDS)
+
+        if arg_value("--passes") is not None:
+            passes = names(arg_value("--passes"))
+        if arg_value("--disable-passes") is not None:
+            disabled = names(arg_value("--disable-passes"))
+            passes = [name for name in passes if name not in disabled]
+        return cls(passes, max_rounds)
+
+    def run_pass(self, name, module):
+        stats = self.stats[name]
+        counts = (module.nodes_added, module.nodes_deleted,
+                  module.edges_added, module.edges_deleted)
+        start = perf_counter()
+        if name in NODE_PASSES:
+            module = optimize_functions(module, NODE_PASSES[name],
+                                        stats.__dict__)
+        else:
+            module = MODULE_PASSES[name](module)
+            stats.iterations += 1
+        stats.time += perf_counter() - start
+        stats.runs += 1
+        stats.nodes_added += module.nodes_added - counts[0]
+        stats.nodes_removed += module.nodes_deleted - counts[1]
+        stats.edges_added += module.edges_added - counts[2]
+        stats.edges_removed += module.edges_deleted - counts[3]
+        return module
+
+    def run(self, module):
+        """Runs the passes in order, until a round of them changes
+        nothing (or max_rounds times)"""
+        start = perf_counter()
+        self.size["before"] = dict(nodes=len(module.nodes),
+                                   edges=len(module.edges))
+        while self.rounds < self.max_rounds:
+            self.rounds += 1
+            changes = module.changes
+            for name in self.passes:
+                module = self.run_pass(name, module)
+            if module.changes == changes:
+                break
+        self.size["after"] = dict(nodes=len(module.nodes),
+                                  edges=len(module.edges))
+        self.time += perf_counter() - start
+        return module
+
+    def report(self):
+        """Statistics of the passes (suitable for JSON export)"""
+        return dict(passes=[self.stats[name].as_dict() for name in self.passes],
+                    rounds=self.rounds,
+                    time=self.time,
+                    size=self.size)
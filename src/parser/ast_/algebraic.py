@@ -102,10 +102,6 @@ class Bin(Node):
         ]
         return SubIr(nodes=[self], internal_edges=[], output_edges=[])
 
-    def ir_(self):
-        retval = super().ir_()
-        return retval
-
     def __repr__(self):
         return f"<Bin: {self.operator}>"
 
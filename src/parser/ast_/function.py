@@ -10,22 +10,19 @@ from ..scope import SisalScope
 from ..error import SisalError
 from ..type import AnyType, ArrayType, IntegerType, RealType
 from ..edge import Edge
+from ..cost_model import CostModel
+from ..parser_state import state
 
 
 class Function(Node):
     """Class for function nodes"""
 
-    functions = {}
     built_ins = []  # the list is defined below
 
-    @classmethod
-    def reset(cls):
-        cls.functions = {}
-
     @classmethod
     def get_function(cls, name: str):
-        if name in Function.functions:
-            return Function.functions[name]
+        if name in state().functions:
+            return state().functions[name]
         if name in Function.built_ins:
             return Function.built_ins[name]
 
@@ -62,15 +59,18 @@ class Function(Node):
         ]
 
         self.body = body
-        Function.functions[self.function_name] = self
+        state().functions[self.function_name] = self
 
     def __repr__(self) -> str:
         return str(f"<function ({self.function_name})>")
 
-    def analyze(self):
-        """find recursions, estimate complexity etc."""
-        # print(self.function_name, self.find_sub_node("FunctionCall"))
-        pass
+    def analyze(self, cost_model: CostModel):
+        """estimates the work of the function's loops and marks the ones
+        worth running in parallel (runs when all the functions are built,
+        calls are estimated by their callees, cost_model is shared by
+        all the functions of the module)"""
+        for node in getattr(self, "nodes", []):
+            cost_model.mark_loops(node)
 
     def build(self):
         """Recursively rebuilds the function's ir into a dataflow graph.
@@ -78,7 +78,6 @@ class Function(Node):
         and doesn't take any arguments"""
         scope = SisalScope(self)
         self.add_sub_ir(self.body.build(self.out_ports, scope))
-        self.analyze()
         del self.body
 
     def find_sub_node(self, type_: str) -> list:
@@ -103,8 +102,6 @@ class BuiltInFunction(Function):
             Port(None, type_, port_index) for port_index, type_ in enumerate(retvals)
         ]
 
-        Function.functions[self.function_name] = self
-
 
 def array_combine_ports_setup(self):
     port_type = Edge.src_port(self.in_ports[0]).type
@@ -122,13 +122,6 @@ class If(Node):
 
         return SubIr(nodes=[self], internal_edges=[], output_edges=[])
 
-    def ir_(self) -> dict:
-        """Returns this IF as a standard dictionary
-        suitable for export"""
-        retval = super().ir_()
-        retval["branches"] = [branch.ir_() for branch in retval["branches"]]
-        return retval
-
     def find_sub_node(self, type_: str) -> list:
         a = (
             self.condition.find_sub_node(type_)
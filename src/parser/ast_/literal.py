@@ -31,8 +31,8 @@ class Literal(Node):
         # return str(self.ir_())
         return f"<Literal: {self.value}>"
 
-    def ir_(self) -> dict:
-        retval = super().ir_()
+    def ir_shallow(self) -> dict:
+        retval = super().ir_shallow()
         del retval["type"]
 
         return retval
@@ -7,7 +7,7 @@ from ..node import Node, build_method
 from ..port import Port
 from ..scope import SisalScope
 from ..sub_ir import SubIr
-from itertools import count
+from ..parser_state import state
 
 
 class MultiExp(Node):
@@ -17,11 +17,6 @@ class MultiExp(Node):
     """
 
     no_id = True
-    __pragma_groups__ = count()
-
-    @staticmethod
-    def reset():
-        MultiExp.__pragma_groups__ = count()
 
     def __init__(self, expressions: list[Node], location: str):
         super().__init__(location)
@@ -55,7 +50,7 @@ class MultiExp(Node):
         port_index = 0
 
         if self.pragmas:
-            pragmas_id = next(MultiExp.__pragma_groups__)
+            pragmas_id = next(state().pragma_groups)
 
         for n, exp in enumerate(self.expressions):
             if self.pragmas:
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Loop cost model: decides which loops are worth running in parallel.
+
+Work is counted in IR nodes evaluated, the work of a loop is the work of
+its iteration times the number of iterations. Starting a parallel region
+costs about PARALLEL_MIN_WORK, so a loop, that does less, stays
+sequential. The number of iterations is known at compile time only for
+ranges with literal bounds, other loops get the number of iterations,
+that makes them worth running in parallel (it's checked at run time).
+Loops nested in a loop, that always runs in parallel, stay sequential.
+"""
+
+from math import ceil
+from .parser_state import state
+
+PARALLEL_MIN_WORK = 10000
+# iterations of ranges, whose bounds are known at run time only:
+UNKNOWN_TRIP_COUNT = 100
+# work of a recursive call:
+RECURSIVE_CALL_WORK = 1000
+
+LOOP_PARTS = ["init", "range_gen", "body", "condition", "returns"]
+
+
+def sub_nodes(node):
+    nodes = list(getattr(node, "nodes", []))
+    nodes += getattr(node, "branches", [])
+    for part in LOOP_PARTS:
+        if part in node.__dict__ and node.__dict__[part]:
+            nodes.append(node.__dict__[part])
+    return nodes
+
+
+class CostModel:
+
+    def __init__(self):
+        self.sources = {id(edge.to): edge.from_ for edge in state().edges}
+        self.function_work = {}
+
+    def literal_value(self, port):
+        """Returns the value of an integer literal connected to port
+        (through compound nodes' ports), or None"""
+        visited = set()
+        port = self.sources.get(id(port))
+        while port is not None and id(port) not in visited:
+            visited.add(id(port))
+            node = port.node()
+            if node.name == "Literal":
+                try:
+                    return int(node.value)
+                except (TypeError, ValueError):
+                    return None
+            port = self.sources.get(id(port))
+        return None
+
+    def trip_count(self, loop):
+        """Number of the loop's iterations, if it's known at compile
+        time"""
+        trip_count = 1
+        for scatter in loop.range_gen.nodes:
+            if scatter.name != "Scatter":
+                continue
+            range_ = self.sources.get(id(scatter.in_ports[0]))
+            if range_ is None or range_.node().name != "Range":
+                return None
+            left, right = [self.literal_value(i_p)
+                           for i_p in range_.node().in_ports]
+            if left is None or right is None:
+                return None
+            trip_count *= max(right - left + 1, 0)
+        return trip_count
+
+    def iteration_work(self, loop):
+        return sum(self.work(loop.__dict__[part])
+                   for part in ["body", "condition", "returns"]
+                   if part in loop.__dict__ and loop.__dict__[part])
+
+    def loop_work(self, loop):
+        if "range_gen" not in loop.__dict__:
+            trip_count = UNKNOWN_TRIP_COUNT
+        else:
+            trip_count = self.trip_count(loop)
+            if trip_count is None:
+                trip_count = UNKNOWN_TRIP_COUNT
+        init_work = self.work(loop.init) if "init" in loop.__dict__ else 0
+        return init_work + trip_count * self.iteration_work(loop)
+
+    def call_work(self, call):
+        callee = state().functions.get(call.callee)
+        if not callee or getattr(callee, "is_built_in", False):
+            return 1
+        if callee.function_name not in self.function_work:
+            # (recursive calls get a fixed work)
+            self.function_work[callee.function_name] = RECURSIVE_CALL_WORK
+            self.function_work[callee.function_name] = 1 + sum(
+                self.work(node) for node in getattr(callee, "nodes", []))
+        return self.function_work[callee.function_name]
+
+    def work(self, node):
+        if node.name == "Literal":
+            return 0
+        if node.name == "LoopExpression":
+            return self.loop_work(node)
+        if node.name == "FunctionCall":
+            return self.call_work(node)
+        if node.name == "If":
+            return (self.work(node.condition) +
+                    max([self.work(branch) for branch in node.branches],
+                        default=0))
+        nodes = sub_nodes(node)
+        if not nodes:
+            return 1
+        return sum(self.work(sub_node) for sub_node in nodes)
+
+    def mark_loops(self, node, in_parallel_loop=False):
+        """Sets parallel field of loops over ranges, and the number of
+        iterations, that makes them worth running in parallel"""
+        if node.name == "LoopExpression" and "range_gen" in node.__dict__:
+            trip_count = self.trip_count(node)
+            work = max(self.iteration_work(node), 1)
+            node.parallel = not in_parallel_loop and (
+                trip_count is None or
+                trip_count * work >= PARALLEL_MIN_WORK)
+            if node.parallel:
+                node.min_parallel_iterations = ceil(PARALLEL_MIN_WORK / work)
+                # (a loop with a known number of iterations always runs
+                # in parallel)
+                in_parallel_loop = trip_count is not None
+        for sub_node in sub_nodes(node):
+            self.mark_loops(sub_node, in_parallel_loop)
@@ -10,6 +10,8 @@ from .settings import PORT_FULL_DESCRIPTION_IN_EDGES
 from .graphml import GraphMlModule
 from .error import SisalError
 from .type import IntegerType, RealType, AnyType, ArrayType
+from .parser_state import state, add_warning
+from utils.ir_export import ir_data
 
 
 @dataclass
@@ -21,15 +23,10 @@ class Edge:
 
     # TODO add type match checks
 
-    # "global" index for all the edges
-    __edges__ = []
-    __edges_from__ = {}
-    __edges_to__ = {}
-
     @classmethod
     def edge_to_port(cls, port: Port):
         """should be not more than one"""
-        for e in cls.__edges__:
+        for e in state().edges:
             if e.to == port:
                 return e
 
@@ -40,22 +37,11 @@ class Edge:
 
     @classmethod
     def edges_to(cls, node_id: str):
-        return cls.__edges_to__[node_id]
+        return state().edges_to[node_id]
 
     @classmethod
     def edges_from(cls, node_id: str):
-        return cls.__from__[node_id]
-
-    @classmethod
-    def edges(cls, node_id: str):
-        return cls.__edges__[node_id]
-
-    @classmethod
-    def reset(cls):
-        """Resets edge indices"""
-        cls.__edges__ = []
-        cls.__edges_from__ = {}
-        cls.__edges_to__ = {}
+        return state().edges_from[node_id]
 
     def __post_init__(self):
         """Runs after dataclasses __init__"""
@@ -77,8 +63,6 @@ class Edge:
                 IntegerType,
                 RealType,
             ]:
-                from .parser_state import add_warning
-
                 add_warning(
                     f"{from_type} and {to_type} combination "
                     f"({self.from_.node().location} and "
@@ -104,14 +88,17 @@ class Edge:
                     location=f"{self.from_.type.location}",
                 )
 
-        Edge.__edges__.append(self)
-        Edge.__edges_from__[self.from_.node_id] = self
-        Edge.__edges_to__[self.to.node_id] = self
+        state().edges.append(self)
+        state().edges_from[self.from_.node_id] = self
+        state().edges_to[self.to.node_id] = self
 
     def ir_(self):
         """An IR form of this edge as a dict"""
+        return ir_data(self)
+
+    def ir_shallow(self):
         if PORT_FULL_DESCRIPTION_IN_EDGES:
-            return [self.from_.ir_(), self.to.ir_()]
+            return [self.from_, self.to]
         else:
             return dict(
                 from_=(self.from_.node_id, self.from_.index),
@@ -5,11 +5,12 @@
 Describes IR-nodes base class
 """
 from __future__ import annotations
-from itertools import count
 from copy import deepcopy
 from .edge import Edge
+from .parser_state import state
 from .sub_ir import SubIr
 from .error import SisalError
+from utils.ir_export import ir_data
 
 
 def build_method(fn):
@@ -55,10 +56,6 @@ def build_method(fn):
 class Node:
     """Class for nodes"""
 
-    # used to keep IDs' count
-    __ids__ = count()
-    # "global" index for all the nodes
-    __nodes__ = {}
     # if True, do not create an ID for this node
     no_id = False
     # connect parent node's input ports to this nodes' input ports
@@ -76,7 +73,7 @@ class Node:
         initialization"""
         if not self.no_id:
             self.id = self.get_id()
-            Node.__nodes__[self.id] = self
+            state().nodes[self.id] = self
         if location is not None:
             self.location = location
         else:
@@ -132,18 +129,12 @@ class Node:
     @classmethod
     def node(cls, id_: str):
         """Returns a node with the specified ID"""
-        return cls.__nodes__[id_]
-
-    @classmethod
-    def reset(cls):
-        """Resets node indices for recompiling"""
-        cls.__nodes__ = {}
-        cls.__ids__ = count()
+        return state().nodes[id_]
 
     @classmethod
     def get_id(cls):
         """Returns the id in string form"""
-        return "node" + str(next(cls.__ids__))
+        return "node" + str(next(state().node_ids))
 
     def num_out_ports(self):
         """Returns the number of output ports"""
@@ -171,14 +162,12 @@ class Node:
 
     def ir_(self) -> dict:
         """Common for all nodes, converts the fields to export-ready dict"""
-        retval = deepcopy(self.__dict__)
-        for key in ["in_ports", "out_ports", "nodes", "edges"]:
-            if key in retval:
-                retval[key] = [item.ir_() for item in retval[key]]
-        for key in ["init", "body", "range_gen", "returns", "condition"]:
-            if key in retval:
-                retval[key] = retval[key].ir_()
-        return retval
+        return ir_data(self)
+
+    def ir_shallow(self) -> dict:
+        """The fields for export (ports, edges and sub-nodes are exported
+        by ir_data, see utils/ir_export.py)"""
+        return dict(self.__dict__)
 
     def find_sub_node(self, type_: str = None) -> list:
         return [node for node in self.nodes if node.name == type_]
@@ -8,6 +8,7 @@ Node module methods are called to make class instances.
 
 import os
 import re
+from contextlib import nullcontext
 from parsimonious.grammar import Grammar
 from parsimonious.nodes import NodeVisitor
 from parsimonious.exceptions import ParseError, VisitationError
@@ -37,9 +38,11 @@ from .ast_ import (
     record_access
 )
 from .error import SisalError
+from utils.context import CompilationContext
 from .type import (
     IntegerType, BooleanType, RealType, ArrayType, StreamType, TypeDefinition, RecordType)
 from .pre_check import pre_check
+from .cost_model import CostModel
 from .known_pragmas import known_pragmas
 
 
@@ -621,10 +624,17 @@ grammar = Grammar(grammar_text)
 module_visitor = ModuleVisitor()
 
 
-def parse(src_code: str) -> dict:
+def parse(src_code: str, context: CompilationContext = None) -> dict:
     """Parses provided source code and returns an IR.
-    The returned value is a dict that can be exported as JSON"""
+    The returned value is a dict that can be exported as JSON.
+    The parser's state is kept in the context (if it's given, otherwise
+    in the current one), the IR's nodes need it, while they are used"""
 
+    with context or nullcontext():
+        return parse_module(src_code)
+
+
+def parse_module(src_code: str) -> dict:
     reset()
 
     try:
@@ -633,6 +643,9 @@ def parse(src_code: str) -> dict:
         functions, definitions = module_visitor.visit(parsed)
         for function_ in functions:
             function_.build()
+        cost_model = CostModel()
+        for function_ in functions:
+            function_.analyze(cost_model)
         #  functions = [function.ir_() for function in functions]
         warnings = get_warnings()
 
@@ -4,59 +4,70 @@
 """
 Parser's state - provides access to all nodes, edges functions and definitions.
 Also provides a method to reset the whole state.
+The state belongs to the current compilation context (see utils/context.py).
 """
 
-from .node import Node
-from .edge import Edge
-from .ast_.function import Function
-from .ast_.multi_exp import MultiExp
 from itertools import count
+from utils.context import current_context
 
 
 class ParserState:
-    warnings = []
-    debug_enabled = False
-    definitions = {}
+    def __init__(self):
+        self.warnings = []
+        self.definitions = {}
+        # "global" indices for all the nodes, edges and functions:
+        self.nodes = {}
+        self.edges = []
+        self.edges_from = {}
+        self.edges_to = {}
+        self.functions = {}
+        # used to keep IDs' count:
+        self.node_ids = count()
+        self.pragma_groups = count()
+
+
+def state() -> ParserState:
+    return current_context().state("parser", ParserState)
 
 
 def add_definition(name, type_):
-    ParserState.definitions[name] = type_
+    state().definitions[name] = type_
 
 
 def get_definition(name):
-    return ParserState.definitions[name]
+    return state().definitions[name]
 
 
 def enable_debug():
-    ParserState.debug_enabled = True
+    current_context().debug = True
 
 
 def disable_debug():
-    ParserState.debug_enabled = False
+    current_context().debug = False
 
 
 def debug_enabled():
-    return ParserState.debug_enabled
+    return current_context().debug
 
 
 def add_warning(text: str):
-    ParserState.warnings.append(text)
+    state().warnings.append(text)
 
 
 def get_warnings():
-    return ParserState.warnings
+    return state().warnings
 
 
 def node(node_id: str):
-    return Node.node(node_id)
+    return state().nodes[node_id]
 
 
 def edges_to(node_id: str):
-    return Edge.edges_to(node_id)
+    return state().edges_to[node_id]
 
 
 def edges_from(node_id: str):
-    return Edge.edges_from(node_id)
+    return state().edges_from[node_id]
 
 
 def reset():
@@ -64,12 +75,7 @@ def reset():
     Clears Node, Edge, Function indices.
     Resets the node ids.
     """
-    Edge.reset()
-    Node.reset()
-    Function.reset()
-    ParserState.warnings = []
-    ParserState.definitions = {}
-    MultiExp.reset()
+    current_context().reset("parser")
 
 
 # TODO move "get_function(name)" here
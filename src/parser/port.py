@@ -4,7 +4,7 @@
 # pylint: disable=E0602
 from __future__ import annotations
 from dataclasses import dataclass
-from copy import deepcopy
+from utils.ir_export import ir_data
 from .type import Type
 from .settings import DONT_ADD_EMPTY_LABELS
 from .node import Node
@@ -29,10 +29,12 @@ class Port:
 
     def ir_(self):
         """Exports port's IR form as a dict"""
-        retval = deepcopy(self.__dict__)
+        return ir_data(self)
+
+    def ir_shallow(self):
+        retval = dict(self.__dict__)
         if self.label is None and DONT_ADD_EMPTY_LABELS:
             del retval["label"]
-        retval.update(type=self.type.ir_())
         return retval
 
     def graphml(self, port_type):
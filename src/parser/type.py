@@ -3,6 +3,7 @@
 """ Describes sisal types"""
 from dataclasses import dataclass
 from copy import deepcopy
+from utils.ir_export import ir_data
 
 
 @dataclass
@@ -17,8 +18,10 @@ class Type:
 
     def ir_(self):
         """An IR form of the type"""
-        retval = self.__dict__
-        return retval
+        return ir_data(self)
+
+    def ir_shallow(self):
+        return dict(self.__dict__)
 
     def is_array(self):
         return hasattr(self, "element")
@@ -95,8 +98,8 @@ class MultiType(Type):
 class StreamType(MultiType):
     """Class for describing streams."""
 
-    def ir_(self):
-        retval = deepcopy(self.__dict__)["element"].ir_()
+    def ir_shallow(self):
+        retval = self.element.ir_shallow()
         # TODO mark it explicitly as stream somehow
         retval["location"] = self.location
         retval["multi_type"] = "stream"
@@ -118,9 +121,8 @@ class ArrayType(MultiType):
             return False
         return self.element == obj.element
 
-    def ir_(self):
-        retval = deepcopy(self.__dict__)
-        retval["element"] = retval["element"].ir_()
+    def ir_shallow(self):
+        retval = dict(self.__dict__)
         retval["multi_type"] = "array"
         return retval
 
@@ -156,12 +158,10 @@ class RecordType(Type):
             return False
         return self.fields == obj.fields
 
-    def ir_(self):
-        fields = deepcopy(self.fields)
-        fields = {k: v.ir_() for k, v in fields.items()}
+    def ir_shallow(self):
         return dict(name="record",
                     location=self.location,
-                    fields=fields)
+                    fields=self.fields)
 
 
 class TypeDefinition:
@@ -172,4 +172,7 @@ class TypeDefinition:
         self.type.type_name = name
 
     def ir_(self):
-        return dict(name=self.name, type=self.type.ir_())
+        return ir_data(self)
+
+    def ir_shallow(self):
+        return dict(name=self.name, type=self.type)
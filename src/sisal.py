@@ -7,35 +7,20 @@ stand-alone. Use the parse module in other cases.
 
 import sys
 import json
-import re
 from parser import parse
-from os import path
+from os import path, remove
+from time import perf_counter
+from contextlib import redirect_stdout
+from io import BytesIO
+from base64 import b64encode
 from utils.system import get_piped_input
-from parser.parser_state import enable_debug, debug_enabled
-from copy import copy
+from parser.parser_state import debug_enabled
+from utils.context import CompilationContext
+from utils.python_names import json_name
+from utils.ir_export import ir_data, write_json
+from utils.ir_binary import write_binary
 
-json_re = re.compile("_([a-z])")
-re_remove_ = re.compile("_(?=$)")
-
-
-def json_names(obj):
-    """Converts snake_case to camelCase in a dictionary
-    and removes '_' at the end"""
-    new_object = {}
-
-    def convert(value):
-        if isinstance(value, dict):
-            return json_names(value)
-        if isinstance(value, list):
-            return [convert(item) for item in value]
-        return value
-
-    for key, value in obj.items():
-        new_key = re.sub(json_re, lambda m: m.group(1).upper(), key)
-        new_key = re.sub(re_remove_, "", new_key)
-        new_object[new_key] = convert(value)
-
-    return new_object
+IR_FORMATS = ("json", "binary")
 
 
 def main(args):
@@ -45,6 +30,9 @@ def main(args):
     from signal import signal, SIGPIPE, SIG_DFL
     signal(SIGPIPE, SIG_DFL)
 
+    if "--serve" in args:
+        return serve(args)
+
     if "-i" in args:
         file_name_index = args.index("-i") + 1
         if not path.isfile(args[file_name_index]):
@@ -56,30 +44,88 @@ def main(args):
     else:
         src_code = get_piped_input()
 
-    if "--debug" in args:
-        enable_debug()
+    context = CompilationContext(debug="--debug" in args,
+                                 no_error="--noerror" in args)
+    with context:
+        return compile_source(src_code, args, context)
+
+
+def optimize(parsed, args):
+    """Runs the optimizer on the IR (with the passes the arguments choose),
+    returns the optimized module and the pass manager.
+    Raises ValueError, if the arguments name unknown passes, or a pass
+    twice"""
+    from optimizer.pass_manager import PassManager
+    from ir import module
+
+    pass_manager = PassManager.from_settings(args)
+    module = module.Module()
+    module.load_from_data(parsed)
+    return pass_manager.run(module), pass_manager
 
-    parsed_ir = parse.parse(src_code)
+
+def cpp_code(parsed, context):
+    """Generates a C++ program out of the IR"""
+    from code_gen import compile_ir_data
+    module_name = ""  # args[1].split(".")[:-1]
+    # (the IR goes to the code generator as it is, without JSON)
+    return compile_ir_data(parsed, module_name, context)
+
+
+def ir_format(args):
+    """The format of the IR to put out instead of C++ code: the value of
+    --ir-format <json|binary> (--json is --ir-format json), None if
+    there is none. Raises ValueError for unknown formats"""
+    if "--ir-format" in args:
+        index = args.index("--ir-format") + 1
+        format_ = args[index] if index < len(args) else None
+        if format_ not in IR_FORMATS:
+            raise ValueError(f"unknown IR format: {format_} "
+                             f"(known ones are: {', '.join(IR_FORMATS)})")
+        return format_
+    if "--json" in args:
+        return "json"
+    return None
+
+
+def compile_source(src_code, args, context):
+    """Compiles the program as the command line arguments say (the state
+    of the compilation is kept in the context)"""
+    try:
+        format_ = ir_format(args)
+    except ValueError as e:
+        print(f"Error: {e}.")
+        return -1
+    parsed_ir = parse.parse(src_code, context)
     if not parsed_ir["errors"]:
-        parsed = copy(parsed_ir)
-        parsed["functions"] = [
-                function.ir_() for function in parsed["functions"]
-            ]
+        # the parser's functions (or the optimized module) are exported
+        # as dicts with Python names for the optimizer and the code
+        # generator, and written straight to stdout for --ir-format
+        # (see utils/ir_export.py and utils/ir_binary.py)
+        parsed = parsed_ir
         if "--opt" in args:
-            from optimizer.optimize_ir import optimize_ir
-            from utils.python_names import python_names
-            from ir import module
-
-            module = module.Module()
-            module.load_from_json_data(json_names(parsed))
+            try:
+                module, pass_manager = optimize(ir_data(parsed), args)
+            except ValueError as e:
+                print(f"Error: {e}.")
+                return -1
+            if "--pass-stats" in args:
+                print(json.dumps(pass_manager.report(), indent=1))
+                return 0
             if "--drawgraph" in args:
                 from ir.draw_graph import draw_module
-                draw_module(optimize_ir(module))
+                draw_module(module)
                 return
-            parsed = python_names(optimize_ir(module).save_to_json())
-        if "--json" in args:
+            parsed = module
+        if format_ == "json":
             '''Parse only and try to get an IR as JSON'''
-            print(json.dumps(json_names(parsed), indent=1))
+            write_json(parsed, sys.stdout, json_name)
+            print()
+        elif format_ == "binary":
+            '''Parse only and get a binary IR'''
+            sys.stdout.flush()
+            write_binary(parsed, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
         elif "--graphml" in args:
             '''Parse only and try to get an IR as GraphML'''
             import parser.graphml as graphml
@@ -88,23 +134,17 @@ def main(args):
             print(gmlm)
         elif "--drawgraph" in args:
             from ir.draw_graph import draw_graph
-            draw_graph(json_names(parsed))
+            draw_graph(ir_data(parsed, json_name))
         elif "--codegenex" in args:
             from codegenex import codegen
             from ir import module
             module = module.Module()
-            module.load_from_json_data(json_names(parsed))
+            module.load_from_data(ir_data(parsed))
             codegen.codegen(module)
         else:
             '''Parse and generate a C++ program'''
-            import codegen.codegen_state
-            codegen.codegen_state.global_no_error = "--noerror" in args
-            from code_gen import compile_ir
-            module_name = ""  # args[1].split(".")[:-1]
-            # convert it to JSON text:
-            ir = json.dumps(json_names(parsed), indent=1)
             try:
-                cpp_src = compile_ir(ir, module_name)
+                cpp_src = cpp_code(ir_data(parsed), context)
                 # put out a JSON containing the code and errors,
                 # or just plain code:
                 if "--cppjson" in args:
@@ -123,5 +163,114 @@ def main(args):
     return 0
 
 
+def compile_request(request):
+    """Compiles the program of a compile server's request (see serve),
+    returns the response"""
+    start = perf_counter()
+    response = {"id": request.get("id")}
+    args = list(request.get("flags", []))
+    if request.get("opt"):
+        args.append("--opt")
+    # (a new context for every request: nothing is left from the others)
+    context = CompilationContext(no_error="--noerror" in args)
+    with context:
+        try:
+            format_ = ir_format(args)
+            parsed_ir = parse.parse(request["source"], context)
+            response["errors"] = parsed_ir["errors"]
+            if parsed_ir.get("warnings"):
+                response["warnings"] = parsed_ir["warnings"]
+            if not parsed_ir["errors"]:
+                parsed = parsed_ir
+                if "--opt" in args:
+                    module, pass_manager = optimize(ir_data(parsed), args)
+                    if "--pass-stats" in args:
+                        response["pass_stats"] = pass_manager.report()
+                    parsed = module
+                if format_ == "json":
+                    response["ir"] = ir_data(parsed, json_name)
+                elif format_ == "binary":
+                    file = BytesIO()
+                    write_binary(parsed, file)
+                    response["ir"] = b64encode(file.getvalue()).decode()
+                else:
+                    response["cpp_src"] = cpp_code(ir_data(parsed), context)
+        except Exception as e:
+            response["errors"] = [str(e)]
+    response["time"] = round(perf_counter() - start, 6)
+    return response
+
+
+def serve_lines(lines, respond):
+    """Compiles the requests (JSON lines), passes the responses to
+    respond"""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or "source" not in request:
+                raise ValueError("a request must have a source")
+        except ValueError as e:
+            respond({"id": None, "errors": [f"bad request: {e}"]})
+            continue
+        respond(compile_request(request))
+
+
+def serve(args):
+    """Compile server: takes compile requests as JSON lines, like
+    {"id": 1, "source": "function main(...) ... end function",
+     "flags": ["--json"], "opt": true},
+    and puts out a JSON line for each of them, with the same id,
+    "errors", "cpp_src" (or "ir" with --json, base64 of a binary IR
+    with --ir-format binary), "warnings" and "time" the compilation
+    took (in seconds). The flags are sisal.py's:
+    --json, --ir-format, --noerror, --opt (or "opt": true), --passes,
+    --disable-passes, --opt-settings, --pass-stats.
+    The requests come from stdin, or (with --socket <path>) from
+    the connections to a Unix socket, each one served in a thread
+    of its own. The parser's grammar and the compiler's modules
+    are loaded once for all of them."""
+    # (loaded before the first request comes)
+    import code_gen  # noqa: F401
+    import optimizer.pass_manager  # noqa: F401
+    import ir.module  # noqa: F401
+
+    if "--socket" not in args:
+        out = sys.stdout
+
+        def respond(response):
+            out.write(json.dumps(response) + "\n")
+            out.flush()
+
+        # (what the compiler prints mustn't get into the responses)
+        with redirect_stdout(sys.stderr):
+            serve_lines(sys.stdin, respond)
+        return 0
+
+    import socketserver
+
+    socket_path = args[args.index("--socket") + 1]
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def respond(response):
+                self.wfile.write((json.dumps(response) + "\n").encode())
+                self.wfile.flush()
+
+            serve_lines((line.decode() for line in self.rfile), respond)
+
+    if path.exists(socket_path):
+        remove(socket_path)
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            remove(socket_path)
+    return 0
+
+
 if __name__ == "__main__":
     sys.exit(main(sys.argv))
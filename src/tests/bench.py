@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Measures how compiled example programs scale with input size
+(wall time and peak resident set size of the program).
+
+usage: python tests/bench.py [module ...] [--sizes 64,128,256]
+(run from the src directory, like tests/full.py)
+The size is the matrix dimension for matmul and the number of
+elements for qsort.
+"""
+
+import sys
+import os
+import json
+import random
+import subprocess
+import tempfile
+import time
+
+
+EXAMPLES_PATH = "../examples/"
+DEFAULT_SIZES = [64, 128, 256, 512]
+
+
+def random_matrix(n):
+    return [[random.randint(-9, 9) for _ in range(n)] for _ in range(n)]
+
+
+def matmul_input(n):
+    return dict(A=random_matrix(n), B=random_matrix(n), M=n, N=n, K=n)
+
+
+def matmul_cross_input(n):
+    return dict(A=random_matrix(n), B=random_matrix(n))
+
+
+def qsort_input(n):
+    return dict(A=[random.randint(-n, n) for _ in range(n)])
+
+
+# input generators for benchmarked modules, they take the problem size
+input_generators = {
+    "matmul": matmul_input,
+    "matmul_cross": matmul_cross_input,
+    "qsort": qsort_input,
+}
+
+
+def compile_module(module_name):
+    src_file = EXAMPLES_PATH + module_name + ".sis"
+    result = subprocess.run(
+        ["python", "sisal.py", "-i", src_file, "--cpp"],
+        stdout=subprocess.PIPE
+    )
+    binary = "./bench_" + module_name
+    cmd_line = (f"g++ -xc++ - -fopenmp -fconcepts -ljsoncpp -w "
+                f"-o {binary} -O3").split()
+    subprocess.run(cmd_line, input=result.stdout)
+    if not os.path.isfile(binary):
+        raise Exception(f"{module_name}: C++ code didn't compile.")
+    return binary
+
+
+def run_binary(binary, input_data):
+    """Runs the binary, returns wall time in seconds and
+    peak RSS in megabytes"""
+    with tempfile.TemporaryFile() as input_file:
+        input_file.write(bytes(json.dumps(input_data), "utf-8"))
+        input_file.seek(0)
+        start = time.perf_counter()
+        proc = subprocess.Popen([binary], stdin=input_file,
+                                stdout=subprocess.DEVNULL)
+        # wait4 gives resource usage of this child only:
+        _, _, usage = os.wait4(proc.pid, 0)
+        proc.returncode = 0
+        wall_time = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    return wall_time, usage.ru_maxrss / 1024
+
+
+def benchmark(module_name, sizes):
+    binary = compile_module(module_name)
+    print(f"{module_name}:")
+    print(f"{'N':>8} {'time, s':>10} {'peak RSS, MB':>14}")
+    try:
+        for n in sizes:
+            input_data = input_generators[module_name](n)
+            wall_time, max_rss = run_binary(binary, input_data)
+            print(f"{n:>8} {wall_time:>10.3f} {max_rss:>14.1f}")
+    finally:
+        os.remove(binary)
+
+
+def main(args):
+    sizes = DEFAULT_SIZES
+    if "--sizes" in args:
+        sizes_index = args.index("--sizes") + 1
+        sizes = [int(n) for n in args[sizes_index].split(",")]
+        args = args[:sizes_index - 1] + args[sizes_index + 1:]
+
+    modules = args[1:] or list(input_generators)
+    random.seed(0)
+    for module_name in modules:
+        benchmark(module_name, sizes)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Helpers of the unit tests (python -m pytest tests/test_*.py)"""
+
+import json
+import shutil
+import subprocess
+import sys
+from os import path
+import pytest
+import sisal
+from ir.module import Module
+from parser import parse
+from utils.context import CompilationContext
+from utils.ir_export import ir_data
+
+SRC_PATH = path.dirname(path.dirname(path.abspath(__file__)))
+EXAMPLES_PATH = path.join(path.dirname(SRC_PATH), "examples")
+
+
+def example(name):
+    """Returns the source code of an example program"""
+    with open(path.join(EXAMPLES_PATH, name + ".sis"), encoding="UTF-8") as file:
+        return file.read()
+
+
+def run_sisal(source, *args):
+    """Runs sisal.py with the arguments on the program (it comes from
+    stdin), returns the finished process (see subprocess.run)"""
+    return subprocess.run([sys.executable, "sisal.py", *args], cwd=SRC_PATH,
+                          input=source.encode(), stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE)
+
+
+def compile_program(source, *flags):
+    """Compiles the program with sisal.py, checks that there are no errors
+    and returns the output (C++ code, or the IR with --json)"""
+    result = run_sisal(source, *flags)
+    assert result.returncode == 0, result.stderr.decode()
+    return result.stdout.decode()
+
+
+def compile_cpp(source, opt=False):
+    """Compiles the program in this process (the IR goes from the parser
+    to the optimizer and the code generator in memory), with a context
+    of its own, returns the C++ code"""
+    with CompilationContext() as context:
+        parsed = parse.parse(source, context)
+        assert parsed["errors"] == [], parsed["errors"]
+        parsed = ir_data(parsed)
+        if opt:
+            module, _ = sisal.optimize(parsed, ["--opt"])
+            parsed = ir_data(module)
+        return sisal.cpp_code(parsed, context)
+
+
+def load_module(source):
+    """Returns the program's IR (sisal.py --json) loaded into a Module"""
+    module = Module()
+    module.load_from_json_data(json.loads(compile_program(source, "--json")))
+    return module
+
+
+def cpp_function(cpp_src, header):
+    """Returns the C++ function, that starts with the line header"""
+    start = cpp_src.index("\n" + header + "\n") + 1
+    return cpp_src[start:cpp_src.index("\n}", start) + 2]
+
+
+def io_data(name):
+    """Returns the example's inputs and the expected outputs
+    (examples/io_data)"""
+    with open(path.join(EXAMPLES_PATH, "io_data", name + ".json"),
+              encoding="UTF-8") as file:
+        return json.load(file)
+
+
+def build_program(cpp_src, executable):
+    """Compiles the C++ code like tests/full.py does (the test is skipped
+    without g++), returns the executable's path"""
+    if shutil.which("g++") is None:
+        pytest.skip("g++ isn't installed")
+    subprocess.run(["g++", "-xc++", "-", "-fopenmp", "-fconcepts",
+                    "-ljsoncpp", "-o", str(executable), "-O3"],
+                   input=cpp_src.encode(), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return str(executable)
+
+
+def run_program(executable, inputs):
+    """Runs the compiled program, returns its outputs"""
+    result = subprocess.run([executable], input=json.dumps(inputs).encode(),
+                            stdout=subprocess.PIPE, check=True)
+    return json.loads(result.stdout)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Tests of the cached analyses of the IR (see ir/analysis.py)"""
+
+from tests.helpers import load_module
+
+PROGRAM = """
+//$ max_time = 1
+function g(x: integer returns integer)
+  x * 2
+end function
+
+function h(x: integer returns integer)
+  x - 1
+end function
+
+function main(x, y: integer returns integer, integer)
+  x * (x + y), g(y) + h(y)
+end function
+"""
+
+
+def node(scope, name, operator=None):
+    """Returns the scope's node with the name (and operator)"""
+    return next(node for node in scope.nodes if node.name == name and
+                getattr(node, "operator", None) == operator)
+
+
+def test_analyses_of_a_scope_are_recomputed_after_a_change():
+    module = load_module(PROGRAM)
+    analyses = module.analyses
+    main = module.functions["main"]
+    h = module.functions["h"]
+    add = node(main, "Binary", "+")
+    mul = node(main, "Binary", "*")
+
+    order = analyses.topological_order(main)
+    assert order.index(add) < order.index(mul)
+    assert analyses.inputs_of(mul) == {add}
+    assert analyses.post_dominators(main)[add] is mul
+    h_order = analyses.topological_order(h)
+
+    # (the product gets a literal instead of the sum)
+    literal = module.Literal(2, add.out_ports[0].type, main)
+    mul.in_ports[1].input_edge.attach_origin(literal.out_ports[0])
+
+    assert main not in analyses.scopes
+    assert literal in analyses.topological_order(main)
+    assert analyses.inputs_of(mul) == {literal}
+    assert analyses.post_dominators(main)[add] is None
+    assert analyses.dominated(mul) == {literal}
+    # (the other scopes keep their results)
+    assert analyses.scopes[h]["order"] is h_order
+
+
+def test_purity_is_recomputed_after_a_function_is_deleted():
+    module = load_module(PROGRAM)
+    analyses = module.analyses
+    main = module.functions["main"]
+
+    assert not analyses.is_pure("g")
+    assert not analyses.is_pure("main")
+    assert analyses.is_pure("h")
+
+    call = next(node for node in main.nodes
+                if node.name == "FunctionCall" and node.callee == "g")
+    module.delete_node(call, delete_attached_edges=True)
+    module.delete_node(module.functions["g"], delete_attached_edges=True)
+
+    assert analyses.purity is None
+    assert analyses.is_pure("main")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Tests of the compilation context (see utils/context.py): compilations
+keep their state apart, so they may run one after another or on several
+threads of a process"""
+
+from concurrent.futures import ThreadPoolExecutor
+from codegen import codegen_state
+from parser import parser_state
+from utils.context import CompilationContext
+from tests.helpers import example, compile_cpp
+
+EXAMPLES = ["fib", "qsort", "matmul", "cross_product", "record1", "record3",
+            "memoize_args", "boolean_array", "error_values", "time_limit",
+            "independent_calls", "update_in_place", "let2", "multi_out"]
+
+
+def test_concurrent_compilations_match_sequential_ones():
+    jobs = [(example(name), opt) for opt in (False, True) for name in EXAMPLES]
+    sequential = [compile_cpp(source, opt) for source, opt in jobs]
+    # (every program twice, so the same one is compiled at the same time)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        concurrent = list(executor.map(lambda job: compile_cpp(*job),
+                                       jobs + jobs))
+    assert concurrent == sequential + sequential
+
+
+def test_compiling_again_gives_the_same_code():
+    source = example("qsort")
+    assert compile_cpp(source) == compile_cpp(source)
+    assert compile_cpp(source, opt=True) == compile_cpp(source, opt=True)
+
+
+def test_context_has_state_of_its_own():
+    codegen_outside = codegen_state.state()
+    parser_outside = parser_state.state()
+    with CompilationContext():
+        codegen_inside = codegen_state.state()
+        parser_inside = parser_state.state()
+        assert codegen_inside is not codegen_outside
+        assert parser_inside is not parser_outside
+        # (the same one for the whole compilation)
+        assert codegen_state.state() is codegen_inside
+        assert parser_state.state() is parser_inside
+    assert codegen_state.state() is codegen_outside
+    assert parser_state.state() is parser_outside
@@ -1,39 +1,95 @@
-import sys
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Tests of the IR's export and import: JSON (ir.Module.save_to_json)
+and the binary format (utils/ir_binary.py)"""
+
 import json
+from io import BytesIO
 from os import path
-
-sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+import pytest
 from ir.module import Module
-from ir.edge import Edge
+from parser import parse
+from utils.context import CompilationContext
+from utils.ir_export import ir_data
+from utils.ir_binary import write_binary, read_binary, is_binary
+from code_gen import compile_ir
+from tests.helpers import example, compile_program, compile_cpp
+
+TESTS_PATH = path.dirname(path.abspath(__file__))
+
+RECORDS = """
+type Point = record[x: integer; y: integer]
+type Points = array[Point]
+
+function main(P: Points returns integer, integer, Point)
+  P[1].x, P[2].y, P[2]
+end function
+"""
+
+
+def parsed_ir(source):
+    """Returns the parser's IR of the program (with Python names)"""
+    with CompilationContext() as context:
+        parsed = parse.parse(source, context)
+        assert parsed["errors"] == [], parsed["errors"]
+        return ir_data(parsed)
+
+
+def binary(ir):
+    file = BytesIO()
+    write_binary(ir, file)
+    return file.getvalue()
 
-M = Module("tests/array.json")
 
-#M.delete_node(M.nodes["node4"], True)
-#M.delete_node(M.nodes["node3"], True)
-M.delete_node(M.nodes["node1"], True)
+def test_export_is_invariant(tmp_path):
+    # (a module doesn't change when it's exported and loaded again)
+    module = Module(path.join(TESTS_PATH, "array.json"))
+    module.delete_node(module.nodes["node1"], True)
+    output = json.dumps(module.save_to_json(), indent=2)
+    file_name = tmp_path / "output.json"
+    file_name.write_text(output)
 
-json_data = M.save_to_json()
-output = json.dumps(json_data, indent=2)
+    assert json.dumps(Module(str(file_name)).save_to_json(), indent=2) == output
 
 
-print(M.functions["main"].out_ports[0].type.multi_type)
-open("/home/alexm/output.json", "w").write(output)
+@pytest.mark.parametrize("source", [RECORDS, example("array"),
+                                    example("boolean_array")])
+def test_binary_ir_round_trip(source):
+    ir = parsed_ir(source)
+    data = binary(ir)
+    assert is_binary(data)
+    # (edges' ends come back as tuples, JSON has lists for both)
+    assert json.dumps(read_binary(data)) == json.dumps(ir)
 
+    module = Module()
+    module.load_from_data(ir)
+    loaded = Module()
+    loaded.load_from_binary_data(module.save_to_binary())
+    assert loaded.save_to_json() == module.save_to_json()
 
-# check if module json doesn't change when we load it and export it again:
-M2 = Module("/home/alexm/output.json")
 
+def test_json_and_binary_ir_files_load_the_same(tmp_path):
+    module = Module()
+    module.load_from_data(parsed_ir(RECORDS))
+    with open(tmp_path / "records.json", "w", encoding="UTF-8") as file:
+        module.write_json(file)
+    with open(tmp_path / "records.bin", "wb") as file:
+        module.write_binary(file)
 
-if output == json.dumps(M2.save_to_json(), indent=2):
-    print("Invariant test passed: export is invariant")
-else:
-    print("Invariant test failed: export is different from import")
+    from_json = Module(str(tmp_path / "records.json"))
+    from_binary = Module(str(tmp_path / "records.bin"))
+    assert from_binary.save_to_json() == from_json.save_to_json()
+    assert list(from_binary.definitions) == ["Point", "Points"]
+    assert len(from_binary.functions["main"].out_ports) == 3
 
-for name, node in sorted(M.nodes.items()):
-    try:
-        print(M.edges_from[node.out_ports[0].id])
-    except:
-        print(f"{node.id}({node.name}) ", "has no output edges")
 
-import os
-os.system("python sisal.py -i ../examples/array.sis --json")
+@pytest.mark.parametrize("name", ["fib", "qsort", "record3", "boolean_array",
+                                  "memoize_args", "multi_out", "error_values"])
+@pytest.mark.parametrize("flags", [[], ["--opt"]])
+def test_ir_in_memory_gives_the_same_code_as_json(name, flags):
+    # (sisal.py used to hand the IR to the code generator as JSON text)
+    json_text = compile_program(example(name), *flags, "--json")
+    with CompilationContext() as context:
+        from_json = compile_ir(json_text, "", context)
+    assert compile_cpp(example(name), opt="--opt" in flags) == from_json
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Tests of the optimizer's passes (see optimizer/optimize_ir.py)"""
+
+import json
+import pytest
+from tests.helpers import (example, compile_program, cpp_function, load_module,
+                           io_data, build_program, run_program)
+from ir.node import SUBNODE_NAMES
+from optimizer.optimize_ir import (hoist_loop_invariants,
+                                   eliminate_common_subexpressions,
+                                   constant_folding_let)
+
+INVARIANTS = """
+function f(x: integer returns integer)
+  x * 2
+end function
+
+function main(A: array of integer; N, M: integer
+              returns integer, integer, integer, integer)
+  for a in A repeat v := f(N) + a returns sum of v end for,
+  for a in A repeat v := if a > 0 then A[1] else 0 end if returns sum of v end for,
+  for a in A repeat v := a + N / M returns sum of v end for,
+  for a in A repeat v := a + N * M returns sum of v end for
+end function
+"""
+
+
+def in_loops(node, in_loop=False, found=None):
+    """Returns (node, if it's inside a loop) for every node inside node"""
+    found = [] if found is None else found
+    sub_nodes = (list(getattr(node, "nodes", [])) +
+                 list(getattr(node, "branches", [])) +
+                 [getattr(node, name) for name in SUBNODE_NAMES
+                  if hasattr(node, name)])
+    for sub_node in sub_nodes:
+        found.append((sub_node, in_loop))
+        in_loops(sub_node, in_loop or sub_node.name == "LoopExpression", found)
+    return found
+
+
+def test_licm_hoists_array_access_with_a_guard():
+    module = hoist_loop_invariants(load_module(example("qsort")))
+    accesses = [(node, in_loop) for node, in_loop
+                in in_loops(module.functions["sort"])
+                if node.name == "ArrayAccess"]
+    # (A[1] of Less, Same and More)
+    assert len(accesses) == 3
+    for node, in_loop in accesses:
+        assert not in_loop
+        assert node.speculative
+
+    # (the loops may run no iterations, so the index is checked)
+    cpp_src = compile_program(example("qsort"), "--opt")
+    sort = cpp_function(cpp_src, "Array<integer> sort(const Array<integer>& A)")
+    assert "if (unsigned(0) < A.size()) array_access = A.value(0);" in sort
+    assert sort.rindex("A.value(0)") < sort.index("for(")
+    # (the three reads are one value)
+    assert sort.count("A.value(0)") == 1
+
+
+def test_licm_keeps_calls_and_conditional_nodes_in_loops():
+    module = hoist_loop_invariants(load_module(INVARIANTS))
+    in_loop = {(node.name, getattr(node, "operator", None),
+                getattr(node, "callee", None)): in_loop
+               for node, in_loop in in_loops(module.functions["main"])
+               if node.name in ["FunctionCall", "ArrayAccess", "Binary"]}
+    assert in_loop[("FunctionCall", None, "f")]
+    # (A[1] is only read when a > 0)
+    assert in_loop[("ArrayAccess", None, None)]
+    # (M may be 0)
+    assert in_loop[("Binary", "/", None)]
+    assert not in_loop[("Binary", "*", None)]
+
+COMMON_SUBEXPRESSIONS = """
+function f(x: integer returns integer)
+  for i in 1, x returns sum of i end for
+end function
+
+//$ max_time = 1
+function g(x: integer returns integer)
+  x + 1
+end function
+
+function main(a, b: integer returns integer, integer, integer, integer,
+                                     integer, integer, integer)
+  a + b, b + a, a - b, b - a,
+  f(a) + f(a),
+  g(a) + g(a),
+  a * 7 - b * 7
+end function
+"""
+
+LET_CONSTANT = """
+function main(x, y: integer returns integer)
+  let k := 5 in x * k + y * k end let
+end function
+"""
+
+
+def node_counts(nodes):
+    """Counts the nodes by their names and operators, callees or values"""
+    counts = {}
+    for node in nodes:
+        key = (node.name, getattr(node, "operator", None) or
+               getattr(node, "callee", None) or getattr(node, "value", None))
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def test_cse_merges_same_values():
+    module = eliminate_common_subexpressions(load_module(COMMON_SUBEXPRESSIONS))
+    counts = node_counts(module.functions["main"].nodes)
+    # (a + b and b + a are the same, a - b and b - a aren't)
+    assert counts[("Binary", "+")] == 3
+    assert counts[("Binary", "-")] == 3
+    assert counts[("FunctionCall", "f")] == 1
+    # (g is time-limited, its calls may stop the program)
+    assert counts[("FunctionCall", "g")] == 2
+    # (literals of the same type and value are pooled)
+    assert counts[("Literal", 7)] == 1
+
+
+def test_let_folding_makes_one_literal_per_variable():
+    module = load_module(LET_CONSTANT)
+    module = constant_folding_let(module, module.get_nodes("Let")[0])
+    counts = node_counts(module.nodes.values())
+    assert counts[("Literal", 5)] == 1
+    assert ("Let", None) not in counts
+
+
+@pytest.mark.parametrize("name", ["let2", "multi_assignment2", "boolean_array",
+                                  "error_values", "time_limit"])
+def test_optimized_examples_give_the_same_results(name, tmp_path):
+    # (these have lets to fold, boolean literals and a time-limited
+    # function, that mustn't be inlined)
+    cpp_src = compile_program(example(name), "--opt")
+    executable = build_program(cpp_src, tmp_path / name)
+    for case in io_data(name):
+        assert run_program(executable, case["input"]) == case["output"]
+
+
+def test_optimized_records_keep_their_definitions(tmp_path):
+    source = example("record1")
+    ir = json.loads(compile_program(source, "--opt", "--json"))
+    assert [definition["name"] for definition in ir["definitions"]] == ["compl_"]
+
+    cpp_src = compile_program(source, "--opt")
+    executable = build_program(cpp_src, tmp_path / "record1")
+    for case in io_data("record1"):
+        assert run_program(executable, case["input"]) == case["output"]
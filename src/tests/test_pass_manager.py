@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Tests of the optimizer's pass manager (see optimizer/pass_manager.py)"""
+
+import json
+import pytest
+from optimizer.pass_manager import PassManager, PASSES
+from tests.helpers import compile_program, load_module, run_sisal
+
+CONSTANTS = """
+function main(x: integer returns integer)
+  x + (2 + 3) * 4
+end function
+"""
+
+
+def test_passes_come_from_the_settings():
+    assert PassManager.from_settings([]).passes == PASSES
+
+
+def test_passes_argument_chooses_the_passes():
+    pass_manager = PassManager.from_settings(["--opt", "--passes", "licm, cse"])
+    assert pass_manager.passes == ["licm", "cse"]
+    assert list(pass_manager.stats) == ["licm", "cse"]
+
+
+def test_disable_passes_argument_removes_the_passes():
+    pass_manager = PassManager.from_settings(
+        ["--opt", "--disable-passes", "inlining,licm"])
+    assert pass_manager.passes == [name for name in PASSES
+                                   if name not in ("inlining", "licm")]
+
+
+def test_unknown_pass_is_an_error():
+    with pytest.raises(ValueError, match="unknown optimizer pass: unrolling"):
+        PassManager.from_settings(["--passes", "licm,unrolling"])
+
+    result = run_sisal(CONSTANTS, "--opt", "--passes", "unrolling")
+    assert result.returncode != 0
+    assert result.stdout.decode().startswith(
+        "Error: unknown optimizer pass: unrolling")
+
+
+def test_pass_listed_twice_is_an_error():
+    with pytest.raises(ValueError, match="optimizer pass cse is listed twice"):
+        PassManager.from_settings(["--passes", "cse,licm,cse"])
+
+    result = run_sisal(CONSTANTS, "--opt", "--passes", "cse,licm,cse",
+                       "--pass-stats")
+    assert result.returncode != 0
+    assert result.stdout.decode().startswith(
+        "Error: optimizer pass cse is listed twice")
+
+
+def test_pass_stats_output():
+    report = json.loads(compile_program(
+        CONSTANTS, "--opt", "--passes", "constant_folding,cse", "--pass-stats"))
+
+    assert [stats["name"] for stats in report["passes"]] == [
+        "constant_folding", "cse"]
+    folding = report["passes"][0]
+    # ((2 + 3) * 4 takes two rewrites, the next round changes nothing)
+    assert folding["rewrites"] == 2
+    assert folding["runs"] == report["rounds"] == 2
+    assert folding["nodes_removed"] > folding["nodes_added"]
+    assert report["size"]["after"]["nodes"] < report["size"]["before"]["nodes"]
+    assert report["time"] >= folding["time"] >= 0
+
+
+def test_disabled_passes_change_nothing():
+    pass_manager = PassManager.from_settings(["--passes", ""])
+    pass_manager.run(load_module(CONSTANTS))
+    assert pass_manager.report()["passes"] == []
+    assert pass_manager.size["after"] == pass_manager.size["before"]
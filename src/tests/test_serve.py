@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Tests of the compile server (python sisal.py --serve)"""
+
+import json
+from tests.helpers import example, compile_program
+
+
+def serve(*requests):
+    """Sends the requests (JSON lines) to the server, returns the
+    responses"""
+    output = compile_program("".join(line + "\n" for line in requests),
+                             "--serve")
+    return [json.loads(line) for line in output.splitlines()]
+
+
+def test_responses_match_the_command_line():
+    fib = example("fib")
+    responses = serve(
+        json.dumps({"id": 1, "source": fib}),
+        json.dumps({"id": 2, "source": fib, "opt": True, "flags": ["--json"]}))
+
+    assert [response["id"] for response in responses] == [1, 2]
+    assert all(response["errors"] == [] for response in responses)
+    assert responses[0]["cpp_src"].strip() == compile_program(fib).strip()
+    assert responses[1]["ir"] == json.loads(compile_program(fib, "--opt",
+                                                            "--json"))
+
+
+def test_bad_requests_get_errors():
+    responses = serve("{not json", json.dumps({"id": 3}),
+                      json.dumps({"id": 4, "source": example("fib")}))
+
+    assert len(responses) == 3
+    for response in responses[:2]:
+        assert response["id"] is None
+        assert response["errors"][0].startswith("bad request")
+    # (the server goes on after them)
+    assert responses[2]["id"] == 4 and responses[2]["errors"] == []
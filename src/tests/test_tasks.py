@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Tests of the calls, that run as OpenMP tasks (see codegen/tasks.py)"""
+
+from tests.helpers import example, compile_program, cpp_function
+
+DIAMOND = """
+function h(x: integer returns integer)
+  x + 1
+end function
+
+function f(x: integer returns integer)
+  h(x) * 2
+end function
+
+function g(x: integer returns integer)
+  h(x) * 3
+end function
+
+function k(x: integer returns integer)
+  f(x) + g(x)
+end function
+
+function main(x: integer returns integer)
+  k(x) + k(x + 1)
+end function
+"""
+
+MUTUAL_RECURSION = """
+function even(x: integer returns integer)
+  if x < 1 then 1 else odd(x - 1) end if
+end function
+
+function odd(x: integer returns integer)
+  if x < 1 then 0 else even(x - 1) end if
+end function
+
+function main(x: integer returns integer)
+  even(x) + odd(x)
+end function
+"""
+
+
+def test_recursive_calls_are_tasks():
+    cpp_src = compile_program(example("fib"))
+    assert "run_tasks(" in cpp_function(cpp_src, "integer Fib(integer M)")
+
+
+def test_mutual_recursion_is_a_task():
+    cpp_src = compile_program(MUTUAL_RECURSION)
+    assert "run_tasks(" in cpp_function(cpp_src, "integer sisal_main(integer x)")
+
+
+def test_calls_without_work_are_not_tasks():
+    # (k calls h twice, through f and g, it isn't a recursion)
+    cpp_src = compile_program(DIAMOND)
+    assert "run_tasks(" not in cpp_function(cpp_src,
+                                            "integer sisal_main(integer x)")
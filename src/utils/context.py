@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+
+"""Compilation context: keeps the state of one compilation (indices of
+the parser's and the code generator's nodes, edges and functions,
+counters of new names, settings like --noerror and so on).
+
+A context becomes current for a block of code ("with context:") in the
+current thread (or asyncio task) only, so threads may compile different
+programs at the same time. The parser and the code generator find their
+state with current_context(). Code outside of any such block uses the
+default context of the process.
+"""
+
+from contextvars import ContextVar
+
+
+class CompilationContext:
+    def __init__(self, debug=False, no_error=False):
+        self.debug = debug
+        self.no_error = no_error
+        # states of the parser and the code generator by their names:
+        self.states = {}
+        self.tokens = []
+
+    def state(self, name, factory):
+        """Returns the state kept by name (it's made by factory first
+        time it's needed)"""
+        if name not in self.states:
+            self.states[name] = factory()
+        return self.states[name]
+
+    def reset(self, name):
+        """Forgets the state kept by name"""
+        self.states.pop(name, None)
+
+    def __enter__(self):
+        self.tokens.append(current.set(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        current.reset(self.tokens.pop())
+
+
+current = ContextVar("compilation_context", default=CompilationContext())
+
+
+def current_context() -> CompilationContext:
+    return current.get()
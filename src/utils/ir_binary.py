@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Compact binary IR format, an alternative to JSON IRs.
+
+It keeps the same IR as the dicts ir_data exports (Python names, see
+utils/ir_export.py), with every string, dict key set and type stored
+once, and the edges as fixed-width records.
+
+Schema (version 1), all numbers are little-endian:
+
+    magic       7 bytes  b"SISALIR"
+    version     1 byte   1
+    then 8 sections, each one is a count (u32) and that many items:
+    strings     u32      lengths of the strings (in characters)
+    text        u8       the strings one after another (UTF-8)
+    shapes      u32      key sets of the dicts: for each one the number
+                         of its keys and their strings
+    floats      f64      values of the floats
+    nodes       u32      ids of the nodes by their numbers (strings)
+    edges       u32      4 per edge: number of the node and index of the
+                         port it goes from, the same for the port it
+                         goes to
+    types       i32      the type table: the number of the types, then
+                         their values (a type only refers to ones
+                         before it)
+    value       i32      the IR, as a single value
+
+A value is an i32 item, its low 4 bits are the tag, the rest (shifted
+right by 4) is the payload, some tags are followed by more values:
+
+    0  None             1  False            2  True
+    3  int (payload is the number, ints beyond 27 bits are tagged 4)
+    4  int (payload is the string with its decimal digits)
+    5  float (payload is its index in floats)
+    6  string (payload is its index in strings)
+    7  list (payload is its length, that many values follow)
+    8  dict (payload is its shape, a value for each key follows)
+    9  type (payload is its index in the type table)
+    10 node id (payload is the node's number in nodes)
+    11 edges (payload is their count, the records are the next ones in
+       edges)
+
+The values of "type" and "element" keys and of record types' "fields"
+are types, the string values of "id" and "node_id" keys are node ids,
+and lists of edges ({"from_": (node id, index), "to": ...}) are stored
+in edges. Equal types share one entry of the type table (and one dict,
+when they are read). Tuples are read as lists, except the ends of the
+edges, "from" keys of the edges are read as "from_".
+"""
+
+import sys
+from array import array
+from itertools import accumulate
+from .ir_export import PLAIN_TYPES
+
+MAGIC = b"SISALIR"
+VERSION = 1
+
+(NONE, FALSE, TRUE, INT, BIG_INT, FLOAT, STR, LIST, DICT, TYPE, NODE,
+ EDGES) = range(12)
+TAG_BITS = 4
+TAG_MASK = (1 << TAG_BITS) - 1
+# ints stored in the payload:
+MAX_SMALL_INT = 1 << (31 - TAG_BITS)
+
+TYPE_KEYS = ("type", "element")
+NODE_ID_KEYS = ("id", "node_id")
+# (ports' indices in the edges' records are u32)
+MAX_INDEX = 1 << 32
+# item types of the sections (see the schema):
+SECTIONS = ("I", "B", "I", "d", "I", "I", "i", "i")
+
+
+class IRBinaryError(Exception):
+    pass
+
+
+def is_binary(data: bytes):
+    """Checks if data is a binary IR"""
+    return data[:len(MAGIC)] == MAGIC
+
+
+def write_binary(value, file):
+    """Writes value (an IR object, or a dict or list of them, like
+    ir_data exports it) to file (opened in binary mode)"""
+    strings = {}
+    shapes = {}
+    shape_items = []
+    floats = []
+    nodes = {}
+    edges = []
+    types = {}
+    type_items = []
+
+    def string(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    def node(node_id):
+        index = nodes.get(node_id)
+        if index is None:
+            index = nodes[node_id] = len(nodes)
+        return index
+
+    def shape(keys):
+        index = shapes.get(keys)
+        if index is None:
+            index = shapes[keys] = len(shapes)
+            shape_items.append(len(keys))
+            # (keys, that aren't strings, are read as strings, like JSON's)
+            shape_items.extend(string(str(key)) for key in keys)
+        return index
+
+    def edge_end(end):
+        return (isinstance(end, (list, tuple)) and len(end) == 2 and
+                isinstance(end[0], str) and isinstance(end[1], int) and
+                0 <= end[1] < MAX_INDEX)
+
+    def edge_list(items):
+        """Adds the records of the edges, returns False if items aren't
+        all of them edges"""
+        records = []
+        for edge in items:
+            if not isinstance(edge, (dict, list, tuple)):
+                edge = edge.ir_shallow()
+            if not isinstance(edge, dict) or len(edge) != 2:
+                return False
+            from_ = edge["from_"] if "from_" in edge else edge.get("from")
+            to = edge.get("to")
+            if not (edge_end(from_) and edge_end(to)):
+                return False
+            records += (node(from_[0]), from_[1], node(to[0]), to[1])
+        edges.extend(records)
+        return True
+
+    def is_type(value):
+        return not isinstance(value, PLAIN_TYPES + (list, tuple))
+
+    def type_(value, out):
+        """Writes a type to the type table (once), its reference to out"""
+        if not isinstance(value, dict):
+            value = value.ir_shallow()
+        items = [shape(tuple(value)) << TAG_BITS | DICT]
+        for key, item in value.items():
+            if key in TYPE_KEYS and is_type(item):
+                type_(item, items)
+            elif key == "fields" and isinstance(item, dict):
+                items.append(shape(tuple(item)) << TAG_BITS | DICT)
+                for field in item.values():
+                    if is_type(field):
+                        type_(field, items)
+                    else:
+                        put(field, items)
+            else:
+                put(item, items)
+        key = tuple(items)
+        index = types.get(key)
+        if index is None:
+            index = types[key] = len(types)
+            type_items.extend(items)
+        out.append(index << TAG_BITS | TYPE)
+
+    def put(value, out):
+        if isinstance(value, str):
+            out.append(string(value) << TAG_BITS | STR)
+        elif value is None:
+            out.append(NONE)
+        elif value is True:
+            out.append(TRUE)
+        elif value is False:
+            out.append(FALSE)
+        elif isinstance(value, int):
+            if -MAX_SMALL_INT <= value < MAX_SMALL_INT:
+                out.append(value << TAG_BITS | INT)
+            else:
+                out.append(string(str(value)) << TAG_BITS | BIG_INT)
+        elif isinstance(value, float):
+            out.append(len(floats) << TAG_BITS | FLOAT)
+            floats.append(value)
+        else:
+            if not isinstance(value, (dict, list, tuple)):
+                value = value.ir_shallow()
+            if isinstance(value, dict):
+                out.append(shape(tuple(value)) << TAG_BITS | DICT)
+                for key, item in value.items():
+                    if key in TYPE_KEYS and is_type(item):
+                        type_(item, out)
+                    elif key in NODE_ID_KEYS and isinstance(item, str):
+                        out.append(node(item) << TAG_BITS | NODE)
+                    elif key == "edges" and isinstance(item, list) \
+                            and edge_list(item):
+                        out.append(len(item) << TAG_BITS | EDGES)
+                    else:
+                        put(item, out)
+            else:
+                out.append(len(value) << TAG_BITS | LIST)
+                for item in value:
+                    put(item, out)
+
+    values = []
+    put(value, values)
+    node_strings = [string(node_id) for node_id in nodes]
+    text = list(strings)
+    sections = [
+        [len(item) for item in text],
+        "".join(text).encode("utf-8"),
+        shape_items,
+        floats,
+        node_strings,
+        edges,
+        [len(types)] + type_items,
+        values,
+    ]
+
+    file.write(MAGIC + bytes([VERSION]))
+    for code, items in zip(SECTIONS, sections):
+        packed = array(code, items)
+        if sys.byteorder == "big":
+            packed.byteswap()
+        file.write(len(packed).to_bytes(4, "little"))
+        file.write(packed.tobytes())
+
+
+def read_binary(data: bytes):
+    """Reads an IR written by write_binary, returns it as dicts and
+    lists (with Python names)"""
+    if not is_binary(data):
+        raise IRBinaryError("not a binary IR")
+    if data[len(MAGIC)] != VERSION:
+        raise IRBinaryError(f"unsupported binary IR version {data[len(MAGIC)]}")
+    position = len(MAGIC) + 1
+    sections = []
+    for code in SECTIONS:
+        count = int.from_bytes(data[position:position + 4], "little")
+        position += 4
+        items = array(code)
+        end = position + count * items.itemsize
+        if end > len(data):
+            raise IRBinaryError("binary IR is truncated")
+        items.frombytes(data[position:end])
+        if sys.byteorder == "big":
+            items.byteswap()
+        sections.append(items)
+        position = end
+    lengths, text, shape_items, floats, node_items, edges, type_items, values = \
+        sections
+
+    text = text.tobytes().decode("utf-8")
+    ends = list(accumulate(lengths))
+    strings = [text[end - length:end] for length, end in zip(lengths, ends)]
+    shapes = []
+    shape_items = shape_items.tolist()
+    index = 0
+    while index < len(shape_items):
+        count = shape_items[index]
+        shapes.append(tuple(strings[key] for key in
+                            shape_items[index + 1:index + 1 + count]))
+        index += 1 + count
+    floats = floats.tolist()
+    nodes = [strings[index] for index in node_items]
+    next_edge = iter(edges.tolist()).__next__
+    types = []
+    next_item = None
+
+    def get():
+        item = next_item()
+        tag = item & TAG_MASK
+        if tag == DICT:
+            return {key: get() for key in shapes[item >> TAG_BITS]}
+        if tag == STR:
+            return strings[item >> TAG_BITS]
+        if tag == TYPE:
+            return types[item >> TAG_BITS]
+        if tag == INT:
+            return item >> TAG_BITS
+        if tag == NODE:
+            return nodes[item >> TAG_BITS]
+        if tag == LIST:
+            return [get() for _ in range(item >> TAG_BITS)]
+        if tag == EDGES:
+            return [{"from_": (nodes[next_edge()], next_edge()),
+                     "to": (nodes[next_edge()], next_edge())}
+                    for _ in range(item >> TAG_BITS)]
+        if tag == NONE:
+            return None
+        if tag == TRUE:
+            return True
+        if tag == FALSE:
+            return False
+        if tag == FLOAT:
+            return floats[item >> TAG_BITS]
+        if tag == BIG_INT:
+            return int(strings[item >> TAG_BITS])
+        raise IRBinaryError(f"unknown tag {tag} in binary IR")
+
+    try:
+        next_item = iter(type_items.tolist()).__next__
+        for _ in range(next_item()):
+            types.append(get())
+        next_item = iter(values.tolist()).__next__
+        return get()
+    except (StopIteration, IndexError) as e:
+        raise IRBinaryError("binary IR is damaged") from e
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+"""Export of IR objects (nodes, ports, edges and types of the parser and
+of the ir package) in a single pass over them, without copying them.
+
+An object takes part with its ir_shallow method: it returns a new dict
+(or list) of the object's fields for export, with the nested objects as
+they are. ir_data turns that into plain dicts and lists (for the code
+generator, the optimizer or json.dumps). write_json writes JSON text of
+it straight into a file, keeping in memory only the path it goes down,
+its output is the same as json.dumps(ir_data(value, name), indent=1)'s.
+"""
+
+from json import dumps
+from json.encoder import encode_basestring_ascii
+
+PLAIN_TYPES = (str, int, float, bool, type(None))
+# pieces of JSON text joined for a single write to the file:
+CHUNKS_PER_WRITE = 4096
+
+
+def ir_data(value, name=None):
+    """Exports value (an IR object, or a dict, list or tuple of them) as
+    plain dicts and lists, name (if given) converts the keys of the dicts
+    (like python_names.json_name does)"""
+    if isinstance(value, PLAIN_TYPES):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [ir_data(item, name) for item in value]
+    if not isinstance(value, dict):
+        value = value.ir_shallow()
+        if isinstance(value, list):
+            return [ir_data(item, name) for item in value]
+    if name is None:
+        return {key: ir_data(item) for key, item in value.items()}
+    return {name(key): ir_data(item, name) for key, item in value.items()}
+
+
+def write_json(value, file, name=None):
+    """Writes value (like ir_data exports it) to file as JSON text with
+    the indent of 1"""
+    chunks = []
+
+    def write(chunk):
+        chunks.append(chunk)
+        if len(chunks) >= CHUNKS_PER_WRITE:
+            file.write("".join(chunks))
+            chunks.clear()
+
+    write_value(value, write, name, 0)
+    file.write("".join(chunks))
+
+
+def json_scalar(value):
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return int.__repr__(value)
+    return dumps(value)
+
+
+def write_value(value, write, name, level):
+    """Writes JSON text of value with write, level is its indent"""
+    if isinstance(value, PLAIN_TYPES):
+        write(json_scalar(value))
+        return
+    if not isinstance(value, (dict, list, tuple)):
+        value = value.ir_shallow()
+    if not value:
+        write("{}" if isinstance(value, dict) else "[]")
+        return
+    separator = "\n" + " " * (level + 1)
+    if isinstance(value, dict):
+        write("{")
+        for index, (key, item) in enumerate(value.items()):
+            key = name(key) if name else key
+            write(("," if index else "") + separator +
+                  json_scalar(key if isinstance(key, str) else str(key)) + ": ")
+            write_value(item, write, name, level + 1)
+        write("\n" + " " * level + "}")
+    else:
+        write("[")
+        for index, item in enumerate(value):
+            write(("," if index else "") + separator)
+            write_value(item, write, name, level + 1)
+        write("\n" + " " * level + "]")
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 json_re = re.compile("_([a-z])")
 re_remove_ = re.compile("_(?=$)")
@@ -38,8 +39,13 @@ def json_names(obj):
         return value
 
     for key, value in obj.items():
-        new_key = re.sub(json_re, lambda m: m.group(1).upper(), key)
-        new_key = re.sub(re_remove_, "", new_key)
-        new_object[new_key] = convert(value)
+        new_object[json_name(key)] = convert(value)
 
     return new_object
+
+
+@lru_cache(maxsize=None)
+def json_name(key):
+    """Converts a snake_case name to camelCase and removes '_' at the end"""
+    new_key = re.sub(json_re, lambda m: m.group(1).upper(), key)
+    return re.sub(re_remove_, "", new_key)